@@ -0,0 +1,191 @@
+"""
+Almacén Incremental de Precios
+Guarda en SQLite el historial diario de cada ticker y solo descarga barras nuevas
+"""
+
+import sqlite3
+from contextlib import contextmanager
+import pandas as pd
+
+
+COLUMNAS_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class AlmacenPrecios:
+    """Historial de precios local con actualización incremental"""
+    
+    def __init__(self, ruta_db='precios_screener.db', ventana=260,
+                 max_dias_hueco=5, tolerancia_ajuste=1e-4):
+        """
+        Args:
+            ruta_db: archivo SQLite del almacén
+            ventana: barras entregadas a calcular_score_timing (SMA200 + RSI14)
+            max_dias_hueco: días naturales entre barras a partir de los cuales
+                            se considera que falta historial
+            tolerancia_ajuste: diferencia relativa en la barra de solape que
+                               indica un split/dividendo a reajustar
+        """
+        self.ruta_db = ruta_db
+        self.ventana = ventana
+        self.max_dias_hueco = max_dias_hueco
+        self.tolerancia_ajuste = tolerancia_ajuste
+        self._crear_tabla()
+    
+    @contextmanager
+    def _conectar(self):
+        """Nueva conexión por operación (seguro entre hilos)"""
+        conn = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _crear_tabla(self):
+        """Crear tabla de precios si no existe"""
+        with self._conectar() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS precios (
+                    ticker TEXT NOT NULL,
+                    fecha TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (ticker, fecha)
+                )
+            """)
+    
+    @staticmethod
+    def _fechas_texto(index):
+        """Convertir el índice de yfinance (con zona horaria) a 'YYYY-MM-DD'"""
+        index = pd.DatetimeIndex(index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return index.strftime('%Y-%m-%d')
+    
+    def _filas(self, ticker_symbol, hist):
+        """Filas para INSERT a partir de un DataFrame OHLCV"""
+        datos = hist.reindex(columns=COLUMNAS_OHLCV).astype(float)
+        datos = datos[datos['Close'].notna()]
+        fechas = self._fechas_texto(datos.index)
+        return [
+            (ticker_symbol, fecha, *valores)
+            for fecha, valores in zip(fechas, datos.itertuples(index=False, name=None))
+        ]
+    
+    def fecha_actualizacion(self, ticker_symbol):
+        """
+        Fecha desde la que hay que pedir barras nuevas
+        
+        Se usa la penúltima barra guardada: la última puede ser una sesión
+        aún abierta, y la penúltima sirve de solape para detectar ajustes.
+        
+        Returns:
+            pd.Timestamp o None si el ticker no está en el almacén
+        """
+        with self._conectar() as conn:
+            filas = conn.execute(
+                "SELECT fecha FROM precios WHERE ticker = ? ORDER BY fecha DESC LIMIT 2",
+                (ticker_symbol,)
+            ).fetchall()
+        return pd.Timestamp(filas[-1][0]) if filas else None
+    
+    def fechas_actualizacion(self, tickers_list):
+        """fecha_actualizacion para varios tickers (dict ticker -> fecha o None)"""
+        return {t: self.fecha_actualizacion(t) for t in tickers_list}
+    
+    def reemplazar(self, ticker_symbol, hist):
+        """Sustituir todo el historial guardado de un ticker"""
+        with self._conectar() as conn:
+            conn.execute("DELETE FROM precios WHERE ticker = ?", (ticker_symbol,))
+            conn.executemany(
+                "INSERT INTO precios VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._filas(ticker_symbol, hist)
+            )
+    
+    def agregar(self, ticker_symbol, nuevos):
+        """
+        Añadir barras nuevas al historial guardado
+        
+        La primera barra descargada debe coincidir con una ya guardada. Si su
+        cierre difiere (split o dividendo ajustado), se reescala el historial
+        anterior con el mismo factor que aplicó Yahoo.
+        
+        Returns:
+            True si se pudo añadir; False si hace falta recargar completo
+            (sin datos nuevos, sin solape o con huecos en las barras nuevas)
+        """
+        if nuevos is None or nuevos.empty:
+            return False
+
+        filas = self._filas(ticker_symbol, nuevos)
+        if not filas or self._hay_huecos([f[1] for f in filas]):
+            return False
+        
+        fecha_solape, close_nuevo = filas[0][1], filas[0][5]
+        
+        with self._conectar() as conn:
+            fila = conn.execute(
+                "SELECT close FROM precios WHERE ticker = ? AND fecha = ?",
+                (ticker_symbol, fecha_solape)
+            ).fetchone()
+            
+            if fila is None or not fila[0]:
+                return False
+            
+            factor = close_nuevo / fila[0]
+            if abs(factor - 1) > self.tolerancia_ajuste:
+                conn.execute(
+                    "UPDATE precios SET open = open * ?, high = high * ?, "
+                    "low = low * ?, close = close * ?, volume = volume / ? "
+                    "WHERE ticker = ? AND fecha < ?",
+                    (factor, factor, factor, factor, factor, ticker_symbol, fecha_solape)
+                )
+            
+            conn.executemany(
+                "INSERT OR REPLACE INTO precios VALUES (?, ?, ?, ?, ?, ?, ?)",
+                filas
+            )
+        
+        return True
+    
+    def cargar(self, ticker_symbol, ventana=None):
+        """
+        Cargar las últimas barras de un ticker
+        
+        Args:
+            ventana: número de barras (None = self.ventana, 0 = todas)
+        
+        Returns:
+            DataFrame OHLCV indexado por fecha (vacío si no hay datos)
+        """
+        ventana = self.ventana if ventana is None else ventana
+        
+        with self._conectar() as conn:
+            filas = conn.execute(
+                "SELECT fecha, open, high, low, close, volume FROM precios "
+                "WHERE ticker = ? ORDER BY fecha DESC LIMIT ?",
+                (ticker_symbol, ventana if ventana else -1)
+            ).fetchall()
+        
+        filas.reverse()
+        hist = pd.DataFrame(
+            [f[1:] for f in filas],
+            index=pd.DatetimeIndex([f[0] for f in filas], name='Date'),
+            columns=COLUMNAS_OHLCV
+        )
+        return hist
+    
+    def _hay_huecos(self, fechas):
+        """True si entre fechas consecutivas hay más de max_dias_hueco días"""
+        if len(fechas) < 2:
+            return False
+        saltos = pd.DatetimeIndex(fechas).to_series().diff().dt.days
+        return bool((saltos > self.max_dias_hueco).any())
+    
+    def tiene_huecos(self, ticker_symbol):
+        """Detectar barras faltantes dentro de la ventana que usa el timing"""
+        return self._hay_huecos(self.cargar(ticker_symbol).index)
+    
+    def eliminar(self, ticker_symbol):
+        """Borrar el historial de un ticker"""
+        with self._conectar() as conn:
+            conn.execute("DELETE FROM precios WHERE ticker = ?", (ticker_symbol,))
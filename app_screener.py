@@ -9,7 +9,12 @@ import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import time
-from screener_ivr import ScreenerIVR
+from screener_ivr import ScreenerIVR, RankingTopK
+from motor_vectorizado import construir_resultado, ESQUEMA_RESULTADO
+from cache_fundamentales import CacheFundamentales
+from almacen_precios import AlmacenPrecios
+from collections import OrderedDict
+import threading
 import json
 import os
 
@@ -72,6 +77,87 @@ def guardar_configuracion(config):
         json.dump(config, f, indent=2)
 
 
+@st.cache_resource
+def almacen_compartido():
+    """Historial de precios en disco compartido por todas las sesiones"""
+    return AlmacenPrecios()
+
+
+@st.cache_resource
+def cache_compartido(intervalo_minutos):
+    """
+    Cache de fundamentales compartido, una instancia por vigencia: dos
+    sesiones con intervalos distintos leen el mismo archivo sin cambiarse
+    el TTL la una a la otra
+    """
+    return CacheFundamentales(ttl_horas=intervalo_minutos / 60)
+
+
+@st.cache_resource
+def escaneos_compartidos():
+    """Escaneos recientes compartidos entre sesiones: clave -> (DataFrame, fecha)"""
+    return {'escaneos': OrderedDict(), 'lock': threading.Lock()}
+
+
+MAX_ESCANEOS_COMPARTIDOS = 64
+
+
+def bloque_frescura(intervalo_minutos):
+    """Número de bloque de tiempo: cambia cada `intervalo_minutos` minutos"""
+    return int(time.time() // (intervalo_minutos * 60))
+
+
+def escanear_compartido(tickers, intervalo_minutos, parar_tras=0, al_avanzar=None):
+    """
+    Escaneo compartido entre sesiones por conjunto de tickers y bloque de
+    frescura (los pesos se aplican después con recalcular_ivr)
+    
+    Si otra sesión ya escaneó la misma lista en el bloque actual se reutiliza
+    su resultado; si no, se escanea aquí con progreso en vivo. Las llamadas a
+    la interfaz quedan en al_avanzar, fuera de cualquier función cacheada.
+    
+    Args:
+        tickers: tupla ordenada de símbolos
+        intervalo_minutos: vigencia de los datos (también TTL de fundamentales)
+        parar_tras: terminar al encontrar este número de aprobados (0 = todos)
+        al_avanzar: callback(i, total, ticker, ranking) tras cada ticker
+    
+    Returns:
+        (DataFrame de resultados, fecha de los datos, True si venía de otra sesión)
+    """
+    compartidos = escaneos_compartidos()
+    clave = (tickers, bloque_frescura(intervalo_minutos), intervalo_minutos, parar_tras)
+    with compartidos['lock']:
+        if clave in compartidos['escaneos']:
+            df, fecha = compartidos['escaneos'][clave]
+            return df, fecha, True
+    
+    screener = ScreenerIVR(max_workers=1, cache_fundamentales=cache_compartido(intervalo_minutos),
+                           almacen_precios=almacen_compartido())
+    
+    # Historiales por bloques en pocas peticiones: los primeros resultados
+    # aparecen sin esperar a descargar toda la lista
+    ranking = RankingTopK(k=10)
+    resultados = []
+    for i, (ticker, resultado) in enumerate(screener.escanear_stream(
+            tickers, parar_tras_aprobados=parar_tras or None)):
+        ranking.agregar(resultado)
+        if resultado:
+            resultados.append(resultado)
+        if al_avanzar:
+            al_avanzar(i, len(tickers), ticker, ranking)
+    
+    resultados.sort(key=lambda r: r['ivr'], reverse=True)
+    df = construir_resultado({c: [r[c] for r in resultados] for c in ESQUEMA_RESULTADO},
+                             fecha=datetime.now())
+    
+    with compartidos['lock']:
+        compartidos['escaneos'][clave] = (df, df.attrs['fecha'])
+        while len(compartidos['escaneos']) > MAX_ESCANEOS_COMPARTIDOS:
+            compartidos['escaneos'].popitem(last=False)
+    return df, df.attrs['fecha'], False
+
+
 def crear_gauge_ivr(ivr_value, nombre):
     """Crear gauge visual para IVR"""
     fig = go.Figure(go.Indicator(
@@ -169,16 +255,23 @@ def main():
             height=100
         )
         tickers_list = [t.strip().upper() for t in tickers_input.split(",") if t.strip()]
+        parar_tras = st.number_input(
+            "Parar al encontrar N aprobados (0 = analizar todos)",
+            min_value=0, value=0, step=5
+        )
         
         st.markdown("---")
         
         # Auto-actualización
         st.subheader("Auto-actualización")
         auto_refresh = st.checkbox("Activar auto-refresh", value=False)
+        opciones_intervalo = [5, 15, 30, 60]
+        intervalo_guardado = st.session_state.config.get('actualizacion_minutos', 30)
         intervalo = st.selectbox(
             "Intervalo (minutos)",
-            [5, 15, 30, 60],
-            index=2
+            opciones_intervalo,
+            index=opciones_intervalo.index(intervalo_guardado)
+            if intervalo_guardado in opciones_intervalo else 2
         )
         
         st.markdown("---")
@@ -197,48 +290,78 @@ def main():
         
         if st.button("🔄 Escanear Ahora", type="primary", use_container_width=True):
             st.session_state.trigger_scan = True
+        
+        if st.button("♻️ Forzar datos nuevos", use_container_width=True):
+            with escaneos_compartidos()['lock']:
+                escaneos_compartidos()['escaneos'].clear()
+            # Sin esto el cache de fundamentales seguiría sirviendo info de
+            # hasta un intervalo de antigüedad (el archivo es común a todas
+            # las vigencias, basta invalidar los tickers de esta lista)
+            cache_compartido(intervalo).invalidar(tickers_list)
+            st.session_state.trigger_scan = True
     
     # Main content
     if st.button("▶️ Ejecutar Screener") or st.session_state.get('trigger_scan', False):
         st.session_state.trigger_scan = False
         
-        # Crear screener con pesos personalizados
-        screener = ScreenerIVR(pesos_personalizados=pesos_normalizados)
-        
         # Progress bar
         progress_bar = st.progress(0)
         status_text = st.empty()
+        status_text.text(f"Descargando datos de {len(tickers_list)} tickers...")
         
-        # Escanear tickers
-        resultados = []
-        for i, ticker in enumerate(tickers_list):
-            status_text.text(f"Analizando {ticker}... ({i+1}/{len(tickers_list)})")
-            progress_bar.progress((i + 1) / len(tickers_list))
-            
-            resultado = screener.calcular_ivr(ticker)
-            if resultado:
-                resultados.append(resultado)
+        top_parcial = st.empty()
+        ultimo_refresco = [0.0]
+        
+        def al_avanzar(i, total, ticker, ranking):
+            status_text.text(f"Analizado {ticker} ({i+1}/{total}) — "
+                             f"{ranking.aprobados} pasan filtros")
+            progress_bar.progress((i + 1) / total)
+            # Top provisional, como mucho dos veces por segundo
+            if ranking.mejores() and time.monotonic() - ultimo_refresco[0] >= 0.5:
+                ultimo_refresco[0] = time.monotonic()
+                top_parcial.dataframe(
+                    ranking.dataframe()[['ticker', 'nombre', 'precio', 'ivr', 'margen_seguridad']],
+                    use_container_width=True
+                )
+        
+        # Escanear (o reutilizar el escaneo de otra sesión con los mismos tickers)
+        tickers_clave = tuple(sorted(set(tickers_list)))
+        df, fecha_datos, reutilizado = escanear_compartido(
+            tickers_clave, intervalo, parar_tras=int(parar_tras), al_avanzar=al_avanzar
+        )
+        if reutilizado:
+            progress_bar.progress(1.0)
+            st.caption("♻️ Resultado reutilizado de un escaneo reciente de otra sesión")
         
         status_text.text("✅ Análisis completado!")
         time.sleep(0.5)
         status_text.empty()
         progress_bar.empty()
+        top_parcial.empty()
+        if parar_tras and not df.empty and df['pasa_filtros'].sum() >= parar_tras:
+            st.info(f"⏹️ Escaneo detenido tras {int(parar_tras)} aprobados "
+                    f"({len(df)}/{len(tickers_clave)} tickers analizados)")
         
-        if resultados:
-            df = pd.DataFrame(resultados)
-            df = df.sort_values('ivr', ascending=False).reset_index(drop=True)
-            
-            # Guardar en session state
+        if not df.empty:
+            # Guardar en session state (snapshot con sub-scores)
             st.session_state.df_resultados = df
-            st.session_state.ultima_actualizacion = datetime.now()
+            st.session_state.ultima_actualizacion = fecha_datos
     
     # Mostrar resultados si existen
     if 'df_resultados' in st.session_state:
-        df = st.session_state.df_resultados
+        # Re-puntuar con los pesos actuales del sidebar sin volver a descargar
+        screener = ScreenerIVR(pesos_normalizados)
+        df = screener.recalcular_ivr(st.session_state.df_resultados, pesos_normalizados)
         ultima_act = st.session_state.ultima_actualizacion
         
-        # Timestamp
-        st.info(f"📅 Última actualización: {ultima_act.strftime('%Y-%m-%d %H:%M:%S')}")
+        # Timestamp y antigüedad de los datos
+        edad_minutos = (datetime.now() - ultima_act).total_seconds() / 60
+        st.info(f"📅 Última actualización: {ultima_act.strftime('%Y-%m-%d %H:%M:%S')} "
+                f"— 🕒 datos de hace {edad_minutos:.0f} min "
+                f"(se refrescan cada {intervalo} min)")
+        if edad_minutos >= intervalo:
+            st.warning("⚠️ Los datos superan el intervalo de actualización. "
+                       "Pulsa '🔄 Escanear Ahora' para refrescarlos.")
         
         # Métricas generales
         col1, col2, col3, col4 = st.columns(4)
@@ -262,17 +385,19 @@ def main():
         with tab1:
             st.subheader("🏆 Ranking por IVR")
             
-            # Preparar tabla de visualización
-            df_display = df.copy()
-            df_display['ivr_pct'] = (df_display['ivr'] * 100).round(2)
-            df_display['ms_pct'] = (df_display['margen_seguridad'] * 100).round(2)
-            df_display['señal'] = df_display['ivr'].apply(
-                lambda x: mostrar_señal(x, umbral_compra, umbral_venta)[0]
-            )
-            
-            cols_mostrar = ['ticker', 'nombre', 'precio', 'ivr_pct', 'ms_pct', 
-                           'score_valoracion', 'score_calidad', 'score_timing', 
-                           'pasa_filtros', 'señal']
+            # Tabla de visualización: solo las columnas mostradas, sin copiar el resultado
+            df_display = pd.DataFrame({
+                'ticker': df['ticker'],
+                'nombre': df['nombre'],
+                'precio': df['precio'],
+                'ivr_pct': (df['ivr'] * 100).round(2),
+                'ms_pct': (df['margen_seguridad'] * 100).round(2),
+                'score_valoracion': df['score_valoracion'],
+                'score_calidad': df['score_calidad'],
+                'score_timing': df['score_timing'],
+                'pasa_filtros': df['pasa_filtros'],
+                'señal': df['ivr'].map(lambda x: mostrar_señal(x, umbral_compra, umbral_venta)[0]),
+            })
             
             # Colorear filas según señal
             def highlight_rows(row):
@@ -283,7 +408,7 @@ def main():
                 return [''] * len(row)
             
             st.dataframe(
-                df_display[cols_mostrar].style.apply(highlight_rows, axis=1),
+                df_display.style.apply(highlight_rows, axis=1),
                 use_container_width=True,
                 height=400
             )
@@ -455,6 +580,7 @@ def main():
     if auto_refresh and 'ultima_actualizacion' in st.session_state:
         tiempo_desde_ultimo = (datetime.now() - st.session_state.ultima_actualizacion).seconds / 60
         if tiempo_desde_ultimo >= intervalo:
+            st.session_state.trigger_scan = True
             st.rerun()
 
 
@@ -0,0 +1,213 @@
+"""
+Backtesting del IVR
+Reproduce los escaneos guardados contra el historial de precios local y simula
+estrategias top-N y por umbral sobre un panel fechas x tickers
+"""
+
+import numpy as np
+import pandas as pd
+from historial_ivr import HistorialIVR
+from almacen_precios import AlmacenPrecios
+from indicadores_panel import construir_panel
+
+
+def cargar_paneles(historial=None, almacen=None, desde=None, hasta=None):
+    """
+    Paneles de IVR y precios de cierre alineados por sesión
+    
+    El IVR de cada día es el del último escaneo de ese día y se arrastra
+    hasta el siguiente escaneo (como mucho 5 sesiones). Los tickers que no
+    pasan filtros quedan con IVR 0.
+    
+    Args:
+        historial: HistorialIVR (None = historial_screener/)
+        almacen: AlmacenPrecios (None = precios_screener.db)
+        desde/hasta: rango de fechas de los escaneos
+    
+    Returns:
+        (ivr, precios): DataFrames fechas x tickers con el mismo índice y columnas
+    """
+    historial = historial or HistorialIVR()
+    almacen = almacen or AlmacenPrecios()
+    
+    escaneos = historial.leer(desde=desde, hasta=hasta, columnas=['ivr', 'pasa_filtros'])
+    if escaneos.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    
+    escaneos['dia'] = escaneos['timestamp'].dt.normalize()
+    escaneos['ivr'] = escaneos['ivr'].where(escaneos['pasa_filtros'], 0.0)
+    ivr = escaneos.pivot_table(index='dia', columns='ticker', values='ivr', aggfunc='last')
+    
+    historiales = {t: almacen.cargar(t, ventana=0) for t in ivr.columns}
+    precios = construir_panel(historiales)
+    if precios.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    
+    precios = precios.loc[precios.index >= ivr.index.min()]
+    if hasta is not None:
+        precios = precios.loc[precios.index <= pd.Timestamp(hasta)]
+    # Escaneos en días sin sesión (fines de semana) se arrastran a la siguiente
+    ivr = ivr.reindex(ivr.index.union(precios.index)).ffill(limit=5)
+    ivr = ivr.reindex(index=precios.index, columns=precios.columns)
+    return ivr, precios
+
+
+def pesos_top_n(ivr, n=10, ivr_minimo=0.0):
+    """
+    Igual peso en los n tickers de mayor IVR de cada fecha
+    
+    Args:
+        ivr: panel fechas x tickers
+        n: tickers en cartera
+        ivr_minimo: excluir los que no superen este IVR
+    
+    Returns:
+        panel de pesos (cada fila suma 1, o 0 si no hay candidatos)
+    """
+    valores = ivr.to_numpy(dtype=float)
+    candidatos = ~np.isnan(valores) & (valores > ivr_minimo)
+    puntuacion = np.where(candidatos, valores, -np.inf)
+    
+    rango = np.argsort(np.argsort(-puntuacion, axis=1, kind='stable'), axis=1)
+    seleccion = candidatos & (rango < n)
+    return _normalizar(seleccion, ivr)
+
+
+def pesos_umbral(ivr, umbral_compra=0.60, umbral_venta=0.30):
+    """
+    Comprar al cruzar umbral_compra y mantener hasta caer a umbral_venta
+    
+    La histéresis se resuelve sin bucles: 1 en las entradas, 0 en las
+    salidas y arrastre del último estado entre medias.
+    
+    Returns:
+        panel de pesos iguales entre las posiciones abiertas
+    """
+    estado = pd.DataFrame(np.nan, index=ivr.index, columns=ivr.columns)
+    estado = estado.mask(ivr >= umbral_compra, 1.0).mask(ivr <= umbral_venta, 0.0)
+    en_cartera = estado.ffill().fillna(0.0).to_numpy() > 0
+    return _normalizar(en_cartera, ivr)
+
+
+def pesos_universo(precios):
+    """Referencia: igual peso en todos los tickers con precio ese día"""
+    return _normalizar(~np.isnan(precios.to_numpy(dtype=float)), precios)
+
+
+def _normalizar(seleccion, plantilla):
+    cuenta = seleccion.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pesos = np.where(cuenta > 0, seleccion / cuenta, 0.0)
+    return pd.DataFrame(pesos, index=plantilla.index, columns=plantilla.columns)
+
+
+def simular_cartera(pesos, precios, rebalanceo=1, coste_bps=10.0):
+    """
+    Rentabilidad diaria de una cartera con rebalanceo periódico y costes
+    
+    Los pesos decididos al cierre de t se aplican al retorno de t a t+1 (sin
+    mirar al futuro). Entre rebalanceos se mantienen los pesos objetivo; el
+    coste se cobra sobre el turnover (suma de |Δpeso|) de cada rebalanceo.
+    
+    Args:
+        pesos: panel de pesos objetivo (pesos_top_n / pesos_umbral)
+        precios: panel de cierres con el mismo índice y columnas
+        rebalanceo: sesiones entre rebalanceos (1 = diario, 5 = semanal, 21 = mensual)
+        coste_bps: coste por unidad de turnover, en puntos básicos
+    
+    Returns:
+        DataFrame por fecha con retorno_bruto, turnover, coste, retorno_neto y capital
+    """
+    w = pesos.to_numpy(dtype=float)
+    filas = np.arange(len(w))
+    w = np.where((filas % rebalanceo == 0)[:, None], w, np.nan)
+    w = pd.DataFrame(w).ffill().fillna(0.0).to_numpy()
+    
+    p = precios.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retornos = p[1:] / p[:-1] - 1
+    retornos = np.nan_to_num(retornos, nan=0.0, posinf=0.0, neginf=0.0)
+    
+    retorno_bruto = np.concatenate([[0.0], (w[:-1] * retornos).sum(axis=1)])
+    turnover = np.abs(np.diff(w, axis=0, prepend=0.0)).sum(axis=1)
+    coste = turnover * coste_bps / 10000
+    retorno_neto = retorno_bruto - coste
+    
+    return pd.DataFrame({
+        'retorno_bruto': retorno_bruto,
+        'turnover': turnover,
+        'coste': coste,
+        'retorno_neto': retorno_neto,
+        'capital': np.cumprod(1 + retorno_neto),
+    }, index=precios.index)
+
+
+def metricas(resultado, sesiones_año=252):
+    """CAGR, volatilidad, Sharpe (sin tasa libre), máximo drawdown y turnover anual"""
+    capital = resultado['capital']
+    retornos = resultado['retorno_neto']
+    años = max(len(resultado) / sesiones_año, 1 / sesiones_año)
+    volatilidad = retornos.std() * np.sqrt(sesiones_año)
+    return {
+        'cagr': capital.iloc[-1] ** (1 / años) - 1,
+        'volatilidad': volatilidad,
+        'sharpe': retornos.mean() * sesiones_año / volatilidad if volatilidad > 0 else np.nan,
+        'max_drawdown': (capital / capital.cummax() - 1).min(),
+        'turnover_anual': resultado['turnover'].sum() / años,
+    }
+
+
+def retornos_por_decil(ivr, precios, horizonte=21):
+    """
+    Retorno futuro medio por decil de IVR
+    
+    Args:
+        ivr: panel de IVR
+        precios: panel de cierres
+        horizonte: sesiones hacia delante (21 ≈ un mes)
+    
+    Los deciles se asignan solo entre los tickers aprobados (IVR > 0); los
+    que no pasan filtros (IVR 0) forman su propio grupo, el decil 0.
+    
+    Returns:
+        DataFrame por decil (0 = no pasan filtros, 1 = IVR más bajo, 10 = más
+        alto) con retorno medio, mediana, % positivos y observaciones
+    """
+    p = precios.to_numpy(dtype=float)
+    futuro = np.full_like(p, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        futuro[:-horizonte] = p[horizonte:] / p[:-horizonte] - 1
+    
+    aprobados = ivr > 0
+    percentil = ivr.where(aprobados).rank(axis=1, pct=True, method='average').to_numpy()
+    decil = np.where(aprobados.to_numpy(), np.ceil(percentil * 10),
+                     np.where(ivr.notna().to_numpy(), 0.0, np.nan))
+    validos = ~np.isnan(decil) & ~np.isnan(futuro)
+    
+    df = pd.DataFrame({'decil': decil[validos].astype(int), 'retorno': futuro[validos]})
+    resumen = df.groupby('decil')['retorno'].agg(
+        retorno_medio='mean',
+        retorno_mediana='median',
+        positivos=lambda r: (r > 0).mean(),
+        observaciones='size',
+    )
+    return resumen
+
+
+def comparar_estrategias(ivr, precios, estrategias, rebalanceo=5, coste_bps=10.0):
+    """
+    Métricas de varias estrategias sobre los mismos paneles
+    
+    Args:
+        estrategias: dict nombre -> panel de pesos
+        rebalanceo/coste_bps: ver simular_cartera
+    
+    Returns:
+        (DataFrame de métricas por estrategia, dict nombre -> resultado diario)
+    """
+    resultados = {
+        nombre: simular_cartera(pesos, precios, rebalanceo, coste_bps)
+        for nombre, pesos in estrategias.items()
+    }
+    tabla = pd.DataFrame({nombre: metricas(r) for nombre, r in resultados.items()}).T
+    return tabla, resultados
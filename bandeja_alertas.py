@@ -0,0 +1,267 @@
+"""
+Bandeja de Salida de Alertas
+Cola persistente en disco y envío en segundo plano con una sesión SMTP reutilizada
+"""
+
+import smtplib
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from datetime import datetime
+import threading
+import time
+import json
+import os
+import uuid
+
+
+class BandejaAlertas:
+    """Guarda cada alerta como un JSON en disco y la envía desde un hilo propio"""
+    
+    def __init__(self, config, directorio='bandeja_alertas', fabrica_smtp=None,
+                 max_intentos=8, espera_base=2.0, espera_maxima=300.0,
+                 cierre_inactividad=60.0, timeout_smtp=30.0):
+        """
+        Args:
+            config: dict de SistemaAlertas (smtp_server, smtp_port, email_origen, password...);
+                    se lee en cada conexión, así que los cambios de credenciales se aplican
+            directorio: carpeta con pendientes/, enviados/ y fallidos/
+            fabrica_smtp: callable(host, port, timeout) -> objeto tipo smtplib.SMTP
+                          (None = smtplib.SMTP; en pruebas, un servidor local o un doble)
+            max_intentos: intentos antes de mover la alerta a fallidos/ (solo cuentan
+                          los errores del propio mensaje, no las caídas del servidor)
+            espera_base/espera_maxima: backoff exponencial entre reintentos (segundos)
+            cierre_inactividad: segundos sin envíos tras los que se cierra la sesión
+            timeout_smtp: timeout de socket, para que un servidor colgado no bloquee el hilo
+        """
+        self.config = config
+        self.directorio = directorio
+        self.fabrica_smtp = fabrica_smtp or smtplib.SMTP
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.cierre_inactividad = cierre_inactividad
+        self.timeout_smtp = timeout_smtp
+        
+        for carpeta in ('pendientes', 'enviados', 'fallidos'):
+            os.makedirs(os.path.join(directorio, carpeta), exist_ok=True)
+        
+        self._smtp = None
+        self._ultimo_uso = 0.0
+        self._pausa_hasta = 0.0   # tras un fallo de conexión no se prueba antes
+        self._fallos_conexion = 0  # fallos de conexión seguidos (backoff de la sesión)
+        self._hilo = None
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        self._lock = threading.Lock()
+    
+    def _ruta(self, carpeta, nombre=''):
+        return os.path.join(self.directorio, carpeta, nombre)
+    
+    def _escribir(self, ruta, alerta):
+        """Escritura atómica: temporal + rename"""
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(alerta, f)
+        os.replace(temporal, ruta)
+    
+    def encolar(self, asunto, html, remitente=None, destinatario=None):
+        """
+        Guardar una alerta en la bandeja (no toca la red)
+        
+        Returns:
+            id de la alerta
+        """
+        id_alerta = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{uuid.uuid4().hex[:8]}"
+        alerta = {
+            'id': id_alerta,
+            'asunto': asunto,
+            'html': html,
+            'remitente': remitente or self.config.get('email_origen', ''),
+            'destinatario': destinatario or self.config.get('email_destino', ''),
+            'creada': time.time(),
+            'intentos': 0,
+            'proximo_intento': 0.0,
+            'ultimo_error': None,
+        }
+        self._escribir(self._ruta('pendientes', f'{id_alerta}.json'), alerta)
+        self._despertar.set()
+        return id_alerta
+    
+    def pendientes(self):
+        """Nombres de archivo de las alertas por enviar, en orden de llegada"""
+        return sorted(f for f in os.listdir(self._ruta('pendientes')) if f.endswith('.json'))
+    
+    def contar(self):
+        """dict carpeta -> número de alertas"""
+        return {carpeta: len([f for f in os.listdir(self._ruta(carpeta)) if f.endswith('.json')])
+                for carpeta in ('pendientes', 'enviados', 'fallidos')}
+    
+    # Sesión SMTP
+    
+    def _sesion(self):
+        """Sesión SMTP autenticada, reutilizada mientras siga viva"""
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except (smtplib.SMTPException, OSError):
+                self._cerrar_sesion()
+        
+        smtp = self.fabrica_smtp(self.config['smtp_server'], self.config['smtp_port'],
+                                 timeout=self.timeout_smtp)
+        try:
+            if self.config.get('smtp_starttls', True):
+                smtp.starttls()
+            if self.config.get('password'):
+                smtp.login(self.config['email_origen'], self.config['password'])
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+            raise
+        self._smtp = smtp
+        return smtp
+    
+    def _cerrar_sesion(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+        self._smtp = None
+    
+    @staticmethod
+    def _es_error_conexion(error):
+        """Fallo del servidor o de la red (no de un mensaje concreto)"""
+        if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                              smtplib.SMTPAuthenticationError)):
+            return True
+        # SMTPException hereda de OSError: los rechazos por mensaje no cuentan
+        return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+    
+    def _mensaje(self, alerta):
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = alerta['asunto']
+        msg['From'] = alerta['remitente']
+        msg['To'] = alerta['destinatario']
+        msg.attach(MIMEText(alerta['html'], 'html'))
+        return msg
+    
+    # Envío
+    
+    def procesar_pendientes(self):
+        """
+        Intentar enviar las alertas cuyo reintento ya toca
+        
+        Returns:
+            segundos hasta el próximo reintento (None si no queda nada pendiente)
+        """
+        with self._lock:
+            # Servidor caído: esperar el backoff en lugar de abrir una
+            # conexión por cada alerta pendiente
+            pausa = self._pausa_hasta - time.time()
+            if pausa > 0:
+                return pausa if self.pendientes() else None
+            
+            proximo = None
+            for nombre in self.pendientes():
+                if self._detener.is_set():
+                    break
+                ruta = self._ruta('pendientes', nombre)
+                try:
+                    with open(ruta, 'r') as f:
+                        alerta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                
+                ahora = time.time()
+                if alerta['proximo_intento'] > ahora:
+                    espera = alerta['proximo_intento'] - ahora
+                    proximo = espera if proximo is None else min(proximo, espera)
+                    continue
+                
+                conexion = True
+                try:
+                    sesion = self._sesion()
+                    conexion = False
+                    sesion.send_message(self._mensaje(alerta))
+                    self._ultimo_uso = time.time()
+                    self._fallos_conexion = 0
+                except Exception as e:
+                    conexion = conexion or self._es_error_conexion(e)
+                    # Sesión dudosa: la próxima vez se abre una nueva
+                    self._cerrar_sesion()
+                    if conexion:
+                        # Sin servidor las demás fallarían igual: cortar la pasada.
+                        # El backoff es de la sesión y la alerta no gasta intentos,
+                        # así que una caída larga no la manda a fallidos/
+                        self._fallos_conexion += 1
+                        espera = min(self.espera_base * 2 ** (self._fallos_conexion - 1),
+                                     self.espera_maxima)
+                        self._pausa_hasta = time.time() + espera
+                        print(f"⚠️  Servidor SMTP no disponible ({e}); "
+                              f"reintento en {espera:.0f}s")
+                        proximo = espera if proximo is None else min(proximo, espera)
+                        break
+                    
+                    # Error propio del mensaje (destinatario rechazado, datos...)
+                    alerta['intentos'] += 1
+                    alerta['ultimo_error'] = str(e)
+                    if alerta['intentos'] >= self.max_intentos:
+                        self._escribir(ruta, alerta)
+                        os.replace(ruta, self._ruta('fallidos', nombre))
+                        print(f"❌ Alerta {alerta['id']} descartada tras "
+                              f"{alerta['intentos']} intentos: {e}")
+                        espera = self.espera_base
+                    else:
+                        espera = min(self.espera_base * 2 ** (alerta['intentos'] - 1),
+                                     self.espera_maxima)
+                        alerta['proximo_intento'] = time.time() + espera
+                        self._escribir(ruta, alerta)
+                    proximo = espera if proximo is None else min(proximo, espera)
+                    continue
+                
+                alerta['enviada'] = time.time()
+                self._escribir(ruta, alerta)
+                os.replace(ruta, self._ruta('enviados', nombre))
+                print(f"✅ Alerta enviada a {alerta['destinatario']}")
+            
+            return proximo
+    
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                proximo = self.procesar_pendientes()
+            except Exception as e:
+                print(f"❌ Error en la bandeja de alertas: {e}")
+                proximo = self.espera_base
+            
+            if self._smtp is not None and time.time() - self._ultimo_uso >= self.cierre_inactividad:
+                self._cerrar_sesion()
+            
+            espera = self.cierre_inactividad if proximo is None else min(proximo, self.cierre_inactividad)
+            self._despertar.wait(espera)
+            self._despertar.clear()
+        
+        self._cerrar_sesion()
+    
+    def iniciar(self):
+        """Arrancar el hilo de envío (reanuda lo que quedara pendiente en disco)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name='bandeja_alertas', daemon=True)
+        self._hilo.start()
+    
+    def detener(self, timeout=None):
+        """Parar el hilo; lo no enviado sigue en pendientes/ para el próximo arranque"""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
@@ -0,0 +1,114 @@
+"""
+Barrido de Pesos del IVR
+Evalúa miles de combinaciones (valoración, calidad, timing) sobre los sub-scores
+de un escaneo con un solo producto de matrices, sin volver a descargar datos
+"""
+
+import numpy as np
+import pandas as pd
+
+
+COMPONENTES = ['valoracion', 'calidad', 'timing']
+PESOS_REFERENCIA = {'valoracion': 0.60, 'calidad': 0.30, 'timing': 0.10}
+
+
+def malla_simplex(paso=0.02):
+    """
+    Todas las combinaciones de pesos no negativos que suman 1, en múltiplos de `paso`
+    
+    Returns:
+        array (combinaciones x 3) en el orden de COMPONENTES
+    """
+    n = int(round(1 / paso))
+    i, j = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing='ij')
+    validos = i + j <= n
+    i, j = i[validos], j[validos]
+    return np.column_stack([i, j, n - i - j]) / n
+
+
+def matriz_ivr(df_snapshot, pesos):
+    """
+    IVR de cada ticker con cada combinación de pesos
+    
+    Args:
+        df_snapshot: resultado de escanear_lista (sub-scores y pasa_filtros)
+        pesos: array (combinaciones x 3) o dict de pesos
+    
+    Returns:
+        array (tickers x combinaciones); 0 en los tickers que no pasan filtros,
+        igual que ScreenerIVR.recalcular_ivr
+    """
+    if isinstance(pesos, dict):
+        pesos = np.array([[pesos[c] for c in COMPONENTES]])
+    scores = df_snapshot[['score_valoracion', 'score_calidad', 'score_timing']].to_numpy(dtype=float)
+    pasa = df_snapshot['pasa_filtros'].to_numpy(dtype=bool)
+    return np.where(pasa[:, None], scores @ np.asarray(pesos, dtype=float).T, 0.0)
+
+
+def _rangos(ivr):
+    """Posición de cada ticker (0 = mejor) en cada columna; empates por orden de fila"""
+    orden = np.argsort(-ivr, axis=0, kind='stable')
+    rangos = np.empty_like(orden)
+    np.put_along_axis(rangos, orden, np.arange(ivr.shape[0])[:, None], axis=0)
+    return rangos
+
+
+def barrer_pesos(df_snapshot, paso=0.02, top_n=10, pesos_referencia=None):
+    """
+    Estabilidad del ranking a lo largo del simplex de pesos
+    
+    Solo se ordenan los tickers que pasan filtros: los rechazados tienen IVR 0
+    con cualquier combinación y formarían una cola fija que infla Spearman.
+    
+    Args:
+        df_snapshot: resultado de escanear_lista
+        paso: resolución de la malla (0.02 = 1.326 combinaciones, 0.01 = 5.151)
+        top_n: tamaño del top con el que se mide el solapamiento
+        pesos_referencia: ranking de comparación (None = pesos por defecto)
+    
+    Returns:
+        (combinaciones, tickers):
+        - combinaciones: una fila por combinación con sus pesos, el solapamiento
+          del top-N con el de referencia, la correlación de Spearman y el líder
+        - tickers: frecuencia en el top-N y rango medio/mejor/peor por ticker
+          aprobado
+    """
+    pesos_referencia = pesos_referencia or PESOS_REFERENCIA
+    malla = malla_simplex(paso)
+    aprobados = df_snapshot[df_snapshot['pasa_filtros'].to_numpy(dtype=bool)]
+    n_tickers = len(aprobados)
+    if n_tickers == 0:
+        raise ValueError("Ningún ticker pasa los filtros: no hay ranking que comparar")
+    top_n = min(top_n, n_tickers)
+    
+    ivr = matriz_ivr(aprobados, malla)
+    rangos = _rangos(ivr)
+    rangos_ref = _rangos(matriz_ivr(aprobados, pesos_referencia))[:, 0]
+    
+    en_top = rangos < top_n
+    en_top_ref = rangos_ref < top_n
+    solapamiento = (en_top & en_top_ref[:, None]).sum(axis=0) / top_n
+    
+    # Rangos sin empates: Spearman = 1 - 6·Σd² / (n·(n²-1))
+    if n_tickers > 1:
+        d2 = ((rangos - rangos_ref[:, None]) ** 2).sum(axis=0)
+        spearman = 1 - 6 * d2 / (n_tickers * (n_tickers ** 2 - 1))
+    else:
+        spearman = np.ones(len(malla))
+    
+    tickers = aprobados['ticker'].to_numpy()
+    combinaciones = pd.DataFrame(malla, columns=COMPONENTES)
+    combinaciones['solapamiento_top'] = solapamiento
+    combinaciones['spearman'] = spearman
+    combinaciones['lider'] = tickers[np.argmin(rangos, axis=0)]
+    
+    resumen_tickers = pd.DataFrame({
+        'ticker': tickers,
+        'frecuencia_top': en_top.mean(axis=1),
+        'rango_medio': rangos.mean(axis=1) + 1,
+        'mejor_rango': rangos.min(axis=1) + 1,
+        'peor_rango': rangos.max(axis=1) + 1,
+        'rango_referencia': rangos_ref + 1,
+    }).sort_values(['frecuencia_top', 'rango_medio'], ascending=[False, True])
+    
+    return combinaciones, resumen_tickers.reset_index(drop=True)
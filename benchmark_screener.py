@@ -0,0 +1,383 @@
+"""
+Benchmark del Screener
+Universos sintéticos reproducibles (100, 1.000, 10.000 tickers) para medir el
+rendimiento de ScreenerIVR sin red y comparar resultados entre versiones
+"""
+
+import numpy as np
+import pandas as pd
+from contextlib import redirect_stdout
+from datetime import datetime
+import subprocess
+import tracemalloc
+import platform
+import argparse
+import time
+import json
+import io
+import os
+import zlib
+from proveedores_datos import ProveedorDatos, _recortar_periodo
+from screener_ivr import ScreenerIVR
+
+
+SECTORES = ['Technology', 'Healthcare', 'Financial Services', 'Energy',
+            'Consumer Cyclical', 'Industrials', 'Utilities', 'Real Estate']
+
+# Texto de relleno del tamaño típico de longBusinessSummary en ticker.info
+_RESUMEN = ("Synthetic company used for screener benchmarks. " * 24).strip()
+
+
+class ProveedorSintetico(ProveedorDatos):
+    """
+    Info e historial generados a partir de una semilla (sin red ni disco)
+    
+    El mismo ticker con la misma semilla devuelve siempre los mismos datos,
+    así dos versiones del screener procesan exactamente el mismo universo.
+    """
+    
+    def __init__(self, semilla=42, dias=300, fecha_final='2024-12-31', latencia=0.0):
+        """
+        Args:
+            semilla: semilla base de los datos
+            dias: sesiones de historial por ticker
+            fecha_final: última sesión del historial
+            latencia: segundos de espera por petición (simula la red; 0 = sin espera)
+        """
+        self.semilla = semilla
+        self.latencia = latencia
+        self.fechas = pd.bdate_range(end=fecha_final, periods=dias)
+    
+    def _generador(self, ticker_symbol):
+        return np.random.default_rng([self.semilla, zlib.crc32(ticker_symbol.encode())])
+    
+    def _esperar(self):
+        if self.latencia > 0:
+            time.sleep(self.latencia)
+    
+    def obtener_info(self, ticker_symbol):
+        self._esperar()
+        rng = self._generador(ticker_symbol)
+        precio = float(rng.lognormal(4.0, 0.8))
+        acciones = float(rng.integers(50, 5000)) * 1e6
+        ingresos = precio * acciones * float(rng.uniform(0.2, 3.0))
+        margen_fcf = float(rng.normal(0.08, 0.10))
+        ebitda = ingresos * float(rng.uniform(0.05, 0.35))
+        
+        return {
+            'symbol': ticker_symbol,
+            'longName': f'{ticker_symbol} Synthetic Corp',
+            'sector': SECTORES[int(rng.integers(len(SECTORES)))],
+            'longBusinessSummary': _RESUMEN,
+            'currentPrice': precio,
+            'trailingPE': float(rng.uniform(5, 60)),
+            'forwardPE': float(rng.uniform(5, 45)),
+            'priceToBook': float(rng.uniform(0.5, 12)),
+            'priceToSalesTrailing12Months': float(rng.uniform(0.3, 15)),
+            'enterpriseToEbitda': float(rng.uniform(3, 40)),
+            'freeCashflow': ingresos * margen_fcf,
+            'earningsGrowth': float(rng.normal(0.08, 0.15)),
+            'revenueGrowth': float(rng.normal(0.06, 0.10)),
+            'totalDebt': ingresos * float(rng.uniform(0, 1.5)),
+            'totalCash': ingresos * float(rng.uniform(0, 0.6)),
+            'sharesOutstanding': acciones,
+            'debtToEquity': float(rng.uniform(0, 250)),
+            'currentRatio': float(rng.uniform(0.4, 4.0)),
+            'trailingEps': float(rng.normal(2.0, 3.0)),
+            'ebitda': ebitda,
+            'interestExpense': -ebitda * float(rng.uniform(0.01, 0.8)),
+            'marketCap': precio * acciones,
+            'totalRevenue': ingresos,
+        }
+    
+    def obtener_historial(self, ticker_symbol, period="1y", start=None):
+        self._esperar()
+        rng = self._generador(ticker_symbol)
+        precio_final = float(rng.lognormal(4.0, 0.8))   # mismo primer número que info
+        n = len(self.fechas)
+        
+        retornos = rng.normal(0.0003, 0.02, n)
+        cierre = precio_final * np.exp(np.cumsum(retornos) - retornos.sum())
+        rango = np.abs(rng.normal(0, 0.01, n))
+        hist = pd.DataFrame({
+            'Open': cierre * (1 + rng.normal(0, 0.005, n)),
+            'High': cierre * (1 + rango),
+            'Low': cierre * (1 - rango),
+            'Close': cierre,
+            'Volume': rng.integers(100_000, 10_000_000, n),
+        }, index=self.fechas)
+        return _recortar_periodo(hist, period, start)
+
+
+def universo_sintetico(n):
+    """Símbolos SYN00000, SYN00001..."""
+    return [f'SYN{i:05d}' for i in range(n)]
+
+
+def _silencioso(funcion, *args, **kwargs):
+    """Ejecutar sin los prints de progreso por ticker"""
+    with redirect_stdout(io.StringIO()):
+        return funcion(*args, **kwargs)
+
+
+def _mejor_tiempo(funcion, repeticiones):
+    """Mínimo de varias ejecuciones (el menos afectado por ruido del sistema)"""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def medir_universo(n_tickers, repeticiones=3, max_workers=1, memoria=True, semilla=42,
+                   prefiltro=False):
+    """
+    Medir un universo sintético de n_tickers
+    
+    Args:
+        n_tickers: tamaño del universo
+        repeticiones: ejecuciones por medida (se guarda la mejor)
+        max_workers: hilos de escanear_lista
+        memoria: medir también el pico de memoria (ejecución aparte con tracemalloc)
+        semilla: semilla del universo
+        prefiltro: escaneo en dos fases (escanear_lista(prefiltro=True))
+    
+    Returns:
+        dict con tiempos (s), throughput (tickers/s) y memoria (MB)
+    """
+    proveedor = ProveedorSintetico(semilla=semilla)
+    tickers = universo_sintetico(n_tickers)
+    
+    def nuevo_screener():
+        return ScreenerIVR(proveedor=proveedor, max_workers=max_workers)
+    
+    # 1. Escaneo completo: descarga en lote, timing vectorizado y calcular_ivr
+    escaneo_s, df = _mejor_tiempo(
+        lambda: _silencioso(nuevo_screener().escanear_lista, tickers, prefiltro=prefiltro),
+        repeticiones
+    )
+    
+    # 2. Puntuación por ticker con los historiales ya en memoria
+    screener = nuevo_screener()
+    _silencioso(screener.precargar_historiales, tickers)
+    puntuacion_s, _ = _mejor_tiempo(
+        lambda: [screener.calcular_ivr(t) for t in tickers], repeticiones
+    )
+    screener.liberar_historiales()
+    
+    # 3. Re-puntuación vectorizada de la tabla de fundamentales
+    tabla = screener.tabla_fundamentales()
+    vectorizado_s, _ = _mejor_tiempo(lambda: screener.puntuar_tabla(tabla), repeticiones)
+    
+    resultado = {
+        'tickers': n_tickers,
+        'filas': len(df),
+        'aprobados': int(df['pasa_filtros'].sum()) if not df.empty else 0,
+        'escaneo_s': escaneo_s,
+        'escaneo_tickers_s': n_tickers / escaneo_s,
+        'puntuacion_s': puntuacion_s,
+        'puntuacion_tickers_s': n_tickers / puntuacion_s,
+        'vectorizado_s': vectorizado_s,
+        'vectorizado_tickers_s': n_tickers / vectorizado_s,
+        'resultado_mb': float(df.memory_usage(index=True, deep=True).sum()) / 2**20,
+    }
+    
+    # 4. Pico de memoria del escaneo completo (tracemalloc lo ralentiza: aparte)
+    if memoria:
+        tracemalloc.start()
+        try:
+            _silencioso(nuevo_screener().escanear_lista, tickers, prefiltro=prefiltro)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        resultado['memoria_pico_mb'] = pico / 2**20
+    
+    return resultado
+
+
+def _version_codigo():
+    """Commit actual (con '+' si hay cambios sin confirmar); None fuera de git"""
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directorio,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+        cambios = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                 cwd=directorio, capture_output=True, text=True,
+                                 timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return (commit + ('+' if cambios else '')) or None
+
+
+def ejecutar_benchmark(tamaños=(100, 1000, 10000), repeticiones=3, max_workers=1,
+                       memoria=True, etiqueta=None, semilla=42, prefiltro=False):
+    """
+    Medir todos los tamaños de universo
+    
+    Returns:
+        dict de la ejecución: metadatos (versión, máquina, librerías) y resultados
+    """
+    resultados = []
+    for n in tamaños:
+        print(f"⏳ Universo de {n} tickers...")
+        fila = medir_universo(n, repeticiones, max_workers, memoria, semilla, prefiltro)
+        resultados.append(fila)
+        print(f"   Escaneo: {fila['escaneo_s']:.2f}s ({fila['escaneo_tickers_s']:.0f} tickers/s) | "
+              f"Puntuación: {fila['puntuacion_tickers_s']:.0f} tickers/s | "
+              f"Vectorizado: {fila['vectorizado_tickers_s']:.0f} tickers/s"
+              + (f" | Pico: {fila['memoria_pico_mb']:.1f} MB" if 'memoria_pico_mb' in fila else ""))
+    
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'etiqueta': etiqueta,
+        'version': _version_codigo(),
+        'maquina': platform.node(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'max_workers': max_workers,
+        'prefiltro': prefiltro,
+        'repeticiones': repeticiones,
+        'semilla': semilla,
+        'resultados': resultados,
+    }
+
+
+def cargar_ejecuciones(archivo='resultados_benchmark.json'):
+    """Ejecuciones guardadas (la más reciente al final)"""
+    if not os.path.exists(archivo):
+        return []
+    with open(archivo, 'r') as f:
+        return json.load(f)
+
+
+def guardar_ejecucion(ejecucion, archivo='resultados_benchmark.json'):
+    """Añadir una ejecución al archivo de resultados"""
+    ejecuciones = cargar_ejecuciones(archivo)
+    ejecuciones.append(ejecucion)
+    temporal = archivo + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(ejecuciones, f, indent=2)
+    os.replace(temporal, archivo)
+
+
+# Métricas comparadas (en todas, menos es mejor)
+METRICAS = ['escaneo_s', 'puntuacion_s', 'vectorizado_s', 'memoria_pico_mb', 'resultado_mb']
+
+
+def comparar_ejecuciones(actual, referencia, tolerancia=0.10):
+    """
+    Cambio relativo de cada métrica frente a una ejecución de referencia
+    
+    Args:
+        actual/referencia: ejecuciones (ejecutar_benchmark)
+        tolerancia: empeoramiento relativo a partir del cual se marca regresión
+    
+    Returns:
+        DataFrame con tickers, métrica, referencia, actual, cambio y regresion
+    """
+    previas = {r['tickers']: r for r in referencia['resultados']}
+    filas = []
+    for fila in actual['resultados']:
+        previa = previas.get(fila['tickers'])
+        if previa is None:
+            continue
+        for metrica in METRICAS:
+            if metrica not in fila or metrica not in previa or not previa[metrica]:
+                continue
+            cambio = fila[metrica] / previa[metrica] - 1
+            filas.append({
+                'tickers': fila['tickers'],
+                'metrica': metrica,
+                'referencia': previa[metrica],
+                'actual': fila[metrica],
+                'cambio': cambio,
+                'regresion': cambio > tolerancia,
+            })
+    return pd.DataFrame(filas, columns=['tickers', 'metrica', 'referencia', 'actual',
+                                        'cambio', 'regresion'])
+
+
+def buscar_referencia(ejecuciones, actual, etiqueta=None):
+    """
+    Ejecución previa con la que comparar
+    
+    Por defecto la última de la misma máquina, hilos y modo de prefiltro; con
+    etiqueta, la última que la lleve.
+    """
+    for ejecucion in reversed(ejecuciones):
+        if ejecucion is actual:
+            continue
+        if etiqueta is not None:
+            if ejecucion.get('etiqueta') == etiqueta:
+                return ejecucion
+        elif (ejecucion.get('maquina') == actual['maquina'] and
+              ejecucion.get('max_workers') == actual['max_workers'] and
+              ejecucion.get('prefiltro', False) == actual['prefiltro']):
+            return ejecucion
+    return None
+
+
+def imprimir_comparacion(comparacion, referencia):
+    """Tabla de cambios frente a la referencia"""
+    if comparacion.empty:
+        print("\nℹ️  Sin métricas comparables con la referencia")
+        return
+    nombre = referencia.get('etiqueta') or referencia.get('version') or referencia['fecha']
+    print(f"\n📊 Comparación con {nombre} ({referencia['fecha']}):")
+    for fila in comparacion.itertuples():
+        marca = "🔴" if fila.regresion else ("🟢" if fila.cambio < 0 else "⚪")
+        print(f"   {marca} {fila.tickers:>6} {fila.metrica:<16}"
+              f"{fila.referencia:>10.3f} → {fila.actual:>10.3f}  ({fila.cambio:+.1%})")
+    regresiones = int(comparacion['regresion'].sum())
+    if regresiones:
+        print(f"\n⚠️  {regresiones} métricas empeoran más de la tolerancia")
+    else:
+        print("\n✅ Sin regresiones")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ScreenerIVR con universos sintéticos")
+    parser.add_argument('--tamaños', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="tickers por universo")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--hilos', type=int, default=1, help="max_workers de escanear_lista")
+    parser.add_argument('--prefiltro', action='store_true',
+                        help="escaneo en dos fases (reglas de info antes del historial)")
+    parser.add_argument('--sin-memoria', action='store_true',
+                        help="no medir el pico de memoria (más rápido)")
+    parser.add_argument('--etiqueta', help="nombre de esta ejecución (p.ej. una rama)")
+    parser.add_argument('--comparar-con', help="etiqueta de la ejecución de referencia")
+    parser.add_argument('--tolerancia', type=float, default=0.10,
+                        help="empeoramiento relativo que cuenta como regresión")
+    parser.add_argument('--archivo', default='resultados_benchmark.json')
+    parser.add_argument('--no-guardar', action='store_true')
+    args = parser.parse_args()
+    
+    print("="*80)
+    print("⏱️  BENCHMARK SCREENER IVR")
+    print("="*80)
+    
+    ejecucion = ejecutar_benchmark(args.tamaños, args.repeticiones, args.hilos,
+                                   not args.sin_memoria, args.etiqueta,
+                                   prefiltro=args.prefiltro)
+    
+    ejecuciones = cargar_ejecuciones(args.archivo)
+    referencia = buscar_referencia(ejecuciones, ejecucion, args.comparar_con)
+    regresion = False
+    if referencia is not None:
+        comparacion = comparar_ejecuciones(ejecucion, referencia, args.tolerancia)
+        imprimir_comparacion(comparacion, referencia)
+        regresion = bool(comparacion['regresion'].any())
+    
+    if not args.no_guardar:
+        guardar_ejecucion(ejecucion, args.archivo)
+        print(f"\n💾 Resultados guardados en {args.archivo}")
+    
+    return 1 if regresion else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
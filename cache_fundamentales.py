@@ -0,0 +1,122 @@
+"""
+Cache Persistente de Fundamentales
+Guarda en SQLite el dict `info` de cada ticker con tiempo de vida (TTL)
+"""
+
+import sqlite3
+import threading
+import json
+import time
+from contextlib import contextmanager
+
+
+class CacheFundamentales:
+    """Cache en disco de ticker.info con expiración configurable"""
+    
+    def __init__(self, ruta_db='cache_screener.db', ttl_horas=6):
+        """
+        Args:
+            ruta_db: archivo SQLite donde se guarda el cache
+            ttl_horas: horas que un info se considera vigente
+        """
+        self.ruta_db = ruta_db
+        self.ttl_segundos = ttl_horas * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._crear_tabla()
+    
+    @contextmanager
+    def _conectar(self):
+        """Nueva conexión por operación (seguro entre hilos)"""
+        conn = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _crear_tabla(self):
+        """Crear tabla de fundamentales si no existe"""
+        with self._conectar() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fundamentales (
+                    ticker TEXT PRIMARY KEY,
+                    info TEXT NOT NULL,
+                    actualizado REAL NOT NULL
+                )
+            """)
+    
+    def obtener(self, ticker_symbol):
+        """
+        Obtener info vigente del cache
+        
+        Returns:
+            dict info, o None si no existe o expiró
+        """
+        with self._conectar() as conn:
+            fila = conn.execute(
+                "SELECT info, actualizado FROM fundamentales WHERE ticker = ?",
+                (ticker_symbol,)
+            ).fetchone()
+        
+        vigente = fila is not None and time.time() - fila[1] < self.ttl_segundos
+        with self._lock:
+            if vigente:
+                self.hits += 1
+            else:
+                self.misses += 1
+        
+        return json.loads(fila[0]) if vigente else None
+    
+    def guardar(self, ticker_symbol, info):
+        """Guardar (o reemplazar) el info de un ticker"""
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fundamentales (ticker, info, actualizado) "
+                "VALUES (?, ?, ?)",
+                (ticker_symbol, json.dumps(info, default=str), time.time())
+            )
+    
+    def edad_segundos(self, ticker_symbol):
+        """Segundos desde la última descarga del ticker (None si no está)"""
+        with self._conectar() as conn:
+            fila = conn.execute(
+                "SELECT actualizado FROM fundamentales WHERE ticker = ?",
+                (ticker_symbol,)
+            ).fetchone()
+        return time.time() - fila[0] if fila else None
+    
+    def invalidar(self, tickers=None):
+        """
+        Invalidar entradas del cache
+        
+        Args:
+            tickers: símbolo, lista de símbolos o None para vaciar todo
+        """
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        
+        with self._conectar() as conn:
+            if tickers is None:
+                conn.execute("DELETE FROM fundamentales")
+            else:
+                conn.executemany(
+                    "DELETE FROM fundamentales WHERE ticker = ?",
+                    [(t,) for t in tickers]
+                )
+    
+    def estadisticas(self):
+        """Contadores de aciertos/fallos del cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'tasa_acierto': self.hits / total if total else 0.0,
+        }
+    
+    def reiniciar_estadisticas(self):
+        """Poner a cero los contadores"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,136 @@
+"""
+Calendario de Mercado
+Sesiones de la bolsa de Nueva York (NYSE): festivos, cierres anticipados y horario
+"""
+
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+
+def _domingo_pascua(año):
+    """Domingo de Pascua (algoritmo anónimo gregoriano)"""
+    a = año % 19
+    b, c = divmod(año, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(año, mes, dia + 1)
+
+
+def _n_esimo_dia_semana(año, mes, dia_semana, n):
+    """n-ésimo lunes/martes/... del mes (n=-1 = el último)"""
+    if n > 0:
+        primero = date(año, mes, 1)
+        desfase = (dia_semana - primero.weekday()) % 7
+        return primero + timedelta(days=desfase + 7 * (n - 1))
+    siguiente = date(año + (mes == 12), mes % 12 + 1, 1)
+    ultimo = siguiente - timedelta(days=1)
+    return ultimo - timedelta(days=(ultimo.weekday() - dia_semana) % 7)
+
+
+def _observado(fecha):
+    """Festivo en fin de semana: sábado -> viernes, domingo -> lunes"""
+    if fecha.weekday() == 5:
+        return fecha - timedelta(days=1)
+    if fecha.weekday() == 6:
+        return fecha + timedelta(days=1)
+    return fecha
+
+
+class CalendarioMercado:
+    """Días hábiles y horario de la NYSE (hora de Nueva York)"""
+    
+    def __init__(self, zona='America/New_York', apertura=time(9, 30), cierre=time(16, 0),
+                 cierre_anticipado=time(13, 0)):
+        """
+        Args:
+            zona: zona horaria de la bolsa
+            apertura/cierre: horario regular de la sesión
+            cierre_anticipado: cierre de las medias sesiones
+        """
+        self.zona = ZoneInfo(zona)
+        self.apertura = apertura
+        self.cierre = cierre
+        self.cierre_anticipado = cierre_anticipado
+        self._festivos = {}
+    
+    def festivos(self, año):
+        """Conjunto de fechas sin sesión del año"""
+        if año not in self._festivos:
+            dias = {
+                _n_esimo_dia_semana(año, 1, 0, 3),       # Martin Luther King
+                _n_esimo_dia_semana(año, 2, 0, 3),       # Presidents' Day
+                _domingo_pascua(año) - timedelta(days=2),  # Viernes Santo
+                _n_esimo_dia_semana(año, 5, 0, -1),      # Memorial Day
+                _observado(date(año, 7, 4)),             # Independence Day
+                _n_esimo_dia_semana(año, 9, 0, 1),       # Labor Day
+                _n_esimo_dia_semana(año, 11, 3, 4),      # Thanksgiving
+                _observado(date(año, 12, 25)),           # Navidad
+            }
+            # Año Nuevo en sábado no se traslada al viernes 31 de diciembre
+            if date(año, 1, 1).weekday() != 5:
+                dias.add(_observado(date(año, 1, 1)))
+            if año >= 2022:
+                dias.add(_observado(date(año, 6, 19)))   # Juneteenth
+            self._festivos[año] = dias
+        return self._festivos[año]
+    
+    def es_dia_habil(self, fecha):
+        """True si la bolsa abre ese día"""
+        return fecha.weekday() < 5 and fecha not in self.festivos(fecha.year)
+    
+    def hora_cierre(self, fecha):
+        """Hora de cierre del día (13:00 en las medias sesiones)"""
+        medias_sesiones = {
+            _n_esimo_dia_semana(fecha.year, 11, 3, 4) + timedelta(days=1),  # Black Friday
+            date(fecha.year, 12, 24),
+            date(fecha.year, 7, 3),
+        }
+        # 24/12 y 3/7 en viernes ya son festivo observado (es_dia_habil lo excluye)
+        if fecha in medias_sesiones and self.es_dia_habil(fecha):
+            return self.cierre_anticipado
+        return self.cierre
+    
+    def ahora(self):
+        """Hora actual en la zona de la bolsa"""
+        return datetime.now(self.zona)
+    
+    def _local(self, momento):
+        """Convertir a la zona de la bolsa (las fechas naive se toman como hora local)"""
+        momento = momento or self.ahora()
+        return momento.astimezone(self.zona)
+    
+    def mercado_abierto(self, momento=None):
+        """True si hay sesión regular en curso"""
+        momento = self._local(momento)
+        dia = momento.date()
+        if not self.es_dia_habil(dia):
+            return False
+        return self.apertura <= momento.time() < self.hora_cierre(dia)
+    
+    def ultimo_cierre(self, momento=None):
+        """Cierre de la última sesión terminada (datetime con zona)"""
+        momento = self._local(momento)
+        dia = momento.date()
+        while True:
+            if self.es_dia_habil(dia):
+                cierre = datetime.combine(dia, self.hora_cierre(dia), self.zona)
+                if cierre <= momento:
+                    return cierre
+            dia -= timedelta(days=1)
+    
+    def proxima_apertura(self, momento=None):
+        """Apertura de la próxima sesión (la actual si aún no ha empezado)"""
+        momento = self._local(momento)
+        dia = momento.date()
+        while True:
+            if self.es_dia_habil(dia):
+                apertura = datetime.combine(dia, self.apertura, self.zona)
+                if apertura > momento:
+                    return apertura
+            dia += timedelta(days=1)
@@ -0,0 +1,124 @@
+"""
+Consultas sobre el Historial IVR
+Series por ticker, cortes transversales y cruces de umbral sobre los escaneos guardados
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from historial_ivr import HistorialIVR
+
+
+class ConsultasHistorial:
+    """Consultas de solo lectura sobre HistorialIVR (abre solo las particiones necesarias)"""
+    
+    def __init__(self, historial=None):
+        """
+        Args:
+            historial: HistorialIVR a consultar (None = historial_screener/)
+        """
+        self.historial = historial or HistorialIVR()
+    
+    def serie_ticker(self, ticker_symbol, dias=90, desde=None, hasta=None,
+                     columnas=('ivr', 'precio', 'margen_seguridad', 'pasa_filtros')):
+        """
+        Evolución de un ticker a lo largo de los escaneos
+        
+        Args:
+            ticker_symbol: símbolo a consultar
+            dias: ventana hacia atrás desde hoy (si no se indica desde)
+            desde/hasta: rango de fechas explícito
+            columnas: columnas a devolver
+        
+        Returns:
+            DataFrame indexado por timestamp
+        """
+        if desde is None:
+            desde = datetime.now() - timedelta(days=dias)
+        
+        df = self.historial.leer(desde=desde, hasta=hasta, columnas=list(columnas),
+                                 filtros=[('ticker', '==', ticker_symbol)])
+        return df.drop(columns='ticker', errors='ignore').set_index('timestamp')
+    
+    def corte_transversal(self, momento=None, columnas=None, dias=7):
+        """
+        Último valor conocido de cada ticker en o antes de `momento`
+        
+        Los reescaneos parciales solo guardan los tickers reescaneados, así
+        que se toma la observación más reciente de cada ticker en los `dias`
+        anteriores al último escaneo.
+        
+        Args:
+            momento: fecha/hora de referencia (None = último escaneo guardado)
+            columnas: columnas a devolver (None = todas)
+            dias: antigüedad máxima de una observación para seguir vigente
+        
+        Returns:
+            DataFrame ordenado por IVR (vacío si no hay escaneos anteriores)
+        """
+        momento = pd.Timestamp(momento) if momento is not None else None
+        
+        fechas = self.historial.particiones(hasta=momento)
+        if not fechas:
+            return pd.DataFrame(columns=columnas)
+        
+        ultima = pd.Timestamp(fechas[-1])
+        df = self.historial.leer(desde=ultima - timedelta(days=dias), hasta=ultima,
+                                 columnas=columnas)
+        if momento is not None:
+            df = df[df['timestamp'] <= momento]
+        
+        # leer() ordena por timestamp: la última fila de cada ticker es la vigente
+        df = df.drop_duplicates(subset='ticker', keep='last')
+        if 'ivr' in df:
+            df = df.sort_values('ivr', ascending=False)
+        return df.reset_index(drop=True)
+    
+    def cruces_umbral(self, umbral, desde=None, hasta=None, dias=7,
+                      direccion='ambas', tickers=None):
+        """
+        Momentos en que el IVR de un ticker cruza un umbral entre dos escaneos
+        
+        Args:
+            umbral: nivel de IVR (p.ej. el umbral_compra del scheduler)
+            desde/hasta: rango de fechas (desde=None = últimos `dias` días)
+            direccion: 'arriba', 'abajo' o 'ambas'
+            tickers: limitar a estos símbolos (None = todos)
+        
+        Returns:
+            DataFrame con ticker, timestamp, ivr_anterior, ivr y direccion
+        """
+        if desde is None:
+            desde = datetime.now() - timedelta(days=dias)
+        
+        # Incluir la partición previa para detectar cruces en el primer escaneo del rango
+        previas = self.historial.particiones(hasta=pd.Timestamp(desde) - timedelta(days=1))
+        inicio_lectura = previas[-1] if previas else desde
+        
+        filtros = [('ticker', 'in', list(tickers))] if tickers else None
+        df = self.historial.leer(desde=inicio_lectura, hasta=hasta,
+                                 columnas=['ivr'], filtros=filtros)
+        
+        columnas_salida = ['ticker', 'timestamp', 'ivr_anterior', 'ivr', 'direccion']
+        if df.empty:
+            return pd.DataFrame(columns=columnas_salida)
+        
+        df = df.sort_values(['ticker', 'timestamp'], kind='stable')
+        df['ivr_anterior'] = df.groupby('ticker', sort=False)['ivr'].shift()
+        
+        arriba = (df['ivr_anterior'] < umbral) & (df['ivr'] >= umbral)
+        abajo = (df['ivr_anterior'] >= umbral) & (df['ivr'] < umbral)
+        if direccion == 'arriba':
+            cruces = arriba
+        elif direccion == 'abajo':
+            cruces = abajo
+        elif direccion == 'ambas':
+            cruces = arriba | abajo
+        else:
+            raise ValueError(f"Dirección desconocida: {direccion}")
+        
+        cruces &= df['timestamp'] >= pd.Timestamp(desde)
+        eventos = df[cruces].copy()
+        eventos['direccion'] = np.where(arriba[cruces], 'arriba', 'abajo')
+        
+        return eventos[columnas_salida].sort_values('timestamp').reset_index(drop=True)
@@ -4,6 +4,7 @@ Analiza algunos tickers populares y muestra resultados
 """
 
 from screener_ivr import ScreenerIVR
+from barrido_pesos import barrer_pesos
 from listas_tickers import MEGA_CAPS, TECH, VALUE_STOCKS
 import pandas as pd
 
@@ -83,43 +84,42 @@ def ejemplo_comparacion_sectores():
     return df_combined
 
 
-def ejemplo_pesos_personalizados():
-    """Ejemplo con diferentes pesos"""
+def ejemplo_pesos_personalizados(df_snapshot=None):
+    """Ejemplo con diferentes pesos (re-puntúa un solo escaneo, sin red)"""
     print("\n" + "="*80)
     print("⚖️ COMPARACIÓN CON DIFERENTES PESOS")
     print("="*80)
     
-    ticker_test = 'AAPL'
-    
-    # Configuración 1: Value puro
-    print(f"\n1️⃣ VALUE PURO (90% Valoración)")
-    screener1 = ScreenerIVR({
-        'valoracion': 0.90,
-        'calidad': 0.05,
-        'timing': 0.05
-    })
-    result1 = screener1.calcular_ivr(ticker_test)
-    print(f"   {ticker_test} IVR: {result1['ivr']:.2%}")
-    
-    # Configuración 2: Balanceado
-    print(f"\n2️⃣ BALANCEADO (60/30/10)")
-    screener2 = ScreenerIVR({
-        'valoracion': 0.60,
-        'calidad': 0.30,
-        'timing': 0.10
-    })
-    result2 = screener2.calcular_ivr(ticker_test)
-    print(f"   {ticker_test} IVR: {result2['ivr']:.2%}")
-    
-    # Configuración 3: Growth focus
-    print(f"\n3️⃣ GROWTH FOCUS (30% Valoración, 50% Calidad)")
-    screener3 = ScreenerIVR({
-        'valoracion': 0.30,
-        'calidad': 0.50,
-        'timing': 0.20
-    })
-    result3 = screener3.calcular_ivr(ticker_test)
-    print(f"   {ticker_test} IVR: {result3['ivr']:.2%}")
+    # Un único escaneo: los pesos solo combinan sus sub-scores
+    screener = ScreenerIVR()
+    if df_snapshot is None:
+        df_snapshot = screener.escanear_lista(MEGA_CAPS)
+    
+    configuraciones = [
+        ("1️⃣ VALUE PURO (90% Valoración)", {'valoracion': 0.90, 'calidad': 0.05, 'timing': 0.05}),
+        ("2️⃣ BALANCEADO (60/30/10)", {'valoracion': 0.60, 'calidad': 0.30, 'timing': 0.10}),
+        ("3️⃣ GROWTH FOCUS (30% Valoración, 50% Calidad)", {'valoracion': 0.30, 'calidad': 0.50, 'timing': 0.20}),
+    ]
+    for titulo, pesos in configuraciones:
+        df = screener.recalcular_ivr(df_snapshot, pesos)
+        print(f"\n{titulo}")
+        for _, row in df.head(3).iterrows():
+            print(f"   {row['ticker']:6s} IVR: {row['ivr']:.2%}")
+    
+    # Barrido completo del simplex de pesos (solo entre los que pasan filtros)
+    if not df_snapshot['pasa_filtros'].any():
+        print("\n⚠️  Ningún ticker pasa los filtros: no hay ranking que barrer")
+        return
+    combinaciones, tickers = barrer_pesos(df_snapshot, paso=0.02, top_n=3)
+    print(f"\n🔬 Barrido de {len(combinaciones)} combinaciones de pesos:")
+    print(f"   Solapamiento medio del top 3 con 60/30/10: "
+          f"{combinaciones['solapamiento_top'].mean():.0%}")
+    print(f"   Spearman medio: {combinaciones['spearman'].mean():.2f} "
+          f"(mínimo {combinaciones['spearman'].min():.2f})")
+    print("\n   Tickers más estables en el top 3:")
+    for _, row in tickers.head(5).iterrows():
+        print(f"   {row['ticker']:6s} en el top {row['frecuencia_top']:.0%} de las combinaciones "
+              f"(rango medio {row['rango_medio']:.1f})")
     
     print("\n💡 Conclusión: Los pesos afectan significativamente el ranking!")
 
@@ -138,8 +138,8 @@ def main():
         # Ejemplo 2
         df2 = ejemplo_comparacion_sectores()
         
-        # Ejemplo 3
-        ejemplo_pesos_personalizados()
+        # Ejemplo 3 (reutiliza el escaneo del ejemplo 1)
+        ejemplo_pesos_personalizados(df1)
         
         print("\n" + "="*80)
         print("✅ EJEMPLOS COMPLETADOS")
@@ -148,7 +148,7 @@ def main():
         print("   1. Ejecuta 'streamlit run app_screener.py' para la interfaz web")
         print("   2. Ejecuta 'python scheduler_screener.py' para modo automático")
         print("   3. Personaliza los pesos y tickers según tu estrategia")
-        
+    
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
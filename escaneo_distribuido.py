@@ -0,0 +1,597 @@
+"""
+Escaneo Distribuido
+Reparte un universo grande en fragmentos entre varios procesos (o varias
+máquinas con una carpeta compartida) y combina los resultados en un ranking
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout, nullcontext
+from datetime import datetime
+from functools import partial
+import threading
+import argparse
+import io
+import shutil
+import signal
+import socket
+import time
+import json
+import os
+from screener_ivr import ScreenerIVR
+from motor_vectorizado import construir_resultado, aplicar_esquema, ESQUEMA_RESULTADO
+
+
+class ColaFragmentos:
+    """
+    Cola de trabajo en disco: un JSON por fragmento en pendientes/, en_curso/,
+    hechos/ (junto a sus resultados en Parquet) o fallidos/
+    
+    Tomar un fragmento es un os.rename de pendientes/ a en_curso/, atómico en
+    un mismo sistema de archivos, así que varios procesos o máquinas pueden
+    compartir la carpeta sin otro coordinador. Quien lo procesa renueva el
+    lease tocando el archivo (mtime); si pasa duracion_lease sin renovarlo,
+    el fragmento vuelve a pendientes/ para otro trabajador. Entre máquinas
+    los relojes deben estar sincronizados (NTP).
+    """
+    
+    CARPETAS = ('pendientes', 'en_curso', 'hechos', 'fallidos')
+    
+    def __init__(self, directorio='cola_escaneo'):
+        """
+        Args:
+            directorio: carpeta de la cola (la misma ruta compartida en todas las máquinas)
+        """
+        self.directorio = directorio
+        self.config = {}
+        if os.path.exists(self._ruta('cola.json')):
+            with open(self._ruta('cola.json')) as f:
+                self.config = json.load(f)
+        self.duracion_lease = self.config.get('duracion_lease', 300.0)
+        self.max_intentos = self.config.get('max_intentos', 3)
+    
+    def _ruta(self, *partes):
+        return os.path.join(self.directorio, *partes)
+    
+    def _leer(self, ruta):
+        with open(ruta) as f:
+            return json.load(f)
+    
+    def _escribir(self, ruta, datos):
+        """Escritura atómica: temporal + rename"""
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(datos, f)
+        os.replace(temporal, ruta)
+    
+    def crear(self, tickers_list, tamaño_fragmento=500, duracion_lease=300.0, max_intentos=3):
+        """
+        Vaciar la cola y repartir los tickers en fragmentos pendientes
+        
+        Args:
+            tickers_list: universo completo (se conserva el orden)
+            tamaño_fragmento: tickers por fragmento
+            duracion_lease: segundos sin renovar tras los que un fragmento se reasigna
+            max_intentos: fallos de un fragmento antes de moverlo a fallidos/
+        
+        Returns:
+            número de fragmentos
+        """
+        tickers_list = list(dict.fromkeys(tickers_list))
+        for carpeta in self.CARPETAS:
+            shutil.rmtree(self._ruta(carpeta), ignore_errors=True)
+            os.makedirs(self._ruta(carpeta))
+        
+        n_fragmentos = 0
+        for inicio in range(0, len(tickers_list), tamaño_fragmento):
+            id_fragmento = f'{n_fragmentos:05d}'
+            self._escribir(self._ruta('pendientes', f'{id_fragmento}.json'), {
+                'id': id_fragmento,
+                'tickers': tickers_list[inicio:inicio + tamaño_fragmento],
+                'intentos': 0,
+                'errores': [],
+                'trabajador': None,
+            })
+            n_fragmentos += 1
+        
+        self.config = {
+            'creada': datetime.now().isoformat(),
+            'tickers': len(tickers_list),
+            'fragmentos': n_fragmentos,
+            'duracion_lease': duracion_lease,
+            'max_intentos': max_intentos,
+        }
+        self._escribir(self._ruta('cola.json'), self.config)
+        self.duracion_lease = duracion_lease
+        self.max_intentos = max_intentos
+        return n_fragmentos
+    
+    def fragmentos(self, carpeta):
+        """Ids de los fragmentos de una carpeta, en orden"""
+        try:
+            nombres = os.listdir(self._ruta(carpeta))
+        except FileNotFoundError:
+            return []
+        return sorted(n[:-len('.json')] for n in nombres if n.endswith('.json'))
+    
+    def estado(self):
+        """dict carpeta -> número de fragmentos"""
+        return {carpeta: len(self.fragmentos(carpeta)) for carpeta in self.CARPETAS}
+    
+    def _devoluciones(self):
+        """Fragmentos a medio devolver (ver devolver): siguen contando como en curso"""
+        try:
+            return [n for n in os.listdir(self._ruta('en_curso')) if n.endswith('.devolviendo')]
+        except FileNotFoundError:
+            return []
+    
+    def terminada(self):
+        """No queda nada pendiente ni en curso (los fallidos no cuentan)"""
+        return (not self.fragmentos('pendientes') and not self.fragmentos('en_curso')
+                and not self._devoluciones())
+    
+    # Ciclo de vida de un fragmento
+    
+    def tomar(self, trabajador):
+        """
+        Reservar el primer fragmento pendiente
+        
+        Returns:
+            dict del fragmento (id, tickers, intentos...) o None si no hay pendientes
+        """
+        for id_fragmento in self.fragmentos('pendientes'):
+            origen = self._ruta('pendientes', f'{id_fragmento}.json')
+            destino = self._ruta('en_curso', f'{id_fragmento}.json')
+            try:
+                # mtime al día antes del rename: el lease nace vigente
+                os.utime(origen)
+                os.rename(origen, destino)
+            except FileNotFoundError:
+                continue  # otro trabajador se adelantó
+            
+            fragmento = self._leer(destino)
+            fragmento['trabajador'] = trabajador
+            fragmento['pid'] = os.getpid()
+            fragmento['tomado'] = time.time()
+            self._escribir(destino, fragmento)
+            return fragmento
+        return None
+    
+    def renovar(self, id_fragmento):
+        """Renovar el lease; False si el fragmento ya no está en curso"""
+        try:
+            os.utime(self._ruta('en_curso', f'{id_fragmento}.json'))
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def completar(self, fragmento, df, tabla=None):
+        """
+        Guardar el resultado de un fragmento y sacarlo de la cola
+        
+        Si el lease caducó y otro trabajador repite el fragmento, el segundo
+        resultado sustituye al primero (son equivalentes).
+        
+        Args:
+            fragmento: dict devuelto por tomar()
+            df: resultado de escanear_lista
+            tabla: tabla de fundamentales del fragmento (para Monte Carlo y re-puntuar)
+        """
+        id_fragmento = fragmento['id']
+        self._escribir_parquet(df, self._ruta('hechos', f'{id_fragmento}.resultado.parquet'))
+        if tabla is not None and not tabla.empty:
+            self._escribir_parquet(tabla, self._ruta('hechos', f'{id_fragmento}.fundamentales.parquet'))
+        
+        fragmento = {**fragmento, 'completado': time.time(), 'filas': len(df)}
+        self._escribir(self._ruta('hechos', f'{id_fragmento}.json'), fragmento)
+        for carpeta in ('en_curso', 'pendientes'):
+            try:
+                os.remove(self._ruta(carpeta, f'{id_fragmento}.json'))
+            except FileNotFoundError:
+                pass
+    
+    def _escribir_parquet(self, df, ruta):
+        # Arrow directamente: to_parquet intenta serializar df.attrs a JSON
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), temporal)
+        os.replace(temporal, ruta)
+    
+    def devolver(self, id_fragmento, error, contar=True):
+        """
+        Devolver un fragmento en curso a pendientes/ (o a fallidos/ si agota intentos)
+        
+        Args:
+            id_fragmento: fragmento en curso
+            error: motivo que queda en el fragmento
+            contar: gastar un intento (False si el fallo no es del fragmento)
+        
+        Returns:
+            carpeta de destino, o None si ya no estaba en curso
+        """
+        # Reservar el lease con un rename a un nombre propio: solo un
+        # trabajador puede devolverlo y nadie lo toma mientras se actualiza
+        origen = self._ruta('en_curso', f'{id_fragmento}.json')
+        privado = self._ruta('en_curso', f'{id_fragmento}.{socket.gethostname()}-{os.getpid()}'
+                                         f'-{threading.get_ident()}.devolviendo')
+        try:
+            os.rename(origen, privado)
+        except FileNotFoundError:
+            return None  # otro trabajador lo devolvió o completó antes
+        
+        fragmento = self._leer(privado)
+        fragmento['intentos'] += int(contar)
+        fragmento['errores'].append(error)
+        fragmento['trabajador'] = None
+        fragmento.pop('pid', None)
+        carpeta = 'fallidos' if fragmento['intentos'] >= self.max_intentos else 'pendientes'
+        
+        # Contenido definitivo antes de hacerse visible: un único rename al destino
+        self._escribir(privado, fragmento)
+        os.rename(privado, self._ruta(carpeta, f'{id_fragmento}.json'))
+        return carpeta
+    
+    def reasignar_caducados(self, ahora=None):
+        """
+        Devolver a la cola los fragmentos cuyo lease no se renovó a tiempo
+        
+        Returns:
+            lista de ids devueltos
+        """
+        ahora = ahora or time.time()
+        
+        # Devoluciones abandonadas a medias (el proceso murió entre los dos rename)
+        for nombre in self._devoluciones():
+            ruta = self._ruta('en_curso', nombre)
+            try:
+                if ahora - os.path.getmtime(ruta) > self.duracion_lease:
+                    os.rename(ruta, self._ruta('pendientes', f"{nombre.split('.', 1)[0]}.json"))
+            except FileNotFoundError:
+                continue
+        
+        devueltos = []
+        for id_fragmento in self.fragmentos('en_curso'):
+            ruta = self._ruta('en_curso', f'{id_fragmento}.json')
+            try:
+                inactivo = ahora - os.path.getmtime(ruta)
+                trabajador = self._leer(ruta).get('trabajador')
+            except FileNotFoundError:
+                continue
+            if inactivo > self.duracion_lease:
+                destino = self.devolver(id_fragmento, f'lease caducado ({trabajador}, {inactivo:.0f}s)')
+                if destino:
+                    print(f"⚠️  Fragmento {id_fragmento} de {trabajador} sin renovar "
+                          f"{inactivo:.0f}s -> {destino}")
+                    devueltos.append(id_fragmento)
+        return devueltos
+    
+    def liberar(self, prefijo_trabajador, error, culpables=None):
+        """
+        Devolver los fragmentos en curso de unos trabajadores que ya no existen
+        
+        Args:
+            prefijo_trabajador: inicio del identificador de los trabajadores caídos
+            error: motivo que queda en el fragmento
+            culpables: pids de los procesos que murieron por sí mismos; solo sus
+                       fragmentos gastan un intento (None = todos lo gastan)
+        
+        Returns:
+            lista de ids devueltos
+        """
+        devueltos = []
+        for id_fragmento in self.fragmentos('en_curso'):
+            try:
+                fragmento = self._leer(self._ruta('en_curso', f'{id_fragmento}.json'))
+            except FileNotFoundError:
+                continue
+            if not (fragmento.get('trabajador') or '').startswith(prefijo_trabajador):
+                continue
+            contar = culpables is None or fragmento.get('pid') in culpables
+            motivo = error if contar else f'{error} (otro proceso del pool)'
+            if self.devolver(id_fragmento, motivo, contar=contar):
+                devueltos.append(id_fragmento)
+        return devueltos
+    
+    # Resultados
+    
+    def _leer_hechos(self, sufijo):
+        if not os.path.isdir(self._ruta('hechos')):
+            return []
+        rutas = sorted(self._ruta('hechos', n) for n in os.listdir(self._ruta('hechos'))
+                       if n.endswith(sufijo))
+        return [pd.read_parquet(r) for r in rutas]
+    
+    def combinar(self):
+        """
+        Resultados de todos los fragmentos terminados en un único ranking
+        
+        Los fragmentos se concatenan en el orden del universo y se ordenan por
+        IVR con un sort estable: mismo DataFrame que escanear_lista en un solo
+        proceso.
+        
+        Returns:
+            DataFrame con ESQUEMA_RESULTADO; df.attrs['fecha'] = creación de la cola
+        """
+        partes = self._leer_hechos('.resultado.parquet')
+        fecha = datetime.fromisoformat(self.config['creada']) if 'creada' in self.config else None
+        if not partes:
+            return construir_resultado({c: [] for c in ESQUEMA_RESULTADO}, fecha=fecha)
+        
+        df = aplicar_esquema(pd.concat(partes, ignore_index=True))
+        df = df.sort_values('ivr', ascending=False, kind='stable').reset_index(drop=True)
+        df.attrs['fecha'] = fecha
+        return df
+    
+    def tabla_fundamentales(self):
+        """Tablas de fundamentales de los fragmentos terminados, concatenadas"""
+        partes = self._leer_hechos('.fundamentales.parquet')
+        return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    
+    def tickers_fallidos(self):
+        """Tickers de los fragmentos que agotaron sus intentos"""
+        return [t for id_fragmento in self.fragmentos('fallidos')
+                for t in self._leer(self._ruta('fallidos', f'{id_fragmento}.json'))['tickers']]
+
+
+def _mantener_lease(cola, id_fragmento, detener, avance):
+    """
+    Hilo de latido: renovar el lease cada tercio de su duración, solo si el
+    escaneo terminó algún ticker desde la renovación anterior
+    
+    Un trabajador colgado (p.ej. en una llamada de red sin timeout) deja
+    caducar el lease y otro retoma el fragmento.
+    """
+    ultimo = 0
+    while not detener.wait(cola.duracion_lease / 3):
+        if avance[0] == ultimo:
+            continue
+        ultimo = avance[0]
+        if not cola.renovar(id_fragmento):
+            return
+
+
+def procesar_fragmento(cola, fragmento, screener, trabajador, opciones_escaneo=None,
+                       silencioso=True):
+    """
+    Escanear un fragmento ya reservado y guardar su resultado
+    
+    Un error devuelve el fragmento a la cola (con un intento más) en lugar
+    de propagarse, así el trabajador sigue con el siguiente.
+    
+    Returns:
+        True si el fragmento se completó
+    """
+    opciones_escaneo = dict(opciones_escaneo or {})
+    al_resultado = opciones_escaneo.pop('al_resultado', None)
+    avance = [0]  # tickers terminados: el latido solo renueva si avanza
+    
+    def contar_avance(ticker, resultado):
+        avance[0] += 1
+        if al_resultado:
+            al_resultado(ticker, resultado)
+    
+    detener = threading.Event()
+    latido = threading.Thread(target=_mantener_lease,
+                              args=(cola, fragmento['id'], detener, avance), daemon=True)
+    latido.start()
+    inicio = time.perf_counter()
+    try:
+        with redirect_stdout(io.StringIO()) if silencioso else nullcontext():
+            df = screener.escanear_lista(fragmento['tickers'], al_resultado=contar_avance,
+                                         **opciones_escaneo)
+            tabla = screener.tabla_fundamentales(df['ticker'])
+    except Exception as e:
+        destino = cola.devolver(fragmento['id'], f'{trabajador}: {e}')
+        print(f"❌ Fragmento {fragmento['id']} ({trabajador}): {e} -> {destino}")
+        return False
+    finally:
+        detener.set()
+        latido.join()
+        # Memoria acotada: el trabajador no necesita los fragmentos anteriores
+        screener.filas_fundamentales.clear()
+    
+    cola.completar(fragmento, df, tabla)
+    print(f"✅ Fragmento {fragmento['id']} ({trabajador}): {len(df)} tickers "
+          f"en {time.perf_counter() - inicio:.1f}s")
+    return True
+
+
+def ejecutar_trabajador(directorio='cola_escaneo', fabrica_screener=ScreenerIVR, trabajador=None,
+                        opciones_escaneo=None, espera=0.5, esperar_en_curso=True, silencioso=True):
+    """
+    Procesar fragmentos de la cola hasta que no quede trabajo
+    
+    Sirve igual dentro de un ProcessPoolExecutor que como proceso suelto en
+    otra máquina que monte la misma carpeta.
+    
+    Args:
+        directorio: carpeta de la cola
+        fabrica_screener: callable sin argumentos que crea el ScreenerIVR del
+                          trabajador (serializable con pickle, p.ej. un partial)
+        trabajador: identificador en los leases (None = máquina-pid)
+        opciones_escaneo: kwargs de escanear_lista (tamaño_bloque, prefiltro, max_workers...)
+        espera: segundos entre comprobaciones mientras otros terminan
+        esperar_en_curso: seguir vivo mientras haya fragmentos en curso de otros
+                          trabajadores, para recoger los que caduquen
+        silencioso: ocultar los prints por ticker (se informa por fragmento)
+    
+    Returns:
+        número de fragmentos completados por este trabajador
+    """
+    cola = ColaFragmentos(directorio)
+    trabajador = trabajador or f'{socket.gethostname()}-{os.getpid()}'
+    screener = fabrica_screener()
+    completados = 0
+    
+    while True:
+        cola.reasignar_caducados()
+        fragmento = cola.tomar(trabajador)
+        if fragmento is None:
+            if cola.terminada() or not esperar_en_curso:
+                return completados
+            time.sleep(espera)
+            continue
+        if procesar_fragmento(cola, fragmento, screener, trabajador, opciones_escaneo, silencioso):
+            completados += 1
+
+
+def _procesos_caidos(procesos_pool):
+    """pids del pool que terminaron de forma anormal sin que el pool los matara"""
+    return {pid for pid, proceso in procesos_pool.items()
+            if proceso.exitcode not in (None, 0, -signal.SIGTERM)}
+
+
+def escanear_distribuido(tickers_list, procesos=None, directorio='cola_escaneo',
+                         fabrica_screener=ScreenerIVR, tamaño_fragmento=500,
+                         opciones_escaneo=None, duracion_lease=300.0, max_intentos=3,
+                         screener=None, reanudar=False, intervalo_progreso=10.0):
+    """
+    Escanear un universo repartido en fragmentos entre varios procesos
+    
+    Cada proceso ejecuta su propio ScreenerIVR (sin compartir el GIL) sobre
+    fragmentos de la cola en disco. Si un proceso muere, el pool se recrea y
+    sus fragmentos en curso vuelven a la cola; otras máquinas pueden unirse
+    a la misma cola con ejecutar_trabajador mientras dura el escaneo.
+    
+    Args:
+        tickers_list: universo completo
+        procesos: procesos trabajadores (None = núcleos de la máquina)
+        directorio: carpeta de la cola
+        fabrica_screener: callable serializable que crea el ScreenerIVR de cada proceso
+        tamaño_fragmento: tickers por fragmento
+        opciones_escaneo: kwargs de escanear_lista para cada fragmento
+        duracion_lease/max_intentos: ver ColaFragmentos.crear
+        screener: ScreenerIVR local que recibe ultimo_snapshot y los fundamentales
+                  de los fragmentos (tabla_fundamentales, recalcular_ivr, Monte Carlo)
+        reanudar: continuar la cola existente en lugar de crearla de nuevo
+        intervalo_progreso: segundos entre líneas de progreso
+    
+    Returns:
+        DataFrame combinado (ver ColaFragmentos.combinar)
+    """
+    procesos = procesos or os.cpu_count() or 1
+    cola = ColaFragmentos(directorio)
+    if not reanudar or not cola.config:
+        cola.crear(tickers_list, tamaño_fragmento, duracion_lease, max_intentos)
+    total = cola.config['fragmentos']
+    print(f"🧩 Escaneo distribuido: {cola.config['tickers']} tickers en {total} "
+          f"fragmentos, {procesos} procesos")
+    
+    etiqueta = f'{socket.gethostname()}-{os.getpid()}'
+    inicio = time.perf_counter()
+    ronda = 0
+    while not cola.terminada():
+        prefijo = f'{etiqueta}-r{ronda}-'
+        procesos_pool = {}
+        try:
+            with ProcessPoolExecutor(max_workers=procesos) as executor:
+                en_marcha = {
+                    executor.submit(ejecutar_trabajador, directorio, fabrica_screener,
+                                    f'{prefijo}{i}', opciones_escaneo)
+                    for i in range(procesos)
+                }
+                # pid -> proceso, para saber después cuál murió por sí mismo
+                procesos_pool.update(getattr(executor, '_processes', None) or {})
+                while en_marcha:
+                    terminados, en_marcha = wait(en_marcha, timeout=intervalo_progreso)
+                    for futuro in terminados:
+                        futuro.result()
+                    estado = cola.estado()
+                    print(f"📦 {estado['hechos']}/{total} fragmentos — "
+                          f"{estado['en_curso']} en curso, {estado['fallidos']} fallidos")
+                    if en_marcha and cola.terminada():
+                        # Un trabajador colgado cuyo fragmento ya retomó otro no
+                        # termina nunca: margen de un intervalo y se detiene
+                        _, en_marcha = wait(en_marcha, timeout=intervalo_progreso)
+                        if en_marcha:
+                            print(f"⚠️  {len(en_marcha)} trabajadores colgados; se detienen")
+                            for proceso in procesos_pool.values():
+                                proceso.terminate()
+                        break
+        except BrokenProcessPool:
+            # Al morir un proceso se detiene todo el pool y sus fragmentos vuelven
+            # a la cola; solo gasta intento el del proceso que murió solo (los
+            # demás los terminó el pool con SIGTERM)
+            culpables = _procesos_caidos(procesos_pool)
+            devueltos = cola.liberar(prefijo, 'proceso trabajador terminado de forma anormal',
+                                     culpables=culpables or None)
+            print(f"⚠️  Un proceso trabajador murió; {len(devueltos)} fragmentos "
+                  f"vuelven a la cola")
+            ronda += 1
+    
+    df = cola.combinar()
+    segundos = time.perf_counter() - inicio
+    print(f"✅ {len(df)} tickers en {segundos:.1f}s ({len(df) / max(segundos, 1e-9):.0f} tickers/s)")
+    fallidos = cola.tickers_fallidos()
+    if fallidos:
+        print(f"❌ {len(fallidos)} tickers en fragmentos fallidos (ver {cola._ruta('fallidos')})")
+    
+    if screener is not None:
+        screener.ultimo_snapshot = df
+        tabla = cola.tabla_fundamentales()
+        if not tabla.empty:
+            screener.filas_fundamentales.update(
+                (fila['ticker'], fila) for fila in tabla.to_dict('records')
+            )
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escaneo de ScreenerIVR repartido en procesos o máquinas")
+    parser.add_argument('accion', choices=['escanear', 'crear', 'trabajador', 'estado', 'combinar'],
+                        help="escanear = cola + pool local; crear/trabajador/combinar = por "
+                             "separado, para repartir entre máquinas")
+    parser.add_argument('--directorio', default='cola_escaneo', help="carpeta (compartida) de la cola")
+    parser.add_argument('--tickers', nargs='+', help="símbolos del universo")
+    parser.add_argument('--archivo-tickers', help="archivo con un símbolo por línea")
+    parser.add_argument('--procesos', type=int, help="procesos locales (defecto: núcleos)")
+    parser.add_argument('--fragmento', type=int, default=500, help="tickers por fragmento")
+    parser.add_argument('--hilos', type=int, default=4, help="max_workers de cada screener")
+    parser.add_argument('--peticiones-por-segundo', type=float,
+                        help="límite de peticiones por proceso")
+    parser.add_argument('--prefiltro', action='store_true',
+                        help="escaneo en dos fases (reglas de info antes del historial)")
+    parser.add_argument('--salida', help="guardar el ranking combinado en este Parquet")
+    args = parser.parse_args()
+    
+    cola = ColaFragmentos(args.directorio)
+    if args.accion == 'estado':
+        print(cola.estado())
+        return 0
+    
+    fabrica = partial(ScreenerIVR, max_workers=args.hilos,
+                      max_peticiones_por_segundo=args.peticiones_por_segundo)
+    opciones = {'tamaño_bloque': 200, 'prefiltro': args.prefiltro}
+    
+    if args.accion == 'trabajador':
+        completados = ejecutar_trabajador(args.directorio, fabrica, opciones_escaneo=opciones)
+        print(f"🏁 {completados} fragmentos completados")
+        return 0
+    
+    if args.accion in ('crear', 'escanear'):
+        tickers = list(args.tickers or [])
+        if args.archivo_tickers:
+            with open(args.archivo_tickers) as f:
+                tickers += [linea.strip() for linea in f if linea.strip()]
+        if not tickers:
+            parser.error("indica --tickers o --archivo-tickers")
+        if args.accion == 'crear':
+            n = cola.crear(tickers, args.fragmento)
+            print(f"🧩 {n} fragmentos en {args.directorio}; lanza 'trabajador' en cada máquina")
+            return 0
+        df = escanear_distribuido(tickers, args.procesos, args.directorio, fabrica,
+                                  args.fragmento, opciones)
+    else:
+        df = cola.combinar()
+    
+    print(df.head(10)[['ticker', 'ivr', 'pasa_filtros', 'nombre']].to_string(index=False))
+    if args.salida:
+        cola._escribir_parquet(df, args.salida)
+        print(f"💾 Ranking guardado en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
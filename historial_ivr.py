@@ -0,0 +1,277 @@
+"""
+Historial de Escaneos IVR
+Almacén append-only en Parquet: una partición por día y un archivo por escaneo
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import os
+import uuid
+from datetime import datetime
+
+
+# Tipos fijos del historial (el CSV los perdía al releer); en disco los
+# scores van en float64 y los textos como string aunque en memoria sean
+# float32/category
+TIPOS_COLUMNAS = {
+    'ticker': 'string',
+    'precio': 'float64',
+    'valor_intrinseco': 'float64',
+    'margen_seguridad': 'float64',
+    'ivr': 'float64',
+    'score_valoracion': 'float64',
+    'score_calidad': 'float64',
+    'score_timing': 'float64',
+    'rsi': 'float64',
+    'vi_p5': 'float64',
+    'vi_p50': 'float64',
+    'vi_p95': 'float64',
+    'prob_margen_20': 'float64',
+    'pasa_filtros': 'bool',
+    'razon_filtro': 'string',
+    'nombre': 'string',
+    'sector': 'string',
+}
+
+_TIPOS_ARROW = {'string': pa.string(), 'float64': pa.float64(), 'bool': pa.bool_()}
+
+
+class HistorialIVR:
+    """Guarda cada escaneo como un archivo Parquet nuevo, sin releer los anteriores"""
+    
+    def __init__(self, directorio='historial_screener'):
+        """
+        Args:
+            directorio: carpeta raíz (particiones fecha=YYYY-MM-DD/)
+        """
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+    
+    def _ruta_particion(self, fecha):
+        return os.path.join(self.directorio, f"fecha={fecha}")
+    
+    def _tabla(self, df, timestamp=None):
+        """
+        Tabla Arrow con timestamp y columnas tipadas (sin copiar el DataFrame)
+        
+        Todo lo que se escribe pasa por aquí, para que los archivos nuevos y
+        los compactados tengan los mismos tipos (pandas 3 convierte los
+        textos a large_string si se deja a to_parquet).
+        
+        Args:
+            df: escaneo a guardar
+            timestamp: momento del escaneo (None = el df ya trae columna timestamp)
+        """
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        for i, nombre in enumerate(tabla.column_names):
+            tipo = _TIPOS_ARROW.get(TIPOS_COLUMNAS.get(nombre))
+            if nombre == 'timestamp':
+                tipo = pa.timestamp('ns')
+            if tipo is not None and tabla.schema.field(i).type != tipo:
+                tabla = tabla.set_column(i, nombre, tabla.column(i).cast(tipo))
+        if timestamp is None:
+            return tabla
+        marca = np.full(len(df), pd.Timestamp(timestamp).to_datetime64(), dtype='datetime64[ns]')
+        return tabla.append_column('timestamp', pa.array(marca))
+    
+    def guardar(self, df, timestamp=None):
+        """
+        Escribir un escaneo como partición propia (coste constante por escaneo)
+        
+        Args:
+            df: DataFrame de escanear_lista
+            timestamp: momento del escaneo (None = ahora)
+        
+        Returns:
+            ruta del archivo escrito
+        """
+        timestamp = timestamp or datetime.now()
+        carpeta = self._ruta_particion(timestamp.strftime('%Y-%m-%d'))
+        os.makedirs(carpeta, exist_ok=True)
+        
+        nombre = f"scan_{timestamp.strftime('%H%M%S%f')}_{uuid.uuid4().hex[:6]}.parquet"
+        ruta = os.path.join(carpeta, nombre)
+        
+        # Escribir a temporal y renombrar: un lector nunca ve un archivo a medias
+        temporal = ruta + '.tmp'
+        pq.write_table(self._tabla(df, timestamp), temporal)
+        os.replace(temporal, ruta)
+        return ruta
+    
+    def importar_csv(self, compactar=True):
+        """
+        Importar una vez el historial CSV antiguo (screener_YYYYMMDD.csv)
+        
+        Cada escaneo del CSV (un timestamp) se escribe como un archivo de su
+        partición; el CSV se renombra a .csv.importado para no repetirlo.
+        
+        Returns:
+            número de escaneos importados
+        """
+        csvs = sorted(f for f in os.listdir(self.directorio)
+                      if f.startswith('screener_') and f.endswith('.csv'))
+        importados = 0
+        for nombre in csvs:
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                df = pd.read_csv(ruta, parse_dates=['timestamp'])
+            except (ValueError, pd.errors.ParserError) as e:
+                print(f"⚠️  No se pudo importar {nombre}: {e}")
+                continue
+            
+            # La columna fecha por fila del formato antiguo ya va en timestamp
+            df = df.drop(columns=['fecha'], errors='ignore')
+            if 'pasa_filtros' in df:
+                df['pasa_filtros'] = df['pasa_filtros'].astype(bool)
+            for timestamp, escaneo in df.groupby('timestamp', sort=True):
+                self.guardar(escaneo.drop(columns=['timestamp']).reset_index(drop=True),
+                             timestamp.to_pydatetime())
+                importados += 1
+            os.replace(ruta, ruta + '.importado')
+        
+        if importados and compactar:
+            self.compactar_pendientes()
+        if csvs:
+            print(f"📥 Historial CSV importado: {importados} escaneos de {len(csvs)} archivos")
+        return importados
+    
+    def particiones(self, desde=None, hasta=None):
+        """
+        Fechas con escaneos guardados, ordenadas
+        
+        Args:
+            desde/hasta: límites inclusivos (str, date o datetime)
+        """
+        if not os.path.exists(self.directorio):
+            return []
+        
+        fechas = sorted(
+            d.split('=', 1)[1] for d in os.listdir(self.directorio)
+            if d.startswith('fecha=') and os.path.isdir(os.path.join(self.directorio, d))
+        )
+        if desde is not None:
+            desde = pd.Timestamp(desde).strftime('%Y-%m-%d')
+            fechas = [f for f in fechas if f >= desde]
+        if hasta is not None:
+            hasta = pd.Timestamp(hasta).strftime('%Y-%m-%d')
+            fechas = [f for f in fechas if f <= hasta]
+        return fechas
+    
+    def archivos(self, fecha):
+        """Archivos Parquet de una partición"""
+        carpeta = self._ruta_particion(fecha)
+        if not os.path.exists(carpeta):
+            return []
+        return sorted(os.path.join(carpeta, f) for f in os.listdir(carpeta)
+                      if f.endswith('.parquet'))
+    
+    def _esquema(self, rutas):
+        """
+        Esquema común de varios archivos: los tipos fijos de TIPOS_COLUMNAS
+        mandan sobre lo que haya escrito cada archivo (string/large_string,
+        int/float en columnas todo NaN...) y pyarrow convierte al leer
+        """
+        esquema = pa.unify_schemas([pq.read_schema(r) for r in rutas],
+                                   promote_options='permissive')
+        for i, campo in enumerate(esquema):
+            tipo = _TIPOS_ARROW.get(TIPOS_COLUMNAS.get(campo.name))
+            if campo.name == 'timestamp':
+                tipo = pa.timestamp('ns')
+            if tipo is not None and campo.type != tipo:
+                esquema = esquema.set(i, pa.field(campo.name, tipo))
+        return esquema
+    
+    def leer(self, desde=None, hasta=None, columnas=None, filtros=None):
+        """
+        Leer escaneos de las particiones indicadas
+        
+        Args:
+            desde/hasta: rango de fechas (solo se abren esas particiones)
+            columnas: columnas a leer (None = todas)
+            filtros: filtros de pyarrow, p.ej. [('ticker', 'in', ['MSFT'])]
+        
+        Returns:
+            DataFrame ordenado por timestamp
+        """
+        rutas = [r for fecha in self.particiones(desde, hasta) for r in self.archivos(fecha)]
+        if not rutas:
+            return pd.DataFrame(columns=columnas)
+        
+        # Un solo dataset sobre todos los archivos: pyarrow lee solo las
+        # columnas pedidas y descarta grupos de filas con el filtro
+        esquema = self._esquema(rutas)
+        if columnas is not None:
+            columnas = [c for c in columnas if c in esquema.names]
+            for clave in ('timestamp', 'ticker'):
+                if clave not in columnas and clave in esquema.names:
+                    columnas.append(clave)
+        
+        filtro = pq.filters_to_expression(filtros) if filtros else None
+        tabla = ds.dataset(rutas, format='parquet', schema=esquema).to_table(
+            columns=columnas, filter=filtro
+        )
+        df = tabla.to_pandas()
+        
+        # Una compactación interrumpida puede dejar filas repetidas
+        if 'ticker' in df:
+            df = df.drop_duplicates(subset=['timestamp', 'ticker'], keep='last')
+        return df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+    
+    def compactar(self, fecha):
+        """
+        Fusionar todos los archivos de una partición en uno solo
+        
+        Returns:
+            número de archivos fusionados (0 si no hacía falta)
+        """
+        rutas = self.archivos(fecha)
+        if len(rutas) <= 1:
+            return 0
+        
+        df = pd.concat([pd.read_parquet(r) for r in rutas], ignore_index=True)
+        df = df.sort_values('timestamp', kind='stable')
+        
+        carpeta = self._ruta_particion(fecha)
+        ruta = os.path.join(carpeta, f"compactado_{uuid.uuid4().hex[:6]}.parquet")
+        temporal = ruta + '.tmp'
+        pq.write_table(self._tabla(df.reset_index(drop=True)), temporal)
+        os.replace(temporal, ruta)
+        
+        for r in rutas:
+            os.remove(r)
+        return len(rutas)
+    
+    def compactar_pendientes(self, incluir_hoy=False):
+        """
+        Compactar las particiones con varios archivos
+        
+        Args:
+            incluir_hoy: compactar también el día en curso (que sigue recibiendo escaneos)
+        
+        Returns:
+            dict fecha -> archivos fusionados
+        """
+        hoy = datetime.now().strftime('%Y-%m-%d')
+        resultado = {}
+        for fecha in self.particiones():
+            if fecha == hoy and not incluir_hoy:
+                continue
+            fusionados = self.compactar(fecha)
+            if fusionados:
+                resultado[fecha] = fusionados
+        return resultado
+    
+    def resumen(self):
+        """DataFrame fecha -> archivos y escaneos guardados"""
+        filas = []
+        for fecha in self.particiones():
+            rutas = self.archivos(fecha)
+            escaneos = sum(
+                pd.read_parquet(r, columns=['timestamp'])['timestamp'].nunique()
+                for r in rutas
+            )
+            filas.append({'fecha': fecha, 'archivos': len(rutas), 'escaneos': escaneos})
+        return pd.DataFrame(filas, columns=['fecha', 'archivos', 'escaneos'])
@@ -0,0 +1,159 @@
+"""
+Indicadores de Timing en Panel
+RSI, SMA50/SMA200 y score de timing para muchos tickers en una sola pasada vectorizada
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def construir_panel(historiales, columna='Close'):
+    """
+    Matriz ancha de precios (fechas x tickers)
+    
+    Args:
+        historiales: dict ticker -> DataFrame OHLCV
+        columna: columna de precio a usar
+    
+    Returns:
+        DataFrame con una columna por ticker (NaN donde no hay barra)
+    """
+    tickers, dias, valores = [], [], []
+    for ticker_symbol, hist in historiales.items():
+        if hist is None or hist.empty:
+            continue
+        fechas = pd.DatetimeIndex(hist.index)
+        if fechas.tz is not None:
+            fechas = fechas.tz_localize(None)
+        tickers.append(ticker_symbol)
+        dias.append(fechas.values.astype('datetime64[D]'))
+        valores.append(hist[columna].to_numpy(dtype=float))
+    
+    if not tickers:
+        return pd.DataFrame()
+    
+    # Rellenar la matriz por posición en lugar de alinear Series una a una
+    calendario = np.unique(np.concatenate(dias))
+    matriz = np.full((len(calendario), len(tickers)), np.nan)
+    for columna_idx, (dias_ticker, valores_ticker) in enumerate(zip(dias, valores)):
+        matriz[np.searchsorted(calendario, dias_ticker), columna_idx] = valores_ticker
+    
+    return pd.DataFrame(matriz, index=pd.DatetimeIndex(calendario, name='Date'),
+                        columns=tickers)
+
+
+def _alinear_al_final(precios):
+    """
+    Desplazar los valores válidos de cada columna al final de la matriz
+    
+    Así la última fila es la última barra de cada ticker y las ventanas
+    rolling de cada columna solo ven su propia serie, igual que el cálculo
+    por ticker aunque los calendarios no coincidan.
+    
+    Returns:
+        (matriz alineada, número de barras válidas por columna)
+    """
+    validos = ~np.isnan(precios)
+    orden = np.argsort(validos, axis=0, kind='stable')
+    return np.take_along_axis(precios, orden, axis=0), validos.sum(axis=0)
+
+
+def _medias_wilder(valores, n_validos, periodo):
+    """
+    Media suavizada de Wilder de la última fila, columna a columna
+    
+    Semilla: media simple de los primeros `periodo` valores de cada columna;
+    después avg = (avg * (periodo - 1) + x) / periodo.
+    """
+    filas = valores.shape[0]
+    inicio = filas - n_validos                 # primera fila válida por columna
+    fila_semilla = inicio + periodo - 1
+    
+    acumulado = np.cumsum(np.nan_to_num(valores), axis=0)
+    indice_semilla = np.clip(fila_semilla, 0, filas - 1)
+    suma_semilla = np.take_along_axis(acumulado, indice_semilla[None, :], axis=0)[0]
+    previo = np.where(inicio > 0, np.take_along_axis(
+        acumulado, np.clip(inicio - 1, 0, filas - 1)[None, :], axis=0)[0], 0.0)
+    media = (suma_semilla - previo) / periodo
+    
+    for fila in range(int(max(fila_semilla.min(), 0)) + 1, filas):
+        media = np.where(fila > fila_semilla,
+                         (media * (periodo - 1) + valores[fila]) / periodo,
+                         media)
+    return media
+
+
+def calcular_rsi_panel(precios, periodo=14, suavizado='simple', n_validos=None):
+    """
+    RSI de la última barra de cada columna
+    
+    Args:
+        precios: matriz (barras x tickers) alineada al final
+        periodo: ventana del RSI
+        suavizado: 'simple' (media móvil, como ScreenerIVR.calcular_rsi)
+                   o 'wilder'
+        n_validos: barras válidas por columna (None = sin NaN)
+    
+    Returns:
+        array de RSI (50 donde no hay barras suficientes o el RSI es indefinido)
+    """
+    if n_validos is None:
+        n_validos = np.full(precios.shape[1], precios.shape[0])
+    
+    deltas = np.diff(precios, axis=0)
+    gain = np.where(deltas > 0, deltas, 0.0)
+    loss = np.where(deltas < 0, -deltas, 0.0)
+    
+    if suavizado == 'wilder':
+        avg_gain = _medias_wilder(gain, n_validos - 1, periodo)
+        avg_loss = _medias_wilder(loss, n_validos - 1, periodo)
+    elif suavizado == 'simple':
+        avg_gain = gain[-periodo:].mean(axis=0)
+        avg_loss = loss[-periodo:].mean(axis=0)
+    else:
+        raise ValueError(f"Suavizado RSI desconocido: {suavizado}")
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        rsi = 100 - (100 / (1 + rs))
+    
+    suficientes = n_validos >= periodo + 1
+    return np.where(suficientes & ~np.isnan(rsi), rsi, 50.0)
+
+
+def calcular_timing_panel(panel, params, periodo_rsi=14, suavizado=None):
+    """
+    Score de timing de todos los tickers del panel (misma fórmula que
+    ScreenerIVR.calcular_score_timing)
+    
+    Args:
+        panel: DataFrame fechas x tickers (construir_panel)
+        params: dict de parámetros de ScreenerIVR (rsi_centro, rsi_rango)
+        periodo_rsi: ventana del RSI
+        suavizado: 'simple' o 'wilder' (None = params['rsi_suavizado'])
+    
+    Returns:
+        DataFrame indexado por ticker con rsi, sma_50, sma_200 y score_timing
+    """
+    suavizado = suavizado or params.get('rsi_suavizado', 'simple')
+    precios, n_validos = _alinear_al_final(panel.to_numpy(dtype=float))
+    
+    # 1. RSI
+    rsi = calcular_rsi_panel(precios, periodo_rsi, suavizado, n_validos)
+    s_rsi = np.maximum(0, 1 - (np.abs(rsi - params['rsi_centro']) / params['rsi_rango']))
+    
+    # 2. Tendencia (SMA)
+    sma_50 = precios[-50:].mean(axis=0)
+    sma_200 = precios[-200:].mean(axis=0)
+    con_tendencia = n_validos >= 200
+    s_tendencia = np.where(con_tendencia, (sma_50 >= sma_200).astype(float), 0.5)
+    
+    # 3. Score timing
+    s_timing = 0.7 * s_rsi + 0.3 * s_tendencia
+    
+    return pd.DataFrame({
+        'rsi': rsi,
+        'sma_50': np.where(n_validos >= 50, sma_50, np.nan),
+        'sma_200': np.where(con_tendencia, sma_200, np.nan),
+        'score_timing': s_timing,
+    }, index=panel.columns)
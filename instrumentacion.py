@@ -0,0 +1,165 @@
+"""
+Instrumentación del Escaneo
+Latencias por etapa y por ticker, errores y bytes descargados
+"""
+
+import numpy as np
+import pandas as pd
+from contextlib import nullcontext
+from collections import defaultdict
+import threading
+import time
+import json
+
+
+_SIN_MEDICION = nullcontext()
+
+
+class _Medicion:
+    """Context manager que cronometra una etapa (los errores se propagan)"""
+    
+    __slots__ = ('instrumentacion', 'etapa', 'ticker', 'inicio')
+    
+    def __init__(self, instrumentacion, etapa, ticker):
+        self.instrumentacion = instrumentacion
+        self.etapa = etapa
+        self.ticker = ticker
+    
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+    
+    def __exit__(self, tipo, valor, traza):
+        self.instrumentacion.registrar(self.etapa, time.perf_counter() - self.inicio,
+                                       self.ticker, error=tipo is not None)
+        return False
+
+
+class Instrumentacion:
+    """Acumula mediciones de las etapas de un escaneo (segura entre hilos)"""
+    
+    def __init__(self, activa=True):
+        """
+        Args:
+            activa: False = etapa() devuelve un contexto vacío y no se mide nada
+        """
+        self.activa = activa
+        self._lock = threading.Lock()
+        self.reiniciar()
+    
+    def reiniciar(self):
+        """Borrar todas las mediciones"""
+        with self._lock:
+            self._duraciones = defaultdict(list)                   # etapa -> [segundos]
+            self._errores = defaultdict(int)                       # etapa -> errores
+            self._bytes = defaultdict(int)                         # etapa -> bytes
+            self._por_ticker = defaultdict(lambda: defaultdict(float))  # ticker -> etapa -> s
+    
+    def etapa(self, nombre, ticker_symbol=None):
+        """
+        Cronometrar un bloque:  with instrumentacion.etapa('info', ticker): ...
+        """
+        if not self.activa:
+            return _SIN_MEDICION
+        return _Medicion(self, nombre, ticker_symbol)
+    
+    def registrar(self, etapa, segundos, ticker_symbol=None, error=False):
+        """Añadir una medición ya tomada"""
+        if not self.activa:
+            return
+        with self._lock:
+            self._duraciones[etapa].append(segundos)
+            if error:
+                self._errores[etapa] += 1
+            if ticker_symbol is not None:
+                self._por_ticker[ticker_symbol][etapa] += segundos
+    
+    def contar_error(self, etapa):
+        """Error tratado sin excepción (p.ej. un ticker sin datos)"""
+        if not self.activa:
+            return
+        with self._lock:
+            self._errores[etapa] += 1
+    
+    def contar_bytes(self, etapa, objeto):
+        """
+        Sumar el tamaño aproximado de lo descargado en una etapa
+        
+        Args:
+            objeto: DataFrame (memoria de sus columnas), dict (JSON) o número de bytes
+        """
+        if not self.activa or objeto is None:
+            return
+        if isinstance(objeto, (int, float)):
+            n = int(objeto)
+        elif isinstance(objeto, pd.DataFrame):
+            n = int(objeto.memory_usage(index=True).sum())
+        else:
+            n = len(json.dumps(objeto, default=str))
+        with self._lock:
+            self._bytes[etapa] += n
+    
+    def resumen(self):
+        """
+        Estadísticas agregadas por etapa
+        
+        Returns:
+            DataFrame indexado por etapa: llamadas, errores, total_s, p50_ms,
+            p95_ms, max_ms y bytes
+        """
+        with self._lock:
+            etapas = sorted(set(self._duraciones) | set(self._errores) | set(self._bytes))
+            filas = []
+            for etapa in etapas:
+                duraciones = np.array(self._duraciones.get(etapa, []))
+                con_datos = len(duraciones) > 0
+                filas.append({
+                    'etapa': etapa,
+                    'llamadas': len(duraciones),
+                    'errores': self._errores.get(etapa, 0),
+                    'total_s': duraciones.sum() if con_datos else 0.0,
+                    'p50_ms': np.percentile(duraciones, 50) * 1000 if con_datos else np.nan,
+                    'p95_ms': np.percentile(duraciones, 95) * 1000 if con_datos else np.nan,
+                    'max_ms': duraciones.max() * 1000 if con_datos else np.nan,
+                    'bytes': self._bytes.get(etapa, 0),
+                })
+        columnas = ['etapa', 'llamadas', 'errores', 'total_s', 'p50_ms', 'p95_ms', 'max_ms', 'bytes']
+        return pd.DataFrame(filas, columns=columnas).set_index('etapa')
+    
+    def por_ticker(self):
+        """DataFrame ticker x etapa con los segundos acumulados"""
+        with self._lock:
+            datos = {t: dict(etapas) for t, etapas in self._por_ticker.items()}
+        return pd.DataFrame.from_dict(datos, orient='index').fillna(0.0)
+    
+    def imprimir_resumen(self, lentos=5):
+        """Tabla por etapa y los tickers más lentos"""
+        resumen = self.resumen()
+        if resumen.empty:
+            return
+        print("\n⏱️  Tiempos por etapa:")
+        print(f"   {'etapa':<22}{'llamadas':>9}{'errores':>8}{'total s':>9}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'KB':>9}")
+        for etapa, fila in resumen.iterrows():
+            print(f"   {etapa:<22}{int(fila.llamadas):>9}{int(fila.errores):>8}{fila.total_s:>9.2f}"
+                  f"{fila.p50_ms:>9.1f}{fila.p95_ms:>9.1f}{fila.max_ms:>9.1f}"
+                  f"{fila.bytes / 1024:>9.0f}")
+        
+        tickers = self.por_ticker()
+        if lentos and not tickers.empty:
+            # calcular_ivr ya incluye sus sub-etapas: no sumarlas dos veces
+            totales = tickers['calcular_ivr'] if 'calcular_ivr' in tickers else tickers.sum(axis=1)
+            totales = totales.sort_values(ascending=False).head(lentos)
+            print("   🐢 Tickers más lentos: " +
+                  ", ".join(f"{t} ({s:.2f}s)" for t, s in totales.items()))
+    
+    def exportar_json(self, ruta):
+        """Guardar resumen por etapa y tiempos por ticker en JSON"""
+        resumen = self.resumen().replace({np.nan: None})
+        datos = {
+            'generado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'etapas': resumen.reset_index().to_dict('records'),
+            'tickers': self.por_ticker().to_dict('index'),
+        }
+        with open(ruta, 'w') as f:
+            json.dump(datos, f, indent=2, default=float)
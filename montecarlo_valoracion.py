@@ -0,0 +1,126 @@
+"""
+Valoración Monte Carlo
+Distribución del valor intrínseco muestreando crecimiento, WACC y tasa perpetua
+para todo el universo en lotes de NumPy
+"""
+
+import numpy as np
+import pandas as pd
+from motor_vectorizado import valorar_dcf, _columna
+
+
+SUPUESTOS_DEFECTO = {
+    'wacc_media': 0.10,
+    'wacc_desviacion': 0.015,
+    'perpetua_media': 0.03,
+    'perpetua_desviacion': 0.005,
+    'crecimiento_desviacion': 0.05,
+    'diferencial_minimo': 0.01,   # wacc - tasa_perpetua mínimo en cada muestra
+}
+
+
+def simular_valor_intrinseco(tabla, n_simulaciones=1000, supuestos=None,
+                             años_proyeccion=5, semilla=None, tamaño_lote=250):
+    """
+    Muestras de valor intrínseco por acción (simulaciones x tickers)
+    
+    Cada muestra toma, por ticker, un crecimiento normal alrededor de
+    earningsGrowth (0.05 si falta, como calcular_dcf), un WACC y una tasa
+    perpetua normales; la tasa perpetua se limita para que el WACC la supere
+    siempre en `diferencial_minimo`. Los lotes acotan la memoria intermedia.
+    
+    Args:
+        tabla: tabla de fundamentales (construir_tabla)
+        n_simulaciones: muestras por ticker
+        supuestos: dict que sobrescribe SUPUESTOS_DEFECTO
+        años_proyeccion: años de proyección del DCF
+        semilla: semilla del generador (resultados reproducibles)
+        tamaño_lote: simulaciones por pasada
+    
+    Returns:
+        array float (n_simulaciones, n_tickers)
+    """
+    s = {**SUPUESTOS_DEFECTO, **(supuestos or {})}
+    rng = np.random.default_rng(semilla)
+    
+    fcf = _columna(tabla, 'freeCashflow')
+    deuda = _columna(tabla, 'totalDebt')
+    efectivo = _columna(tabla, 'totalCash')
+    acciones = _columna(tabla, 'sharesOutstanding')
+    crecimiento_base = _columna(tabla, 'earningsGrowth')
+    crecimiento_base = np.where(np.isnan(crecimiento_base) | (crecimiento_base == 0),
+                                0.05, crecimiento_base)
+    
+    n_tickers = len(fcf)
+    muestras = np.empty((n_simulaciones, n_tickers))
+    for inicio in range(0, n_simulaciones, tamaño_lote):
+        n = min(tamaño_lote, n_simulaciones - inicio)
+        forma = (n, n_tickers)
+        
+        crecimiento = crecimiento_base + rng.normal(0, s['crecimiento_desviacion'], forma)
+        wacc = rng.normal(s['wacc_media'], s['wacc_desviacion'], forma)
+        perpetua = np.minimum(rng.normal(s['perpetua_media'], s['perpetua_desviacion'], forma),
+                              wacc - s['diferencial_minimo'])
+        
+        muestras[inicio:inicio + n] = valorar_dcf(
+            fcf, crecimiento, deuda, efectivo, acciones,
+            wacc=wacc, años_proyeccion=años_proyeccion, tasa_perpetua=perpetua
+        )
+    
+    return muestras
+
+
+def resumir_simulaciones(muestras, precios, tickers, percentiles=(5, 50, 95),
+                         umbral_margen=0.20):
+    """
+    Percentiles del valor intrínseco y probabilidad de margen de seguridad
+    
+    Args:
+        muestras: array (simulaciones x tickers) de simular_valor_intrinseco
+        precios: precio actual por ticker
+        tickers: símbolos (índice del resultado)
+        percentiles: percentiles a reportar
+        umbral_margen: margen de seguridad de referencia (0.20 = 20%)
+    
+    Returns:
+        DataFrame indexado por ticker con vi_pXX, vi_media y prob_margen_XX
+    """
+    precios = np.asarray(precios, dtype=float)
+    valores = np.percentile(muestras, percentiles, axis=0)
+    
+    resumen = {f'vi_p{p}': fila for p, fila in zip(percentiles, valores)}
+    resumen['vi_media'] = muestras.mean(axis=0)
+    
+    # Mismo margen que calcular_score_valoracion: (valor - precio) / precio
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margen = (muestras - precios) / precios
+    con_precio = precios > 0
+    resumen[f'prob_margen_{int(round(umbral_margen * 100))}'] = np.where(
+        con_precio, ((muestras > 0) & (margen > umbral_margen)).mean(axis=0), 0.0
+    )
+    
+    return pd.DataFrame(resumen, index=pd.Index(tickers, name='ticker'))
+
+
+def valorar_montecarlo(tabla, n_simulaciones=1000, supuestos=None, semilla=None,
+                       percentiles=(5, 50, 95), umbral_margen=0.20):
+    """
+    Valoración Monte Carlo del universo completo
+    
+    Args:
+        tabla: tabla de fundamentales (ScreenerIVR.tabla_fundamentales)
+        n_simulaciones: muestras por ticker
+        supuestos: dict que sobrescribe SUPUESTOS_DEFECTO
+        semilla: semilla del generador
+        percentiles: percentiles del valor intrínseco a reportar
+        umbral_margen: margen de seguridad de referencia
+    
+    Returns:
+        DataFrame indexado por ticker (ver resumir_simulaciones)
+    """
+    if tabla.empty:
+        return pd.DataFrame()
+    
+    muestras = simular_valor_intrinseco(tabla, n_simulaciones, supuestos, semilla=semilla)
+    return resumir_simulaciones(muestras, _columna(tabla, 'precio'),
+                                tabla['ticker'].to_numpy(), percentiles, umbral_margen)
@@ -0,0 +1,431 @@
+"""
+Motor Vectorizado del IVR
+Calcula múltiplos, DCF, calidad, filtros e IVR de todo el universo con arrays NumPy
+"""
+
+import numpy as np
+import pandas as pd
+import sys
+
+
+# Campos de ticker.info que usan las fórmulas del IVR
+CAMPOS_NUMERICOS = [
+    'trailingPE', 'pe_sector', 'priceToBook', 'industryPB',
+    'priceToSalesTrailing12Months', 'industryPS', 'enterpriseToEbitda',
+    'freeCashflow', 'earningsGrowth', 'revenueGrowth',
+    'totalDebt', 'totalCash', 'sharesOutstanding',
+    'debtToEquity', 'currentRatio', 'trailingEps',
+    'ebitda', 'interestExpense',
+]
+
+# Valores por defecto de info.get(...) en ScreenerIVR
+DEFECTOS = {
+    'industryPB': 2.5,
+    'industryPS': 2.0,
+    'freeCashflow': 0,
+    'totalDebt': 0,
+    'totalCash': 0,
+    'sharesOutstanding': 1,
+    'currentRatio': 1.0,
+    'trailingEps': 0,
+    'ebitda': 0,
+    'interestExpense': 1,
+}
+
+
+# Campos de ticker.info que leen las fórmulas por ticker de ScreenerIVR
+CAMPOS_INFO = [
+    'trailingPE', 'industryPE', 'forwardPE', 'priceToBook', 'industryPB',
+    'priceToSalesTrailing12Months', 'industryPS', 'enterpriseToEbitda',
+    'freeCashflow', 'earningsGrowth', 'revenueGrowth',
+    'totalDebt', 'totalCash', 'sharesOutstanding',
+    'debtToEquity', 'currentRatio', 'trailingEps',
+    'ebitda', 'interestExpense',
+    'currentPrice', 'regularMarketPrice', 'previousClose',
+]
+
+_AUSENTE = object()
+
+
+def _a_float(valor):
+    """Número de info a float (None y valores no numéricos -> None)"""
+    if valor is None or isinstance(valor, bool):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class FundamentalesTicker:
+    """
+    Registro compacto con los campos de ticker.info que usa el IVR
+    
+    Sustituye al dict completo (más de cien claves, con textos largos) en
+    cuanto se descarga. get() se comporta como info.get(): un campo que no
+    venía en info devuelve el defecto y uno que venía a None devuelve None.
+    Los números se guardan como float ('Infinity' -> inf).
+    """
+    
+    __slots__ = ('ticker', 'longName', 'sector', *CAMPOS_INFO)
+    
+    def __init__(self, info, ticker_symbol=None):
+        """
+        Args:
+            info: dict de ticker.info
+            ticker_symbol: símbolo del ticker
+        """
+        self.ticker = ticker_symbol
+        for campo in ('longName', 'sector'):
+            if campo in info:
+                valor = info[campo]
+                # Los sectores se repiten en todo el universo: una sola copia
+                setattr(self, campo, sys.intern(valor) if isinstance(valor, str) else valor)
+        # Los campos ausentes se quedan sin asignar (sin coste de memoria)
+        for campo in CAMPOS_INFO:
+            if campo in info:
+                setattr(self, campo, _a_float(info[campo]))
+    
+    def get(self, campo, defecto=None):
+        """Igual que info.get(campo, defecto)"""
+        valor = getattr(self, campo, _AUSENTE)
+        return defecto if valor is _AUSENTE else valor
+    
+    def __repr__(self):
+        return f"FundamentalesTicker({self.ticker})"
+
+
+def compactar_info(info, ticker_symbol=None):
+    """FundamentalesTicker a partir de un info (si ya es un registro, se devuelve tal cual)"""
+    if info is None or isinstance(info, FundamentalesTicker):
+        return info
+    return FundamentalesTicker(info, ticker_symbol)
+
+
+# Columnas del resultado de un escaneo y su tipo en memoria: textos repetidos
+# como category y puntuaciones en float32 (precio y valor intrínseco en float64)
+ESQUEMA_RESULTADO = {
+    'ticker': 'category',
+    'precio': 'float64',
+    'valor_intrinseco': 'float64',
+    'margen_seguridad': 'float32',
+    'ivr': 'float32',
+    'score_valoracion': 'float32',
+    'score_calidad': 'float32',
+    'score_timing': 'float32',
+    'rsi': 'float32',
+    'pasa_filtros': 'bool',
+    'razon_filtro': 'category',
+    'nombre': 'category',
+    'sector': 'category',
+}
+
+
+def construir_resultado(columnas, fecha=None):
+    """
+    DataFrame de resultados con ESQUEMA_RESULTADO, construido columna a columna
+    
+    Args:
+        columnas: dict columna -> lista o array, ya en el orden final
+        fecha: momento del escaneo (una sola vez, en df.attrs['fecha'])
+    """
+    datos = {}
+    for columna, tipo in ESQUEMA_RESULTADO.items():
+        if tipo == 'category':
+            datos[columna] = pd.Categorical(columnas[columna])
+        else:
+            datos[columna] = np.asarray(columnas[columna], dtype=tipo)
+    df = pd.DataFrame(datos)
+    df.attrs['fecha'] = fecha
+    return df
+
+
+def aplicar_esquema(df):
+    """Volver a ESQUEMA_RESULTADO tras concatenar escaneos (categorías distintas -> object)"""
+    tipos = {c: t for c, t in ESQUEMA_RESULTADO.items() if c in df and df[c].dtype != t}
+    return df.astype(tipos) if tipos else df
+
+
+def _numero(valor):
+    """None -> NaN; el resto a float"""
+    return np.nan if valor is None else float(valor)
+
+
+def extraer_fila(info, precio, ticker_symbol=None):
+    """
+    Extraer de un info (dict o FundamentalesTicker) los campos numéricos que usa el IVR
+    
+    Los campos ausentes toman el mismo defecto que info.get() en
+    ScreenerIVR; los valores None quedan como NaN.
+    
+    Returns:
+        dict con una fila de la tabla de fundamentales
+    """
+    fila = {
+        'ticker': ticker_symbol,
+        'nombre': info.get('longName', ticker_symbol),
+        'sector': info.get('sector', 'N/A'),
+        'precio': float(precio),
+    }
+    for campo in CAMPOS_NUMERICOS:
+        if campo == 'pe_sector':
+            valor = info.get('industryPE', None) or info.get('forwardPE', None)
+        else:
+            valor = info.get(campo, DEFECTOS.get(campo))
+        fila[campo] = _numero(valor)
+    return fila
+
+
+def construir_tabla(filas):
+    """DataFrame columnar (una fila por ticker) a partir de extraer_fila"""
+    tabla = pd.DataFrame(list(filas))
+    for campo in CAMPOS_NUMERICOS:
+        if campo not in tabla:
+            tabla[campo] = np.nan
+    return tabla
+
+
+def _columna(tabla, campo):
+    return tabla[campo].to_numpy(dtype=float)
+
+
+def _score_ratio(valor, referencia, valido):
+    """max(0, min(1, 1 - valor/referencia)) donde valido; 0 en el resto"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.clip(1 - valor / referencia, 0, 1)
+    return np.where(valido, score, 0.0)
+
+
+def calcular_multiplos(tabla):
+    """Score de múltiplos vs sector para todo el universo"""
+    pe = _columna(tabla, 'trailingPE')
+    pe_sector = _columna(tabla, 'pe_sector')
+    pb = _columna(tabla, 'priceToBook')
+    ps = _columna(tabla, 'priceToSalesTrailing12Months')
+    ev = _columna(tabla, 'enterpriseToEbitda')
+    
+    validos = [
+        (pe > 0) & (pe_sector > 0),
+        pb > 0,
+        ps > 0,
+        ev > 0,
+    ]
+    scores = [
+        _score_ratio(pe, pe_sector, validos[0]),
+        _score_ratio(pb, _columna(tabla, 'industryPB'), validos[1]),
+        _score_ratio(ps, _columna(tabla, 'industryPS'), validos[2]),
+        _score_ratio(ev, 12, validos[3]),
+    ]
+    
+    suma = np.zeros(len(tabla))
+    n_scores = np.zeros(len(tabla))
+    for score, valido in zip(scores, validos):
+        suma = suma + score
+        n_scores = n_scores + valido
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n_scores > 0, suma / n_scores, 0.5)
+
+
+def valorar_dcf(fcf, crecimiento, deuda, efectivo, acciones,
+                wacc=0.10, años_proyeccion=5, tasa_perpetua=0.03):
+    """
+    Kernel DCF en forma cerrada para arrays (todos los argumentos hacen broadcast)
+    
+    Con q = (1+g)/(1+wacc), el valor presente de los flujos proyectados es la
+    suma geométrica fcf·q·(1-q^n)/(1-q), y el del valor terminal
+    fcf·q^n·(1+tasa_perpetua)/(wacc-tasa_perpetua). El crecimiento se limita
+    a 0-25% y el valor por acción nunca es negativo, igual que en
+    ScreenerIVR.calcular_dcf_simple.
+    
+    Para revalorar el universo con varios supuestos basta pasar wacc o
+    tasa_perpetua con una dimensión extra, p. ej. wacc=np.array([[0.08], [0.10]])
+    devuelve una fila por escenario.
+    
+    Returns:
+        array de valor intrínseco por acción (0 si no es calculable)
+    """
+    fcf = np.asarray(fcf, dtype=float)
+    crecimiento = np.clip(np.asarray(crecimiento, dtype=float), 0, 0.25)
+    deuda = np.asarray(deuda, dtype=float)
+    efectivo = np.asarray(efectivo, dtype=float)
+    acciones = np.asarray(acciones, dtype=float)
+    wacc = np.asarray(wacc, dtype=float)
+    tasa_perpetua = np.asarray(tasa_perpetua, dtype=float)
+    
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        q = (1 + crecimiento) / (1 + wacc)
+        q_n = q ** años_proyeccion
+        
+        # q = 1 (crecimiento igual al wacc): la suma geométrica vale n
+        suma_geometrica = np.where(
+            np.isclose(q, 1.0, rtol=0, atol=1e-12),
+            float(años_proyeccion),
+            q * (1 - q_n) / (1 - q)
+        )
+        factor_terminal = q_n * (1 + tasa_perpetua) / (wacc - tasa_perpetua)
+        
+        valor_empresa = fcf * (suma_geometrica + factor_terminal)
+        valor_equity = valor_empresa - deuda + efectivo
+        valor_intrinseco = np.where(acciones > 0, valor_equity / acciones, 0)
+    
+    # fcf <= 0, wacc <= tasa perpetua o datos no numéricos: no calculable
+    calculable = (fcf > 0) & (wacc > tasa_perpetua) & np.isfinite(valor_intrinseco)
+    return np.where(calculable, np.maximum(valor_intrinseco, 0), 0.0)
+
+
+def calcular_dcf(tabla, wacc=0.10, años_proyeccion=5, tasa_perpetua=0.03):
+    """
+    DCF simplificado para todo el universo (misma fórmula que ScreenerIVR)
+    
+    Returns:
+        array de valor intrínseco por acción (0 si no es calculable)
+    """
+    crecimiento = _columna(tabla, 'earningsGrowth')
+    crecimiento = np.where(np.isnan(crecimiento) | (crecimiento == 0), 0.05, crecimiento)
+    
+    return valorar_dcf(
+        _columna(tabla, 'freeCashflow'),
+        crecimiento,
+        _columna(tabla, 'totalDebt'),
+        _columna(tabla, 'totalCash'),
+        _columna(tabla, 'sharesOutstanding'),
+        wacc=wacc,
+        años_proyeccion=años_proyeccion,
+        tasa_perpetua=tasa_perpetua,
+    )
+
+
+def calcular_dcf_escenarios(tabla, escenarios):
+    """
+    Revalorar el universo bajo varios supuestos de DCF en una sola pasada
+    
+    Args:
+        tabla: tabla de fundamentales (construir_tabla)
+        escenarios: dict nombre -> dict con 'wacc', 'años_proyeccion' y/o
+                    'tasa_perpetua' (los ausentes usan el valor por defecto)
+    
+    Returns:
+        DataFrame indexado por ticker con una columna de valor intrínseco
+        por escenario
+    """
+    valores = {
+        nombre: calcular_dcf(tabla, **supuestos)
+        for nombre, supuestos in escenarios.items()
+    }
+    return pd.DataFrame(valores, index=tabla['ticker'].to_numpy())
+
+
+def calcular_score_calidad(tabla, params):
+    """Score de salud financiera y crecimiento para todo el universo"""
+    de = _columna(tabla, 'debtToEquity')
+    de_ratio = np.where(np.isnan(de) | (de == 0), 0, de / 100)
+    current_ratio = _columna(tabla, 'currentRatio')
+    
+    s_deuda = np.maximum(0, 1 - (de_ratio / params['de_max_bueno']))
+    s_liquidez = np.minimum(1, current_ratio / params['cr_optimo'])
+    s_salud = 0.5 * s_deuda + 0.5 * s_liquidez
+    
+    revenue_growth = np.nan_to_num(_columna(tabla, 'revenueGrowth'), nan=0.0)
+    earnings_growth = np.nan_to_num(_columna(tabla, 'earningsGrowth'), nan=0.0)
+    cagr_estimado = (revenue_growth + earnings_growth) / 2
+    s_crec = np.where(cagr_estimado > 0,
+                      np.minimum(1, cagr_estimado / params['cagr_optimo']), 0)
+    
+    return 0.5 * s_salud + 0.5 * s_crec
+
+
+def aplicar_reglas_seguridad(tabla, margen_seguridad):
+    """
+    Filtros duros para todo el universo
+    
+    Returns:
+        (array bool pasa_filtros, lista razon_filtro)
+    """
+    eps = _columna(tabla, 'trailingEps')
+    fcf = _columna(tabla, 'freeCashflow')
+    ebit = _columna(tabla, 'ebitda')
+    interest = _columna(tabla, 'interestExpense')
+    
+    con_intereses = ~np.isnan(interest) & (interest != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.abs(ebit / np.where(con_intereses, interest, 1))
+    
+    fallos = [
+        eps <= 0,
+        fcf <= 0,
+        con_intereses & (cobertura < 2),
+        margen_seguridad < 0.20,
+    ]
+    regla = np.select(fallos, [1, 2, 3, 4], default=0)
+    
+    razones = []
+    for i, r in enumerate(regla):
+        if r == 0:
+            razones.append("Aprobado")
+        elif r == 1:
+            razones.append("EPS negativo o cero")
+        elif r == 2:
+            razones.append("Free Cash Flow negativo o cero")
+        elif r == 3:
+            razones.append(f"Cobertura intereses baja: {cobertura[i]:.2f}")
+        else:
+            razones.append(f"Margen seguridad bajo: {margen_seguridad[i]*100:.1f}%")
+    
+    return regla == 0, razones
+
+
+def puntuar_universo(tabla, pesos, params):
+    """
+    Calcular el IVR de todo el universo a partir de la tabla de fundamentales
+    
+    La tabla necesita las columnas de extraer_fila más 'score_timing' y 'rsi'
+    (calculadas a partir del historial de precios).
+    
+    Returns:
+        DataFrame con ESQUEMA_RESULTADO, ordenado por IVR. Los valores
+        coinciden con el cálculo por ticker salvo redondeo de coma flotante
+        en el DCF (forma cerrada vs bucle por año).
+    """
+    precio = _columna(tabla, 'precio')
+    
+    # A. Valoración
+    s_mult = calcular_multiplos(tabla)
+    valor_intrinseco = calcular_dcf(tabla)
+    con_valor = valor_intrinseco > 0
+    ms = np.where(con_valor, (valor_intrinseco - precio) / precio, 0.0)
+    s_ms = np.where(con_valor, np.clip(ms, 0, 1), 0)
+    s_val = 0.5 * s_mult + 0.5 * s_ms
+    
+    # B. Calidad
+    s_cal = calcular_score_calidad(tabla, params)
+    
+    # C. Timing
+    s_tim = _columna(tabla, 'score_timing')
+    
+    # Reglas de seguridad e IVR final
+    pasa_filtros, razon_filtro = aplicar_reglas_seguridad(tabla, ms)
+    ivr = np.where(
+        pasa_filtros,
+        pesos['valoracion'] * s_val + pesos['calidad'] * s_cal + pesos['timing'] * s_tim,
+        0.0
+    )
+    
+    columnas = {
+        'ticker': tabla['ticker'].to_numpy(),
+        'precio': precio,
+        'valor_intrinseco': valor_intrinseco,
+        'margen_seguridad': ms,
+        'ivr': ivr,
+        'score_valoracion': s_val,
+        'score_calidad': s_cal,
+        'score_timing': s_tim,
+        'rsi': _columna(tabla, 'rsi'),
+        'pasa_filtros': pasa_filtros,
+        'razon_filtro': np.array(razon_filtro, dtype=object),
+        'nombre': tabla['nombre'].to_numpy(),
+        'sector': tabla['sector'].to_numpy(),
+    }
+    orden = np.argsort(-ivr, kind='stable')
+    fecha = tabla['fecha'].max() if 'fecha' in tabla else None
+    return construir_resultado({c: v[orden] for c, v in columnas.items()}, fecha)
@@ -0,0 +1,157 @@
+"""
+Prioridad de Reescaneo
+Cola de vencimientos: los tickers cerca de un umbral de señal se refrescan antes
+"""
+
+import heapq
+import numpy as np
+import pandas as pd
+from collections import deque
+from datetime import timedelta
+
+
+class ColaPrioridadEscaneo:
+    """Asigna a cada ticker un intervalo según su distancia al umbral y su volatilidad"""
+    
+    def __init__(self, umbral_compra=0.60, umbral_venta=0.30, intervalo_minimo=5,
+                 intervalo_maximo=60, presupuesto_hora=600, sigmas_maximo=3.0,
+                 volatilidad_minima=0.01, ventana_volatilidad=20):
+        """
+        Args:
+            umbral_compra/umbral_venta: umbrales de IVR que disparan alertas
+            intervalo_minimo: minutos entre escaneos de un ticker en el umbral
+            intervalo_maximo: minutos entre escaneos de un ticker lejos del umbral
+            presupuesto_hora: máximo de tickers escaneados por hora
+            sigmas_maximo: distancia (en volatilidades) a partir de la cual se usa el máximo
+            volatilidad_minima: suelo de la volatilidad del IVR entre escaneos
+            ventana_volatilidad: escaneos recordados por ticker
+        """
+        self.umbrales = (umbral_compra, umbral_venta)
+        self.intervalo_minimo = intervalo_minimo
+        self.intervalo_maximo = intervalo_maximo
+        self.presupuesto_hora = presupuesto_hora
+        self.sigmas_maximo = sigmas_maximo
+        self.volatilidad_minima = volatilidad_minima
+        self.ventana_volatilidad = ventana_volatilidad
+        
+        self.ivrs = {}            # ticker -> deque de IVR recientes
+        self.intervalos = {}      # ticker -> minutos (antes de aplicar el presupuesto)
+        self.vencimientos = {}    # ticker -> próximo escaneo
+        self._cola = []           # heap de (vencimiento, ticker); entradas viejas se ignoran
+    
+    def volatilidad(self, ticker_symbol):
+        """Desviación típica de los cambios de IVR entre escaneos"""
+        ivrs = self.ivrs.get(ticker_symbol)
+        if not ivrs or len(ivrs) < 3:
+            return self.volatilidad_minima
+        return max(float(np.std(np.diff(ivrs))), self.volatilidad_minima)
+    
+    def distancia_umbral(self, ivr):
+        """Distancia absoluta al umbral más cercano"""
+        return min(abs(ivr - umbral) for umbral in self.umbrales)
+    
+    def calcular_intervalo(self, ticker_symbol):
+        """
+        Minutos hasta el próximo escaneo (sin presupuesto)
+        
+        Lineal en el número de volatilidades que separan el IVR del umbral:
+        0 -> intervalo_minimo, sigmas_maximo o más -> intervalo_maximo.
+        """
+        ivrs = self.ivrs.get(ticker_symbol)
+        if not ivrs or pd.isna(ivrs[-1]):
+            return self.intervalo_maximo
+        
+        sigmas = self.distancia_umbral(ivrs[-1]) / self.volatilidad(ticker_symbol)
+        fraccion = min(sigmas / self.sigmas_maximo, 1.0)
+        return self.intervalo_minimo + fraccion * (self.intervalo_maximo - self.intervalo_minimo)
+    
+    def factor_presupuesto(self):
+        """Multiplicador de los intervalos para no superar presupuesto_hora"""
+        if not self.intervalos:
+            return 1.0
+        demanda = sum(60 / intervalo for intervalo in self.intervalos.values())
+        return max(1.0, demanda / self.presupuesto_hora)
+    
+    def _programar(self, ticker_symbol, momento, minutos):
+        vencimiento = momento + timedelta(minutes=minutos)
+        self.vencimientos[ticker_symbol] = vencimiento
+        heapq.heappush(self._cola, (vencimiento, ticker_symbol))
+    
+    def registrar_resultados(self, df_resultados, momento, solicitados=()):
+        """
+        Actualizar IVR e intervalos con un escaneo y reprogramar los tickers
+        
+        Args:
+            df_resultados: DataFrame con ticker e ivr
+            momento: hora del escaneo
+            solicitados: tickers pedidos; los que fallaron se reintentan
+                         tras intervalo_minimo
+        """
+        escaneados = set()
+        for ticker_symbol, ivr in zip(df_resultados['ticker'], df_resultados['ivr']):
+            if ticker_symbol not in self.ivrs:
+                self.ivrs[ticker_symbol] = deque(maxlen=self.ventana_volatilidad)
+            self.ivrs[ticker_symbol].append(float(ivr))
+            self.intervalos[ticker_symbol] = self.calcular_intervalo(ticker_symbol)
+            escaneados.add(ticker_symbol)
+        
+        factor = self.factor_presupuesto()
+        for ticker_symbol in escaneados:
+            self._programar(ticker_symbol, momento, self.intervalos[ticker_symbol] * factor)
+        
+        self.reintentar(set(solicitados) - escaneados, momento)
+    
+    def reintentar(self, tickers, momento):
+        """Volver a programar tras intervalo_minimo tickers cuyo escaneo falló"""
+        for ticker_symbol in tickers:
+            self._programar(ticker_symbol, momento, self.intervalo_minimo)
+    
+    def podar(self, tickers_vigentes):
+        """Olvidar los tickers que ya no están en la configuración (y su demanda en el presupuesto)"""
+        vigentes = set(tickers_vigentes)
+        for estado in (self.ivrs, self.intervalos, self.vencimientos):
+            for ticker_symbol in [t for t in estado if t not in vigentes]:
+                del estado[ticker_symbol]
+    
+    def extraer_vencidos(self, momento, maximo=None, holgura=timedelta(0)):
+        """
+        Sacar de la cola los tickers vencidos, primero los más atrasados
+        
+        Args:
+            momento: hora actual
+            maximo: tope de tickers (los que no caben siguen en la cola; 0 = ninguno)
+            holgura: adelantar los que vencen antes del próximo ciclo
+                     (normalmente medio ciclo)
+        
+        Returns:
+            lista de tickers a reescanear
+        """
+        vencidos = []
+        limite = momento + holgura
+        while self._cola and self._cola[0][0] <= limite:
+            if maximo is not None and len(vencidos) >= maximo:
+                break
+            vencimiento, ticker_symbol = heapq.heappop(self._cola)
+            if self.vencimientos.get(ticker_symbol) != vencimiento:
+                continue  # entrada reprogramada después
+            del self.vencimientos[ticker_symbol]
+            vencidos.append(ticker_symbol)
+        return vencidos
+    
+    def presupuesto_ciclo(self, minutos_ciclo):
+        """Tickers que caben en un ciclo de `minutos_ciclo` minutos"""
+        return max(1, int(self.presupuesto_hora * minutos_ciclo / 60))
+    
+    def resumen(self):
+        """DataFrame con IVR, volatilidad, intervalo y próximo escaneo por ticker"""
+        factor = self.factor_presupuesto()
+        filas = [{
+            'ticker': ticker_symbol,
+            'ivr': ivrs[-1],
+            'volatilidad': self.volatilidad(ticker_symbol),
+            'distancia_umbral': self.distancia_umbral(ivrs[-1]),
+            'intervalo_minutos': self.intervalos[ticker_symbol] * factor,
+            'proximo_escaneo': self.vencimientos.get(ticker_symbol),
+        } for ticker_symbol, ivrs in self.ivrs.items()]
+        df = pd.DataFrame(filas)
+        return df.sort_values('intervalo_minutos').reset_index(drop=True) if filas else df
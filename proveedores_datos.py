@@ -0,0 +1,205 @@
+"""
+Proveedores de Datos de Mercado
+Interfaz común para obtener info/historial: Yahoo Finance, grabación y replay offline
+"""
+
+import yfinance as yf
+import pandas as pd
+import json
+import os
+import threading
+
+
+class ProveedorDatos:
+    """Interfaz de una fuente de datos de mercado para ScreenerIVR"""
+    
+    def obtener_info(self, ticker_symbol):
+        """Dict de fundamentales (mismo formato que ticker.info)"""
+        raise NotImplementedError
+    
+    def obtener_historial(self, ticker_symbol, period="1y", start=None):
+        """DataFrame OHLCV diario (mismo formato que ticker.history)"""
+        raise NotImplementedError
+    
+    def descargar_historiales(self, tickers_list, period="1y", start=None):
+        """
+        Historial de varios tickers
+        
+        Por defecto pide uno a uno; los proveedores con descarga
+        multi-ticker lo sobrescriben.
+        
+        Returns:
+            dict ticker -> DataFrame OHLCV (solo tickers con datos)
+        """
+        historiales = {}
+        for ticker_symbol in tickers_list:
+            try:
+                hist = self.obtener_historial(ticker_symbol, period=period, start=start)
+            except Exception as e:
+                print(f"Error obteniendo historial de {ticker_symbol}: {e}")
+                continue
+            if hist is not None and not hist.empty:
+                historiales[ticker_symbol] = hist
+        return historiales
+
+
+class ProveedorYFinance(ProveedorDatos):
+    """Datos en vivo desde Yahoo Finance"""
+    
+    def obtener_info(self, ticker_symbol):
+        return yf.Ticker(ticker_symbol).info
+    
+    def obtener_historial(self, ticker_symbol, period="1y", start=None):
+        rango = {'start': start} if start is not None else {'period': period}
+        return yf.Ticker(ticker_symbol).history(**rango)
+    
+    def descargar_historiales(self, tickers_list, period="1y", start=None):
+        """Una sola petición multi-ticker con yf.download"""
+        tickers_list = list(tickers_list)
+        rango = {'start': start} if start is not None else {'period': period}
+        df = yf.download(tickers_list, group_by='ticker', auto_adjust=True,
+                         threads=True, progress=False, **rango)
+        return self._separar_historiales(df, tickers_list)
+    
+    def _separar_historiales(self, df, lote):
+        """Dividir la descarga multi-ticker en un DataFrame por ticker"""
+        historiales = {}
+        if df is None or df.empty:
+            return historiales
+        
+        if isinstance(df.columns, pd.MultiIndex):
+            disponibles = set(df.columns.get_level_values(0))
+            for ticker_symbol in lote:
+                if ticker_symbol not in disponibles:
+                    continue
+                hist = df[ticker_symbol].dropna(how='all')
+                if not hist.empty:
+                    historiales[ticker_symbol] = hist
+        elif len(lote) == 1:
+            hist = df.dropna(how='all')
+            if not hist.empty:
+                historiales[lote[0]] = hist
+        
+        return historiales
+
+
+def _recortar_periodo(hist, period="1y", start=None):
+    """Aplicar period/start de yfinance a un historial ya grabado"""
+    if hist.empty:
+        return hist
+    
+    fechas = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+    
+    if start is not None:
+        return hist[fechas >= pd.Timestamp(start)]
+    
+    if not period or period == 'max':
+        return hist
+    
+    cantidad = int(''.join(c for c in period if c.isdigit()) or 1)
+    unidad = period.lstrip('0123456789')
+    desplazamientos = {
+        'd': pd.DateOffset(days=cantidad),
+        'wk': pd.DateOffset(weeks=cantidad),
+        'mo': pd.DateOffset(months=cantidad),
+        'y': pd.DateOffset(years=cantidad),
+    }
+    if unidad == 'ytd':
+        inicio = pd.Timestamp(year=fechas[-1].year, month=1, day=1)
+    elif unidad in desplazamientos:
+        inicio = fechas[-1] - desplazamientos[unidad]
+    else:
+        raise ValueError(f"Periodo no soportado: {period}")
+    
+    return hist[fechas > inicio]
+
+
+class ProveedorGrabador(ProveedorDatos):
+    """Envuelve otro proveedor y graba en disco todas sus respuestas"""
+    
+    def __init__(self, proveedor, directorio='grabacion_datos'):
+        """
+        Args:
+            proveedor: ProveedorDatos real (normalmente ProveedorYFinance)
+            directorio: carpeta donde se guardan info (JSON) e historial (pickle)
+        """
+        self.proveedor = proveedor
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directorio, 'info'), exist_ok=True)
+        os.makedirs(os.path.join(directorio, 'historial'), exist_ok=True)
+    
+    def _ruta_info(self, ticker_symbol):
+        return os.path.join(self.directorio, 'info', f'{ticker_symbol}.json')
+    
+    def _ruta_historial(self, ticker_symbol):
+        return os.path.join(self.directorio, 'historial', f'{ticker_symbol}.pkl')
+    
+    def obtener_info(self, ticker_symbol):
+        info = self.proveedor.obtener_info(ticker_symbol)
+        with open(self._ruta_info(ticker_symbol), 'w') as f:
+            json.dump(info, f, default=str)
+        return info
+    
+    def _grabar_historial(self, ticker_symbol, hist):
+        """Fusionar barras nuevas con las ya grabadas (las nuevas mandan)"""
+        if hist is None or hist.empty:
+            return
+        ruta = self._ruta_historial(ticker_symbol)
+        with self._lock:
+            if os.path.exists(ruta):
+                grabado = pd.read_pickle(ruta)
+                hist = pd.concat([grabado, hist])
+                hist = hist[~hist.index.duplicated(keep='last')].sort_index()
+            hist.to_pickle(ruta)
+    
+    def obtener_historial(self, ticker_symbol, period="1y", start=None):
+        hist = self.proveedor.obtener_historial(ticker_symbol, period=period, start=start)
+        self._grabar_historial(ticker_symbol, hist)
+        return hist
+    
+    def descargar_historiales(self, tickers_list, period="1y", start=None):
+        historiales = self.proveedor.descargar_historiales(
+            tickers_list, period=period, start=start
+        )
+        for ticker_symbol, hist in historiales.items():
+            self._grabar_historial(ticker_symbol, hist)
+        return historiales
+
+
+class ProveedorReplay(ProveedorDatos):
+    """Sirve desde disco los datos grabados por ProveedorGrabador (sin red)"""
+    
+    def __init__(self, directorio='grabacion_datos'):
+        """
+        Args:
+            directorio: carpeta de una grabación previa
+        """
+        self.directorio = directorio
+        self._infos = {}
+        self._historiales = {}
+    
+    def tickers_disponibles(self):
+        """Tickers con info grabada"""
+        carpeta = os.path.join(self.directorio, 'info')
+        if not os.path.exists(carpeta):
+            return []
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(carpeta)
+                      if f.endswith('.json'))
+    
+    def obtener_info(self, ticker_symbol):
+        if ticker_symbol not in self._infos:
+            ruta = os.path.join(self.directorio, 'info', f'{ticker_symbol}.json')
+            if not os.path.exists(ruta):
+                raise KeyError(f"{ticker_symbol} no está en la grabación")
+            with open(ruta, 'r') as f:
+                self._infos[ticker_symbol] = json.load(f)
+        return self._infos[ticker_symbol]
+    
+    def obtener_historial(self, ticker_symbol, period="1y", start=None):
+        if ticker_symbol not in self._historiales:
+            ruta = os.path.join(self.directorio, 'historial', f'{ticker_symbol}.pkl')
+            if not os.path.exists(ruta):
+                return pd.DataFrame()
+            self._historiales[ticker_symbol] = pd.read_pickle(ruta)
+        return _recortar_periodo(self._historiales[ticker_symbol], period, start)
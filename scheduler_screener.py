@@ -5,23 +5,80 @@ Ejecuta el screener cada X minutos y envía alertas
 
 import schedule
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
-from screener_ivr import ScreenerIVR
+from screener_ivr import ScreenerIVR, RankingTopK
 from sistema_alertas import SistemaAlertas
+from cache_fundamentales import CacheFundamentales
+from almacen_precios import AlmacenPrecios
+from proveedores_datos import ProveedorYFinance, ProveedorGrabador, ProveedorReplay
+from historial_ivr import HistorialIVR
+from calendario_mercado import CalendarioMercado
+from prioridad_escaneo import ColaPrioridadEscaneo
+from montecarlo_valoracion import valorar_montecarlo
+from motor_vectorizado import aplicar_esquema
+from instrumentacion import Instrumentacion
+from escaneo_distribuido import escanear_distribuido
+from functools import partial
 import json
 import os
 
 
+def crear_proveedor(config):
+    """Fuente de datos: 'yfinance' (en vivo), 'grabar' o 'replay' (offline)"""
+    modo = config.get('proveedor', 'yfinance')
+    directorio = config.get('directorio_grabacion', 'grabacion_datos')
+    
+    if modo == 'grabar':
+        return ProveedorGrabador(ProveedorYFinance(), directorio)
+    if modo == 'replay':
+        return ProveedorReplay(directorio)
+    return ProveedorYFinance()
+
+
+def crear_screener(config, instrumentacion=None):
+    """
+    Crear screener con pesos, concurrencia y caches de una configuración
+    
+    Función de módulo y no método para poder pasarla (con functools.partial)
+    a los procesos de escanear_distribuido.
+    """
+    cache = None
+    if config.get('cache_fundamentales', False):
+        cache = CacheFundamentales(
+            ttl_horas=config.get('cache_ttl_horas', 6)
+        )
+    
+    almacen = None
+    if config.get('almacen_precios', False):
+        almacen = AlmacenPrecios()
+    
+    return ScreenerIVR(
+        pesos_personalizados=config['pesos'],
+        proveedor=crear_proveedor(config),
+        max_workers=config.get('max_workers', 1),
+        max_peticiones_por_segundo=config.get('max_peticiones_por_segundo'),
+        cache_fundamentales=cache,
+        almacen_precios=almacen,
+        instrumentacion=instrumentacion
+    )
+
+
 class SchedulerScreener:
     """Ejecuta screener automáticamente en intervalos definidos"""
     
     def __init__(self, config_file='config_scheduler.json'):
         self.config_file = config_file
         self.config = self.cargar_config()
-        self.screener = ScreenerIVR(pesos_personalizados=self.config['pesos'])
+        self.instrumentacion = Instrumentacion(activa=self.config.get('instrumentacion', False))
+        self.screener = self.crear_screener()
         self.sistema_alertas = SistemaAlertas()
         self.ultimo_resultado = None
+        self.historial = HistorialIVR(self.config.get('directorio_historial', 'historial_screener'))
+        self.historial.importar_csv()
+        self.calendario = CalendarioMercado()
+        self.ultimo_escaneo_ticker = {}  # ticker -> momento del último escaneo correcto
+        self.cola_prioridad = self.crear_cola_prioridad()
     
     def cargar_config(self):
         """Cargar configuración del scheduler"""
@@ -48,33 +105,274 @@ class SchedulerScreener:
                 'calidad': 0.30,
                 'timing': 0.10
             },
+            'proveedor': 'yfinance',
+            'max_workers': 8,
+            'max_peticiones_por_segundo': 5,
+            'cache_fundamentales': True,
+            'cache_ttl_horas': 6,
+            'almacen_precios': True,
             'guardar_historial': True,
+            'directorio_historial': 'historial_screener',
+            'respetar_horario_mercado': True,
+            'frescura_precio_minutos': 30,
+            'frescura_fundamentales_horas': 24,
+            'prioridad_umbral': True,
+            'intervalo_minimo_minutos': 5,
+            'intervalo_maximo_minutos': 60,
+            'presupuesto_tickers_hora': 600,
+            'montecarlo_simulaciones': 1000,
+            'instrumentacion': True,
+            'tamaño_bloque': 200,
+            'prefiltro_fundamentales': True,
+            'procesos_escaneo': 1,
+            'tamaño_fragmento': 500,
+            'directorio_cola': 'cola_escaneo',
+            'lideres_cada': 250,
+            'archivo_estadisticas': 'estadisticas_escaneo.json',
             'enviar_alertas': True,
             'umbral_compra': 0.60,
             'umbral_venta': 0.30
         }
     
+    def crear_screener(self):
+        """Crear screener con pesos, concurrencia y caches de la configuración"""
+        return crear_screener(self.config, self.instrumentacion)
+    
+    def crear_cola_prioridad(self):
+        """Cola de reescaneo por cercanía al umbral (None = intervalo fijo)"""
+        if not self.config.get('prioridad_umbral', False):
+            return None
+        return ColaPrioridadEscaneo(
+            umbral_compra=self.config['umbral_compra'],
+            umbral_venta=self.config['umbral_venta'],
+            intervalo_minimo=self.config.get('intervalo_minimo_minutos', 5),
+            intervalo_maximo=self.config.get('intervalo_maximo_minutos', 60),
+            presupuesto_hora=self.config.get('presupuesto_tickers_hora', 600)
+        )
+    
+    def minutos_ciclo(self):
+        """Cada cuánto revisa el modo automático qué tickers reescanear"""
+        if self.cola_prioridad is not None:
+            return self.cola_prioridad.intervalo_minimo
+        return self.config['intervalo_minutos']
+    
+    def crear_proveedor(self):
+        """Fuente de datos: 'yfinance' (en vivo), 'grabar' o 'replay' (offline)"""
+        return crear_proveedor(self.config)
+    
     def guardar_config(self):
         """Guardar configuración"""
         with open(self.config_file, 'w') as f:
             json.dump(self.config, f, indent=2)
     
-    def ejecutar_screener(self):
-        """Ejecutar el screener completo"""
+    def tickers_vencidos(self, momento=None):
+        """
+        Tickers cuyo precio o fundamentales superan su presupuesto de frescura
+        
+        Con el mercado abierto el precio vence a los `frescura_precio_minutos`,
+        o según la cola de prioridad si está activa; con la cola, todo lo
+        vencido (también tickers nuevos y fundamentales caducados) se limita
+        al presupuesto del ciclo y el resto espera al siguiente; con
+        el mercado cerrado solo si es anterior al último cierre. Los
+        fundamentales vencen a las `frescura_fundamentales_horas`.
+        
+        Returns:
+            (tickers vencidos, tickers con fundamentales vencidos)
+        """
+        momento = momento or self.calendario.ahora()
+        abierto = self.calendario.mercado_abierto(momento)
+        ultimo_cierre = self.calendario.ultimo_cierre(momento)
+        presupuesto_precio = timedelta(minutes=self.config.get(
+            'frescura_precio_minutos', self.config['intervalo_minutos']))
+        presupuesto_fundamentales = self.config.get('frescura_fundamentales_horas', 24) * 3600
+        cache = self.screener.cache_fundamentales
+        
+        usar_cola = abierto and self.cola_prioridad is not None
+        if self.cola_prioridad is not None:
+            self.cola_prioridad.podar(self.config['tickers'])
+        
+        # Primero lo que vence sin depender de la cola: tickers nuevos y
+        # fundamentales caducados
+        obligatorios, fundamentales_vencidos, precio_pendiente = [], [], []
+        for ticker in self.config['tickers']:
+            ultimo = self.ultimo_escaneo_ticker.get(ticker)
+            if ultimo is None:
+                obligatorios.append(ticker)
+                continue
+            
+            edad = cache.edad_segundos(ticker) if cache is not None else None
+            if edad is None:
+                edad = (momento - ultimo).total_seconds()
+            if edad >= presupuesto_fundamentales:
+                fundamentales_vencidos.append(ticker)
+                obligatorios.append(ticker)
+            elif not usar_cola and (momento - ultimo >= presupuesto_precio if abierto
+                                    else ultimo < ultimo_cierre):
+                precio_pendiente.append(ticker)
+        
+        if not usar_cola:
+            return obligatorios + precio_pendiente, fundamentales_vencidos
+        
+        # Con la cola, el presupuesto del ciclo cubre todo lo vencido: los
+        # obligatorios que no caben esperan al siguiente ciclo
+        minutos = self.minutos_ciclo()
+        presupuesto = self.cola_prioridad.presupuesto_ciclo(minutos)
+        obligatorios = obligatorios[:presupuesto]
+        caben = set(obligatorios)
+        fundamentales_vencidos = [t for t in fundamentales_vencidos if t in caben]
+        vencidos_cola = self.cola_prioridad.extraer_vencidos(
+            momento, presupuesto - len(obligatorios), holgura=timedelta(minutes=minutos / 2)
+        )
+        elegidos = set(obligatorios) | set(vencidos_cola)
+        vencidos = [t for t in self.config['tickers'] if t in elegidos]
+        return vencidos, fundamentales_vencidos
+    
+    def ciclo_automatico(self):
+        """Una pasada del modo automático: reescanear solo lo vencido"""
+        if not self.config.get('respetar_horario_mercado', True):
+            self.ejecutar_screener()
+            return
+        
+        vencidos, fundamentales_vencidos = self.tickers_vencidos()
+        abierto = self.calendario.mercado_abierto()
+        estado = "Mercado abierto" if abierto else "Mercado cerrado"
+        
+        if not vencidos:
+            print(f"💤 {estado} - datos al día, nada que escanear "
+                  f"({datetime.now().strftime('%H:%M')})")
+            return
+        
+        # Forzar descarga de fundamentales vencidos aunque el cache los tenga
+        cache = self.screener.cache_fundamentales
+        if cache is not None and fundamentales_vencidos:
+            cache.invalidar(fundamentales_vencidos)
+        
+        print(f"\n🔎 {estado} - {len(vencidos)}/{len(self.config['tickers'])} tickers vencidos")
+        self.ejecutar_screener(vencidos)
+    
+    def combinar_resultados(self, df_nuevos):
+        """Sustituir en el último resultado las filas de los tickers reescaneados"""
+        if self.ultimo_resultado is None:
+            return df_nuevos
+        
+        anteriores = self.ultimo_resultado[
+            ~self.ultimo_resultado['ticker'].isin(df_nuevos['ticker'])
+            & self.ultimo_resultado['ticker'].isin(self.config['tickers'])
+        ]
+        df = aplicar_esquema(pd.concat([anteriores, df_nuevos], ignore_index=True))
+        df = df.sort_values('ivr', ascending=False, kind='stable').reset_index(drop=True)
+        df.attrs['fecha'] = df_nuevos.attrs.get('fecha')
+        return df
+    
+    def añadir_montecarlo(self, df_resultados):
+        """Añadir percentiles de valor intrínseco y prob. de margen > 20% (Monte Carlo)"""
+        n_simulaciones = self.config.get('montecarlo_simulaciones', 0)
+        if not n_simulaciones:
+            return df_resultados
+        
+        tabla = self.screener.tabla_fundamentales(df_resultados['ticker'])
+        if tabla.empty:
+            return df_resultados
+        
+        mc = valorar_montecarlo(tabla, n_simulaciones)
+        
+        # Columnas nuevas sobre el mismo DataFrame (un merge lo copiaría entero)
+        mc = mc[~mc.index.duplicated()].reindex(df_resultados['ticker'].to_numpy())
+        for columna in ['vi_p5', 'vi_p50', 'vi_p95', 'prob_margen_20']:
+            df_resultados[columna] = mc[columna].to_numpy()
+        return df_resultados
+    
+    def seguimiento_parcial(self, total):
+        """
+        Callback para escanear_lista que imprime el top 3 provisional
+        cada `lideres_cada` tickers (None si está desactivado)
+        """
+        cada = self.config.get('lideres_cada', 0)
+        if not cada or total <= cada:
+            return None
+        ranking = RankingTopK(k=3)
+        
+        def al_resultado(ticker, resultado):
+            ranking.agregar(resultado)
+            if ranking.procesados % cada == 0 and ranking.procesados < total:
+                lideres = ", ".join(f"{r['ticker']} ({r['ivr']:.2%})" for r in ranking.mejores())
+                print(f"📈 Parcial {ranking.procesados}/{total} — "
+                      f"{ranking.aprobados} aprobados — líderes: {lideres or '-'}")
+        
+        return al_resultado
+    
+    def escanear_en_procesos(self, lista, procesos):
+        """
+        Escanear repartiendo la lista en fragmentos entre varios procesos
+        
+        Cada proceso crea su screener con esta configuración; el límite de
+        peticiones por segundo se reparte entre ellos para no superar el global.
+        """
+        config = dict(self.config)
+        if config.get('max_peticiones_por_segundo'):
+            config['max_peticiones_por_segundo'] = config['max_peticiones_por_segundo'] / procesos
+        
+        with self.instrumentacion.etapa('escanear_distribuido'):
+            return escanear_distribuido(
+                lista, procesos,
+                directorio=self.config.get('directorio_cola', 'cola_escaneo'),
+                fabrica_screener=partial(crear_screener, config),
+                tamaño_fragmento=self.config.get('tamaño_fragmento', 500),
+                opciones_escaneo={
+                    'tamaño_bloque': self.config.get('tamaño_bloque'),
+                    'prefiltro': self.config.get('prefiltro_fundamentales', False),
+                },
+                screener=self.screener
+            )
+    
+    def ejecutar_screener(self, tickers=None):
+        """
+        Ejecutar el screener
+        
+        Args:
+            tickers: subconjunto a reescanear (None = todos los de la configuración);
+                     el resto conserva su fila del último resultado
+        """
         timestamp = datetime.now()
         print(f"\n{'='*80}")
         print(f"🔄 Ejecutando screener - {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*80}")
         
+        medir = self.instrumentacion
+        medir.reiniciar()
+        inicio = time.perf_counter()
+        lista = tickers or self.config['tickers']
+        reprogramados = False
+        
         try:
-            # Escanear tickers
-            df_resultados = self.screener.escanear_lista(self.config['tickers'])
+            # Escanear tickers (por bloques, mostrando los líderes provisionales)
+            procesos = self.config.get('procesos_escaneo', 1)
+            if procesos > 1 and len(lista) > self.config.get('tamaño_fragmento', 500):
+                df_nuevos = self.escanear_en_procesos(lista, procesos)
+            else:
+                df_nuevos = self.screener.escanear_lista(
+                    lista,
+                    tamaño_bloque=self.config.get('tamaño_bloque'),
+                    al_resultado=self.seguimiento_parcial(len(lista)),
+                    prefiltro=self.config.get('prefiltro_fundamentales', False)
+                )
             
-            if df_resultados.empty:
+            if df_nuevos.empty:
                 print("❌ No se obtuvieron resultados")
                 return
             
+            with medir.etapa('montecarlo'):
+                df_nuevos = self.añadir_montecarlo(df_nuevos)
+            
+            momento = self.calendario.ahora()
+            for ticker in df_nuevos['ticker']:
+                self.ultimo_escaneo_ticker[ticker] = momento
+            if self.cola_prioridad is not None:
+                self.cola_prioridad.registrar_resultados(df_nuevos, momento, solicitados=lista)
+                reprogramados = True
+            
             # Guardar resultado
+            df_resultados = self.combinar_resultados(df_nuevos) if tickers else df_nuevos
             self.ultimo_resultado = df_resultados
             
             # Estadísticas
@@ -89,67 +387,91 @@ class SchedulerScreener:
             print(f"   🟢 Señales COMPRA: {señales_compra}")
             print(f"   🔴 Señales VENTA: {señales_venta}")
             
+            cache = self.screener.cache_fundamentales
+            if cache is not None:
+                stats = cache.estadisticas()
+                print(f"   🗄️  Cache fundamentales: {stats['hits']} hits, "
+                      f"{stats['misses']} misses ({stats['tasa_acierto']:.0%})")
+                cache.reiniciar_estadisticas()
+            
             # Top 3 oportunidades
             print(f"\n🏆 Top 3 por IVR:")
             for idx, row in df_resultados.head(3).iterrows():
                 print(f"   {idx+1}. {row['ticker']} - IVR: {row['ivr']:.2%} - "
                       f"{'✅' if row['pasa_filtros'] else '❌'} - {row['nombre'][:30]}")
             
-            # Guardar historial
+            # Guardar historial (solo lo reescaneado: el resto ya tiene su observación)
             if self.config['guardar_historial']:
-                self.guardar_historial(df_resultados, timestamp)
+                with medir.etapa('guardar_historial'):
+                    self.guardar_historial(df_nuevos, timestamp)
             
-            # Enviar alertas si hay señales
-            if self.config['enviar_alertas'] and (señales_compra > 0 or señales_venta > 0):
-                print("\n📧 Enviando alertas por email...")
-                self.sistema_alertas.enviar_alerta(df_resultados)
+            # Enviar alertas si hay señales (solo de los tickers recién escaneados)
+            nuevas_señales = ((df_nuevos['ivr'] >= self.config['umbral_compra']) |
+                              (df_nuevos['ivr'] <= self.config['umbral_venta'])).any()
+            if self.config['enviar_alertas'] and nuevas_señales:
+                print("\n📧 Encolando alertas por email...")
+                with medir.etapa('alertas'):
+                    self.sistema_alertas.encolar_alerta(df_nuevos)
             
             print(f"\n✅ Screener completado exitosamente")
-            
+        
         except Exception as e:
+            medir.contar_error('ejecutar_screener')
             print(f"\n❌ Error ejecutando screener: {e}")
             import traceback
             traceback.print_exc()
+        
+        finally:
+            # Sin resultados o con error: los tickers sacados de la cola vuelven
+            # a ella (tras intervalo_minimo) en lugar de perderse
+            if self.cola_prioridad is not None and not reprogramados:
+                self.cola_prioridad.reintentar(lista, self.calendario.ahora())
+            medir.registrar('ejecutar_screener', time.perf_counter() - inicio)
+            self.reportar_instrumentacion()
+    
+    def reportar_instrumentacion(self):
+        """Imprimir tiempos por etapa y exportarlos a JSON"""
+        if not self.instrumentacion.activa:
+            return
+        self.instrumentacion.imprimir_resumen()
+        archivo = self.config.get('archivo_estadisticas')
+        if archivo:
+            try:
+                self.instrumentacion.exportar_json(archivo)
+            except Exception as e:
+                print(f"❌ Error exportando estadísticas: {e}")
     
     def guardar_historial(self, df, timestamp):
-        """Guardar resultados en historial CSV"""
-        historial_dir = 'historial_screener'
-        os.makedirs(historial_dir, exist_ok=True)
-        
-        # Agregar timestamp
-        df_con_timestamp = df.copy()
-        df_con_timestamp['timestamp'] = timestamp
-        
-        # Guardar archivo diario
-        fecha_str = timestamp.strftime('%Y%m%d')
-        archivo_diario = os.path.join(historial_dir, f'screener_{fecha_str}.csv')
-        
-        if os.path.exists(archivo_diario):
-            # Agregar al archivo existente
-            df_existente = pd.read_csv(archivo_diario)
-            df_combinado = pd.concat([df_existente, df_con_timestamp], ignore_index=True)
-            df_combinado.to_csv(archivo_diario, index=False)
-        else:
-            # Crear nuevo archivo
-            df_con_timestamp.to_csv(archivo_diario, index=False)
+        """Guardar resultados en el historial Parquet (un archivo por escaneo)"""
+        ruta = self.historial.guardar(df, timestamp)
+        print(f"   💾 Historial guardado en: {ruta}")
         
-        print(f"   💾 Historial guardado en: {archivo_diario}")
+        # Fusionar los archivos de días anteriores (el día en curso sigue abierto)
+        compactadas = self.historial.compactar_pendientes()
+        for fecha, archivos in compactadas.items():
+            print(f"   🗜️  Historial {fecha}: {archivos} archivos compactados")
     
     def iniciar_modo_automatico(self):
         """Iniciar ejecución automática según intervalo configurado"""
-        intervalo = self.config['intervalo_minutos']
+        intervalo = self.minutos_ciclo()
         
         print(f"\n🤖 Iniciando modo automático")
         print(f"⏱️  Intervalo: {intervalo} minutos")
         print(f"📋 Tickers a monitorear: {len(self.config['tickers'])}")
         print(f"📧 Alertas por email: {'✅ Activadas' if self.config['enviar_alertas'] else '❌ Desactivadas'}")
+        if self.config.get('respetar_horario_mercado', True):
+            print(f"🕒 Horario NYSE: fuera de sesión solo se refrescan datos vencidos")
+        if self.cola_prioridad is not None:
+            print(f"🎯 Prioridad por umbral: cada {self.cola_prioridad.intervalo_minimo}-"
+                  f"{self.cola_prioridad.intervalo_maximo} min, "
+                  f"máx. {self.cola_prioridad.presupuesto_hora} tickers/hora")
         print(f"\nPresiona Ctrl+C para detener\n")
         
         # Programar tarea
-        schedule.every(intervalo).minutes.do(self.ejecutar_screener)
+        schedule.every(intervalo).minutes.do(self.ciclo_automatico)
         
         # Ejecutar una vez inmediatamente
-        self.ejecutar_screener()
+        self.ciclo_automatico()
         
         # Loop infinito
         try:
@@ -158,6 +480,9 @@ class SchedulerScreener:
                 time.sleep(30)  # Revisar cada 30 segundos
         except KeyboardInterrupt:
             print("\n\n🛑 Scheduler detenido por el usuario")
+        finally:
+            schedule.clear()
+            self.sistema_alertas.detener()
     
     def ejecutar_una_vez(self):
         """Ejecutar screener una sola vez (útil para testing)"""
@@ -216,9 +541,15 @@ def menu_interactivo():
                     'calidad': cal / total,
                     'timing': tim / total
                 }
-                scheduler.screener = ScreenerIVR(scheduler.config['pesos'])
+                scheduler.screener = scheduler.crear_screener()
                 scheduler.guardar_config()
                 print("✅ Pesos actualizados y normalizados")
+                
+                # Re-puntuar el último resultado con los pesos nuevos (sin red)
+                if scheduler.ultimo_resultado is not None:
+                    scheduler.ultimo_resultado = scheduler.screener.recalcular_ivr(
+                        scheduler.ultimo_resultado
+                    )
             except:
                 print("❌ Error en los valores ingresados")
         
@@ -255,20 +586,18 @@ def menu_interactivo():
                 print("\n⚠️  No hay resultados aún. Ejecuta el screener primero.")
         
         elif opcion == '7':
-            historial_dir = 'historial_screener'
-            if os.path.exists(historial_dir):
-                archivos = sorted(os.listdir(historial_dir))
-                if archivos:
-                    print("\n📈 Archivos de historial:")
-                    for i, archivo in enumerate(archivos[-5:], 1):  # Últimos 5
-                        print(f"  {i}. {archivo}")
-                else:
-                    print("\n⚠️  No hay historial guardado")
+            resumen = scheduler.historial.resumen()
+            if not resumen.empty:
+                print("\n📈 Historial (últimos 5 días):")
+                for i, fila in enumerate(resumen.tail(5).itertuples(), 1):
+                    print(f"  {i}. {fila.fecha}: {fila.escaneos} escaneos "
+                          f"({fila.archivos} archivos)")
             else:
                 print("\n⚠️  No hay historial guardado")
         
         elif opcion == '8':
             print("\n👋 ¡Hasta luego!")
+            scheduler.sistema_alertas.detener()
             break
         
         else:
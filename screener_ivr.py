@@ -3,23 +3,133 @@ Screener Financiero con Índice de Valoración Relativo (IVR)
 Sistema de valoración basado en múltiplos, DCF y timing
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import threading
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import warnings
+from proveedores_datos import ProveedorYFinance
+from motor_vectorizado import (extraer_fila, construir_tabla, puntuar_universo, compactar_info,
+                               construir_resultado, ESQUEMA_RESULTADO)
+from indicadores_panel import construir_panel, calcular_timing_panel
+from instrumentacion import Instrumentacion
 warnings.filterwarnings('ignore')
 
 
+class LimitadorTasa:
+    """Limita las peticiones por segundo, compartido entre todos los hilos"""
+    
+    def __init__(self, max_por_segundo=None):
+        """
+        Args:
+            max_por_segundo: peticiones máximas por segundo (None = sin límite)
+        """
+        self.intervalo = 1.0 / max_por_segundo if max_por_segundo else 0
+        self._lock = threading.Lock()
+        self._proximo_turno = 0.0
+    
+    def esperar(self):
+        """Bloquear hasta que haya turno disponible para una petición"""
+        if self.intervalo <= 0:
+            return
+        
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo_turno)
+            self._proximo_turno = turno + self.intervalo
+        
+        espera = turno - ahora
+        if espera > 0:
+            time.sleep(espera)
+
+
+def _precio_info(info):
+    """Precio actual según ticker.info (None si no viene)"""
+    for campo in ('currentPrice', 'regularMarketPrice', 'previousClose'):
+        precio = info.get(campo)
+        if precio:
+            return float(precio)
+    return None
+
+
+class RankingTopK:
+    """Los k mejores resultados por IVR vistos hasta el momento (montículo de tamaño k)"""
+    
+    def __init__(self, k=10, solo_aprobados=True):
+        """
+        Args:
+            k: tamaño del ranking
+            solo_aprobados: ignorar los tickers que no pasan filtros
+        """
+        self.k = k
+        self.solo_aprobados = solo_aprobados
+        self.procesados = 0
+        self.aprobados = 0
+        self._monticulo = []   # (ivr, -orden de llegada, resultado): el peor arriba
+        self._llegadas = 0
+    
+    def agregar(self, resultado):
+        """
+        Añadir un resultado de calcular_ivr (None = ticker sin datos)
+        
+        Returns:
+            True si el resultado entra en el top
+        """
+        self.procesados += 1
+        if resultado is None:
+            return False
+        if resultado['pasa_filtros']:
+            self.aprobados += 1
+        elif self.solo_aprobados:
+            return False
+        
+        # A igual IVR se queda el que llegó antes
+        entrada = (resultado['ivr'], -self._llegadas, resultado)
+        self._llegadas += 1
+        if len(self._monticulo) < self.k:
+            heapq.heappush(self._monticulo, entrada)
+            return True
+        if entrada[:2] > self._monticulo[0][:2]:
+            heapq.heapreplace(self._monticulo, entrada)
+            return True
+        return False
+    
+    def mejores(self):
+        """Resultados del top, de mayor a menor IVR"""
+        return [r for _, _, r in sorted(self._monticulo, key=lambda e: e[:2], reverse=True)]
+    
+    def dataframe(self):
+        """
+        El top como DataFrame con el mismo esquema que escanear_lista
+        (ESQUEMA_RESULTADO; el resultado más reciente en df.attrs['fecha'])
+        """
+        mejores = self.mejores()
+        return construir_resultado(
+            {c: [r[c] for r in mejores] for c in ESQUEMA_RESULTADO},
+            fecha=max((r['fecha'] for r in mejores), default=None)
+        )
+
+
 class ScreenerIVR:
     """Motor de cálculo del Índice de Valoración Relativo"""
     
-    def __init__(self, pesos_personalizados=None):
+    def __init__(self, pesos_personalizados=None, max_workers=1,
+                 max_peticiones_por_segundo=None, cache_fundamentales=None,
+                 almacen_precios=None, proveedor=None, instrumentacion=None):
         """
         Inicializar con pesos configurables
         
         Args:
             pesos_personalizados: dict con keys 'valoracion', 'calidad', 'timing'
+            max_workers: hilos para descargar tickers en paralelo (1 = serie)
+            max_peticiones_por_segundo: límite global de peticiones a Yahoo
+            cache_fundamentales: CacheFundamentales opcional para ticker.info
+            almacen_precios: AlmacenPrecios opcional (descarga solo barras nuevas)
+            proveedor: ProveedorDatos de mercado (None = Yahoo Finance en vivo)
+            instrumentacion: Instrumentacion para medir cada etapa (None = sin medir)
         """
         self.pesos = pesos_personalizados or {
             'valoracion': 0.60,
@@ -34,18 +144,51 @@ class ScreenerIVR:
             'cagr_optimo': 0.15,   # 15% crecimiento anual óptimo
             'rsi_centro': 40,      # Centro del RSI ideal
             'rsi_rango': 40,       # Rango de normalización RSI
+            'rsi_suavizado': 'simple',  # 'simple' (media móvil) o 'wilder'
+            'holgura_prefiltro': 0.05,  # Caída del precio de info admitida al prefiltrar
         }
         
+        # Fuente de datos de mercado
+        self.proveedor = proveedor or ProveedorYFinance()
+        
+        # Concurrencia y límite de peticiones
+        self.max_workers = max_workers
+        self.limitador = LimitadorTasa(max_peticiones_por_segundo)
+        
+        # Cache persistente de fundamentales (None = sin cache)
+        self.cache_fundamentales = cache_fundamentales
+        
+        # Historial de precios local e incremental (None = descarga completa)
+        self.almacen_precios = almacen_precios
+        
+        # Historiales descargados en lote (ticker -> DataFrame) y su timing
+        self.historiales_precargados = {}
+        self.timing_precalculado = {}
+        
+        # Info ya descargada por el prefiltro (ticker -> FundamentalesTicker)
+        self.infos_precargadas = {}
+        
+        # Campos numéricos por ticker para el motor vectorizado
+        self.filas_fundamentales = {}
+        
+        # Último escaneo con sub-scores (para re-puntuar sin descargar)
+        self.ultimo_snapshot = None
+        
+        # Tiempos por etapa (desactivada: coste prácticamente nulo)
+        self.instrumentacion = instrumentacion or Instrumentacion(activa=False)
+    
     def obtener_datos_ticker(self, ticker_symbol):
         """Obtener todos los datos necesarios de un ticker"""
         try:
-            ticker = yf.Ticker(ticker_symbol)
-            
-            # Datos básicos
-            info = ticker.info
-            hist = ticker.history(period="1y")
+            # Datos básicos (solo los campos de info que usa el IVR)
+            info = (self.infos_precargadas.get(ticker_symbol) or
+                    self.obtener_fundamentales(ticker_symbol))
+            hist = self.historiales_precargados.get(ticker_symbol)
+            if hist is None:
+                hist = self.obtener_historial(ticker_symbol)
             
             if hist.empty:
+                self.instrumentacion.contar_error('datos')
                 return None
             
             # Precio actual
@@ -61,11 +204,187 @@ class ScreenerIVR:
             }
             
             return datos
-            
+        
         except Exception as e:
             print(f"Error obteniendo {ticker_symbol}: {e}")
+            self.instrumentacion.contar_error('datos')
             return None
     
+    def obtener_info(self, ticker_symbol):
+        """Obtener ticker.info consultando antes el cache de fundamentales"""
+        medir = self.instrumentacion
+        if self.cache_fundamentales is not None:
+            with medir.etapa('info_cache', ticker_symbol):
+                info = self.cache_fundamentales.obtener(ticker_symbol)
+            if info is not None:
+                return info
+        
+        self.limitador.esperar()
+        with medir.etapa('info', ticker_symbol):
+            info = self.proveedor.obtener_info(ticker_symbol)
+        medir.contar_bytes('info', info)
+        
+        if self.cache_fundamentales is not None and info:
+            self.cache_fundamentales.guardar(ticker_symbol, info)
+        
+        return info
+    
+    def obtener_fundamentales(self, ticker_symbol):
+        """
+        Campos de info que usa el IVR, como FundamentalesTicker
+        
+        El dict completo de ticker.info se descarta en cuanto se extraen.
+        """
+        return compactar_info(self.obtener_info(ticker_symbol), ticker_symbol)
+    
+    def obtener_historial(self, ticker_symbol):
+        """Obtener historial de un ticker, incremental si hay almacén de precios"""
+        medir = self.instrumentacion
+        if self.almacen_precios is None:
+            self.limitador.esperar()
+            with medir.etapa('historial', ticker_symbol):
+                hist = self.proveedor.obtener_historial(ticker_symbol, period="1y")
+            medir.contar_bytes('historial', hist)
+            return hist
+        
+        almacen = self.almacen_precios
+        desde = almacen.fecha_actualizacion(ticker_symbol)
+        
+        if desde is not None:
+            self.limitador.esperar()
+            with medir.etapa('historial', ticker_symbol):
+                nuevos = self.proveedor.obtener_historial(
+                    ticker_symbol, start=desde.strftime('%Y-%m-%d')
+                )
+            medir.contar_bytes('historial', nuevos)
+            if almacen.agregar(ticker_symbol, nuevos):
+                return almacen.cargar(ticker_symbol)
+        
+        # Sin historial previo, o hueco/solape inválido: recarga completa
+        self.limitador.esperar()
+        with medir.etapa('historial', ticker_symbol):
+            hist = self.proveedor.obtener_historial(ticker_symbol, period="1y")
+        medir.contar_bytes('historial', hist)
+        if hist.empty:
+            return hist
+        almacen.reemplazar(ticker_symbol, hist)
+        return almacen.cargar(ticker_symbol)
+    
+    def descargar_historiales(self, tickers_list, period="1y", tamaño_lote=100,
+                              start=None, columnas=None):
+        """
+        Descargar el historial de precios de muchos tickers en pocas peticiones
+        
+        Args:
+            tickers_list: lista de símbolos
+            period: periodo de yfinance (igual que ticker.history)
+            tamaño_lote: símbolos por petición multi-ticker
+            start: fecha inicial (si se indica, sustituye a period)
+            columnas: conservar solo estas columnas de cada lote (None = OHLCV completo)
+        
+        Returns:
+            dict ticker -> DataFrame OHLCV (solo tickers con datos)
+        """
+        historiales = {}
+        tickers_list = list(dict.fromkeys(tickers_list))
+        
+        for i in range(0, len(tickers_list), tamaño_lote):
+            lote = tickers_list[i:i + tamaño_lote]
+            try:
+                self.limitador.esperar()
+                with self.instrumentacion.etapa('historial_lote'):
+                    descargados = self.proveedor.descargar_historiales(
+                        lote, period=period, start=start
+                    )
+                if self.instrumentacion.activa:
+                    for hist in descargados.values():
+                        self.instrumentacion.contar_bytes('historial_lote', hist)
+                if columnas:
+                    descargados = {t: hist[columnas] for t, hist in descargados.items()}
+                historiales.update(descargados)
+            except Exception as e:
+                print(f"Error descargando historial en lote: {e}")
+        
+        return historiales
+    
+    def actualizar_almacen_lote(self, tickers_list):
+        """
+        Actualizar el almacén de precios en lote pidiendo solo barras nuevas
+        
+        Returns:
+            dict ticker -> ventana de historial lista para calcular_score_timing
+        """
+        almacen = self.almacen_precios
+        
+        # Agrupar por fecha de actualización: normalmente todos coinciden
+        grupos = {}
+        for ticker_symbol, desde in almacen.fechas_actualizacion(tickers_list).items():
+            grupos.setdefault(desde, []).append(ticker_symbol)
+        
+        recargar = grupos.pop(None, [])
+        actualizados = []
+        
+        for desde, grupo in grupos.items():
+            nuevos = self.descargar_historiales(grupo, start=desde.strftime('%Y-%m-%d'))
+            for ticker_symbol in grupo:
+                if almacen.agregar(ticker_symbol, nuevos.get(ticker_symbol)):
+                    actualizados.append(ticker_symbol)
+                else:
+                    recargar.append(ticker_symbol)
+        
+        # Tickers nuevos o con huecos: historial completo
+        if recargar:
+            completos = self.descargar_historiales(recargar)
+            for ticker_symbol, hist in completos.items():
+                almacen.reemplazar(ticker_symbol, hist)
+                actualizados.append(ticker_symbol)
+        
+        return {t: almacen.cargar(t) for t in actualizados}
+    
+    def precargar_historiales(self, tickers_list):
+        """
+        Descargar en lote los historiales que usará calcular_ivr y calcular
+        el timing de todos ellos en una sola pasada vectorizada
+        """
+        # Hasta que termine el bloque solo hace falta el cierre
+        if self.almacen_precios is not None:
+            self.historiales_precargados = {
+                ticker_symbol: hist[['Close']]
+                for ticker_symbol, hist in self.actualizar_almacen_lote(tickers_list).items()
+            }
+        else:
+            self.historiales_precargados = self.descargar_historiales(tickers_list,
+                                                                      columnas=['Close'])
+        
+        with self.instrumentacion.etapa('timing_panel'):
+            timing = self.calcular_timing_universo(self.historiales_precargados)
+        self.timing_precalculado = {
+            ticker_symbol: (fila.score_timing, fila.rsi)
+            for ticker_symbol, fila in timing.iterrows()
+        }
+        print(f"Historiales descargados en lote: "
+              f"{len(self.historiales_precargados)}/{len(tickers_list)}")
+    
+    def liberar_historiales(self):
+        """Descartar historiales e info precargados (evita datos viejos en el próximo escaneo)"""
+        self.historiales_precargados = {}
+        self.timing_precalculado = {}
+        self.infos_precargadas = {}
+    
+    def calcular_timing_universo(self, historiales, suavizado=None):
+        """
+        RSI, SMA50/SMA200 y score de timing de muchos tickers a la vez
+        
+        Args:
+            historiales: dict ticker -> DataFrame OHLCV
+            suavizado: 'simple' o 'wilder' (None = self.params['rsi_suavizado'])
+        
+        Returns:
+            DataFrame indexado por ticker (rsi, sma_50, sma_200, score_timing)
+        """
+        panel = construir_panel(historiales)
+        return calcular_timing_panel(panel, self.params, suavizado=suavizado)
+    
     def calcular_dcf_simple(self, info, precio_actual):
         """
         DCF simplificado usando FCF y crecimiento estimado
@@ -109,7 +428,7 @@ class ScreenerIVR:
             valor_intrinseco = valor_equity / shares if shares > 0 else 0
             
             return max(valor_intrinseco, 0)
-            
+        
         except Exception as e:
             print(f"Error en DCF: {e}")
             return 0
@@ -211,23 +530,44 @@ class ScreenerIVR:
         
         return s_calidad
     
-    def calcular_rsi(self, precios, periodo=14):
-        """Calcular RSI (Relative Strength Index)"""
+    def calcular_rsi(self, precios, periodo=14, suavizado=None):
+        """
+        Calcular RSI (Relative Strength Index)
+        
+        Args:
+            suavizado: 'simple' (media móvil) o 'wilder'
+                       (None = self.params['rsi_suavizado'])
+        """
         if len(precios) < periodo + 1:
             return 50  # Neutral por defecto
         
+        suavizado = suavizado or self.params.get('rsi_suavizado', 'simple')
+        
         deltas = precios.diff()
         gain = deltas.where(deltas > 0, 0)
         loss = -deltas.where(deltas < 0, 0)
         
-        avg_gain = gain.rolling(window=periodo).mean()
-        avg_loss = loss.rolling(window=periodo).mean()
+        if suavizado == 'wilder':
+            # Semilla con media simple y después suavizado exponencial 1/periodo
+            avg_gain = self._media_wilder(gain.iloc[1:], periodo)
+            avg_loss = self._media_wilder(loss.iloc[1:], periodo)
+        else:
+            avg_gain = gain.rolling(window=periodo).mean()
+            avg_loss = loss.rolling(window=periodo).mean()
         
         rs = avg_gain / avg_loss
         rsi = 100 - (100 / (1 + rs))
         
         return rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
     
+    def _media_wilder(self, valores, periodo):
+        """Serie con la media de Wilder (solo se rellena el último valor)"""
+        datos = valores.to_numpy(dtype=float)
+        media = datos[:periodo].mean()
+        for x in datos[periodo:]:
+            media = (media * (periodo - 1) + x) / periodo
+        return pd.Series([media], index=valores.index[-1:])
+    
     def calcular_score_timing(self, hist):
         """
         C. Timing / Momentum (10% del IVR)
@@ -251,9 +591,9 @@ class ScreenerIVR:
         
         return s_timing, rsi
     
-    def aplicar_reglas_seguridad(self, info, margen_seguridad):
+    def reglas_fundamentales(self, info):
         """
-        Reglas duras de seguridad (filtros binarios)
+        Reglas duras que solo dependen de info (EPS, FCF y cobertura de intereses)
         """
         # EPS TTM > 0
         eps = info.get('trailingEps', 0)
@@ -273,6 +613,16 @@ class ScreenerIVR:
             if cobertura < 2:
                 return False, f"Cobertura intereses baja: {cobertura:.2f}"
         
+        return True, "Aprobado"
+    
+    def aplicar_reglas_seguridad(self, info, margen_seguridad):
+        """
+        Reglas duras de seguridad (filtros binarios)
+        """
+        pasa, razon = self.reglas_fundamentales(info)
+        if not pasa:
+            return pasa, razon
+        
         # Margen de seguridad >= 20%
         if margen_seguridad < 0.20:
             return False, f"Margen seguridad bajo: {margen_seguridad*100:.1f}%"
@@ -286,6 +636,13 @@ class ScreenerIVR:
         Returns:
             dict con IVR y todos los componentes
         """
+        with self.instrumentacion.etapa('calcular_ivr', ticker_symbol):
+            return self._calcular_ivr(ticker_symbol)
+    
+    def _calcular_ivr(self, ticker_symbol):
+        """Cuerpo de calcular_ivr (cada etapa se mide si hay instrumentación)"""
+        medir = self.instrumentacion
+        
         # Obtener datos
         datos = self.obtener_datos_ticker(ticker_symbol)
         if not datos:
@@ -296,14 +653,26 @@ class ScreenerIVR:
         precio = datos['precio']
         
         # A. Valoración
-        s_val, valor_int, ms = self.calcular_score_valoracion(info, precio)
+        with medir.etapa('valoracion', ticker_symbol):
+            s_val, valor_int, ms = self.calcular_score_valoracion(info, precio)
         
         # B. Calidad
-        s_cal = self.calcular_score_calidad(info)
+        with medir.etapa('calidad', ticker_symbol):
+            s_cal = self.calcular_score_calidad(info)
         
-        # C. Timing
-        s_tim, rsi = self.calcular_score_timing(hist)
+        # C. Timing (ya calculado en lote si el historial vino precargado)
+        if ticker_symbol in self.timing_precalculado:
+            s_tim, rsi = self.timing_precalculado[ticker_symbol]
+        else:
+            with medir.etapa('timing', ticker_symbol):
+                s_tim, rsi = self.calcular_score_timing(hist)
         
+        return self._componer_resultado(ticker_symbol, datos['fecha'], info, precio,
+                                        s_val, valor_int, ms, s_cal, s_tim, rsi)
+    
+    def _componer_resultado(self, ticker_symbol, fecha, info, precio,
+                            s_val, valor_int, ms, s_cal, s_tim, rsi):
+        """Reglas de seguridad, IVR final y fila del resultado"""
         # Aplicar reglas de seguridad
         pasa_filtros, razon_filtro = self.aplicar_reglas_seguridad(info, ms)
         
@@ -315,10 +684,15 @@ class ScreenerIVR:
         else:
             ivr = 0
         
+        # Guardar campos para re-puntuar en lote sin volver a descargar
+        fila = extraer_fila(info, precio, ticker_symbol)
+        fila.update(fecha=fecha, score_timing=s_tim, rsi=rsi)
+        self.filas_fundamentales[ticker_symbol] = fila
+        
         # Resultado completo
         resultado = {
             'ticker': ticker_symbol,
-            'fecha': datos['fecha'],
+            'fecha': fecha,
             'precio': precio,
             'valor_intrinseco': valor_int,
             'margen_seguridad': ms,
@@ -335,25 +709,251 @@ class ScreenerIVR:
         
         return resultado
     
-    def escanear_lista(self, tickers_list):
+    def prefiltrar_ticker(self, ticker_symbol):
+        """
+        Fase 1 del escaneo en dos fases: reglas de seguridad sin historial
+        
+        EPS, FCF y cobertura solo dependen de info. El margen DCF se evalúa
+        con el precio de info admitiendo una caída de params['holgura_prefiltro']
+        hasta el último cierre, así solo se descartan tickers que tampoco
+        pasarían con el historial (salvo caídas mayores que la holgura).
+        
+        Returns:
+            resultado con pasa_filtros False y timing NaN si se descarta;
+            None si el ticker pasa a la fase 2 (o no hay info/precio con que decidir)
+        """
+        with self.instrumentacion.etapa('prefiltro', ticker_symbol):
+            try:
+                info = self.obtener_fundamentales(ticker_symbol)
+            except Exception as e:
+                print(f"Error obteniendo {ticker_symbol}: {e}")
+                return None
+            
+            precio = _precio_info(info) if info else None
+            if not precio:
+                return None
+            
+            s_val, valor_int, ms = self.calcular_score_valoracion(info, precio)
+            if self.reglas_fundamentales(info)[0]:
+                precio_minimo = precio * (1 - self.params['holgura_prefiltro'])
+                if valor_int > 0 and (valor_int - precio_minimo) / precio_minimo >= 0.20:
+                    self.infos_precargadas[ticker_symbol] = info
+                    return None
+            
+            s_cal = self.calcular_score_calidad(info)
+            return self._componer_resultado(ticker_symbol, datetime.now(), info, precio,
+                                            s_val, valor_int, ms, s_cal, np.nan, np.nan)
+    
+    def _procesar_ticker(self, ticker):
+        """Calcular IVR de un ticker mostrando progreso"""
+        print(f"Procesando {ticker}...")
+        return self.calcular_ivr(ticker)
+    
+    def escanear_stream(self, tickers_list, max_workers=None, historial_en_lote=True,
+                        tamaño_bloque=100, parar_tras_aprobados=None, prefiltro=False):
+        """
+        Escanear produciendo cada resultado en cuanto está calculado
+        
+        Los historiales se descargan por bloques, así el primer resultado
+        llega tras descargar un bloque y no la lista entera. Si se deja de
+        consumir el generador (break o close) no se calculan más tickers.
+        
+        Args:
+            tickers_list: lista de símbolos
+            max_workers: hilos concurrentes (None = usar self.max_workers)
+            historial_en_lote: descargar precios con peticiones multi-ticker
+            tamaño_bloque: tickers por bloque de descarga (None = todos a la vez)
+            parar_tras_aprobados: terminar al reunir este número de tickers que
+                                  pasan filtros (None = escanear todo)
+            prefiltro: aplicar antes las reglas de seguridad con info (prefiltrar_ticker)
+                       y descargar historial solo de los que sobreviven
+        
+        Yields:
+            (ticker, resultado): resultado de calcular_ivr, o None si el ticker
+            no tiene datos; en serie en orden de entrada, en paralelo en orden
+            de finalización
+        """
+        max_workers = max_workers or self.max_workers
+        tickers_list = list(tickers_list)
+        tamaño_bloque = tamaño_bloque or max(len(tickers_list), 1)
+        concurrente = max_workers > 1 and len(tickers_list) > 1
+        executor = ThreadPoolExecutor(max_workers=max_workers) if concurrente else None
+        aprobados = 0
+        
+        try:
+            for inicio in range(0, len(tickers_list), tamaño_bloque):
+                bloque = tickers_list[inicio:inicio + tamaño_bloque]
+                
+                if prefiltro:
+                    siguen = set()
+                    for ticker_symbol, descartado in self._procesar_bloque(
+                            bloque, executor, max_workers, self.prefiltrar_ticker):
+                        if descartado is None:
+                            siguen.add(ticker_symbol)
+                        else:
+                            yield ticker_symbol, descartado
+                    print(f"Prefiltro: {len(bloque) - len(siguen)}/{len(bloque)} "
+                          f"descartados sin descargar historial")
+                    bloque = [t for t in bloque if t in siguen]
+                    if not bloque:
+                        continue
+                
+                if historial_en_lote:
+                    self.precargar_historiales(bloque)
+                
+                for ticker_symbol, resultado in self._procesar_bloque(bloque, executor, max_workers):
+                    yield ticker_symbol, resultado
+                    if resultado and resultado['pasa_filtros']:
+                        aprobados += 1
+                        if parar_tras_aprobados and aprobados >= parar_tras_aprobados:
+                            return
+        finally:
+            # Al parar antes de tiempo se descartan los tickers aún no empezados
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            if historial_en_lote or prefiltro:
+                self.liberar_historiales()
+    
+    def _procesar_bloque(self, bloque, executor, max_workers, funcion=None):
+        """
+        Aplicar funcion (None = _procesar_ticker) a un bloque; en paralelo
+        mantiene como mucho 2·max_workers tickers en vuelo
+        """
+        funcion = funcion or self._procesar_ticker
+        if executor is None:
+            for ticker_symbol in bloque:
+                yield ticker_symbol, funcion(ticker_symbol)
+            return
+        
+        pendientes = iter(bloque)
+        en_vuelo = {}
+        
+        def lanzar():
+            for ticker_symbol in pendientes:
+                en_vuelo[executor.submit(funcion, ticker_symbol)] = ticker_symbol
+                return
+        
+        for _ in range(2 * max_workers):
+            lanzar()
+        while en_vuelo:
+            terminados, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                ticker_symbol = en_vuelo.pop(futuro)
+                lanzar()
+                yield ticker_symbol, futuro.result()
+    
+    def escanear_lista(self, tickers_list, max_workers=None, historial_en_lote=True,
+                       tamaño_bloque=None, al_resultado=None, prefiltro=False):
         """
         Escanear una lista de tickers y retornar DataFrame ordenado por IVR
+        
+        Args:
+            tickers_list: lista de símbolos
+            max_workers: hilos concurrentes (None = usar self.max_workers)
+            historial_en_lote: descargar precios con peticiones multi-ticker
+            tamaño_bloque: tickers por bloque de descarga (None = todos a la vez)
+            al_resultado: callback(ticker, resultado) con cada ticker terminado
+                          (p.ej. para mostrar un RankingTopK provisional)
+            prefiltro: escaneo en dos fases (ver escanear_stream); los descartados
+                       salen con su razon_filtro y sin score_timing/rsi
+        
+        Returns:
+            DataFrame con ESQUEMA_RESULTADO (textos category, scores float32)
+            y el inicio del escaneo en df.attrs['fecha']
         """
+        with self.instrumentacion.etapa('escanear_lista'):
+            return self._escanear_lista(tickers_list, max_workers, historial_en_lote,
+                                        tamaño_bloque, al_resultado, prefiltro)
+    
+    def _escanear_lista(self, tickers_list, max_workers, historial_en_lote,
+                        tamaño_bloque, al_resultado, prefiltro):
+        tickers_list = list(tickers_list)
+        inicio = datetime.now()
         resultados = []
-        
-        for ticker in tickers_list:
-            print(f"Procesando {ticker}...")
-            resultado = self.calcular_ivr(ticker)
+        for ticker_symbol, resultado in self.escanear_stream(
+                tickers_list, max_workers, historial_en_lote, tamaño_bloque,
+                prefiltro=prefiltro):
+            if al_resultado:
+                al_resultado(ticker_symbol, resultado)
             if resultado:
                 resultados.append(resultado)
         
-        # Convertir a DataFrame
-        df = pd.DataFrame(resultados)
+        # Orden de entrada y después IVR descendente (sort estable): el
+        # DataFrame final es idéntico en serie y en paralelo
+        posicion = {t: i for i, t in reversed(list(enumerate(tickers_list)))}
+        resultados.sort(key=lambda r: posicion[r['ticker']])
+        resultados.sort(key=lambda r: r['ivr'], reverse=True)
         
-        # Ordenar por IVR descendente
-        df = df.sort_values('ivr', ascending=False).reset_index(drop=True)
+        # Columna a columna con tipos fijos, ya en el orden final
+        df = construir_resultado(
+            {c: [r[c] for r in resultados] for c in ESQUEMA_RESULTADO}, fecha=inicio
+        )
         
+        self.ultimo_snapshot = df
         return df
+    
+    def recalcular_ivr(self, df_snapshot=None, pesos=None, params=None):
+        """
+        Recalcular IVR y ranking desde un escaneo previo, sin volver a descargar
+        
+        Con solo pesos nuevos se combinan los sub-scores guardados
+        (valoración, calidad, timing y filtros). Si cambian los parámetros
+        de referencia se re-puntúa con los fundamentales ya descargados.
+        
+        Args:
+            df_snapshot: resultado de escanear_lista (None = último escaneo)
+            pesos: dict de pesos (None = self.pesos)
+            params: cambios sobre self.params (None = sin cambios)
+        
+        Returns:
+            DataFrame con las mismas columnas y tipos, reordenado por el nuevo IVR
+        """
+        df = self.ultimo_snapshot if df_snapshot is None else df_snapshot
+        if df is None or df.empty:
+            return df
+        pesos = pesos or self.pesos
+        
+        if params:
+            tabla = self.tabla_fundamentales(df['ticker'].tolist())
+            if len(tabla) == len(df):
+                nuevo = puntuar_universo(tabla, pesos, {**self.params, **params})
+                # puntuar_universo solo devuelve ESQUEMA_RESULTADO: las columnas
+                # añadidas al snapshot (vi_p5... de Monte Carlo) se recuperan por ticker
+                extras = [c for c in df.columns if c not in nuevo.columns]
+                if extras:
+                    por_ticker = df[extras].set_index(df['ticker'].astype(str))
+                    nuevo = nuevo.join(por_ticker, on=nuevo['ticker'].astype(str))
+                return nuevo[list(df.columns)]
+            print("Faltan fundamentales en memoria: solo se aplican los pesos")
+        
+        ivr = (pesos['valoracion'] * df['score_valoracion'] +
+               pesos['calidad'] * df['score_calidad'] +
+               pesos['timing'] * df['score_timing'])
+        ivr = ivr.where(df['pasa_filtros'].astype(bool), 0.0)
+        
+        return df.assign(ivr=ivr).sort_values('ivr', ascending=False).reset_index(drop=True)
+    
+    def tabla_fundamentales(self, tickers_list=None):
+        """
+        Tabla columnar (una fila por ticker) de los tickers ya analizados
+        
+        Args:
+            tickers_list: tickers a incluir (None = todos los analizados)
+        """
+        if tickers_list is None:
+            filas = self.filas_fundamentales.values()
+        else:
+            filas = [self.filas_fundamentales[t] for t in tickers_list
+                     if t in self.filas_fundamentales]
+        return construir_tabla(filas)
+    
+    def puntuar_tabla(self, tabla):
+        """
+        Calcular el IVR de una tabla de fundamentales con operaciones vectorizadas
+        
+        Da el mismo DataFrame que escanear_lista sin volver a descargar datos.
+        """
+        return puntuar_universo(tabla, self.pesos, self.params)
 
 
 def ejemplo_uso():
@@ -9,14 +9,22 @@ from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import json
 import os
+from bandeja_alertas import BandejaAlertas
 
 
 class SistemaAlertas:
     """Gestiona alertas por email"""
     
-    def __init__(self, config_file='config_alertas.json'):
+    def __init__(self, config_file='config_alertas.json', bandeja=None):
+        """
+        Args:
+            config_file: JSON con credenciales y umbrales
+            bandeja: BandejaAlertas para envío en segundo plano
+                     (None = se crea al encolar la primera alerta)
+        """
         self.config_file = config_file
         self.config = self.cargar_config()
+        self.bandeja = bandeja
     
     def cargar_config(self):
         """Cargar configuración de alertas"""
@@ -31,6 +39,8 @@ class SistemaAlertas:
             'password': '',       # App password de Gmail
             'smtp_server': 'smtp.gmail.com',
             'smtp_port': 587,
+            'smtp_starttls': True,
+            'directorio_bandeja': 'bandeja_alertas',
             'alertas_activas': True,
             'umbral_compra': 0.60,
             'umbral_venta': 0.30,
@@ -118,20 +128,23 @@ class SistemaAlertas:
         
         return html
     
-    def enviar_alerta(self, df_resultados):
+    def preparar_alerta(self, df_resultados):
         """
-        Enviar email con alertas si se detectan señales
+        Asunto y HTML de la alerta si hay señales y el email está configurado
         
         Args:
             df_resultados: DataFrame con resultados del screener
+        
+        Returns:
+            (asunto, html, timestamp) o None si no hay nada que enviar
         """
         if not self.config['alertas_activas']:
             print("Alertas desactivadas")
-            return False
+            return None
         
         if not self.config['email_destino'] or not self.config['email_origen']:
             print("Email no configurado")
-            return False
+            return None
         
         # Filtrar alertas
         alertas_compra = df_resultados[
@@ -145,18 +158,67 @@ class SistemaAlertas:
         # Si no hay alertas, no enviar
         if not alertas_compra and not alertas_venta:
             print("No hay alertas para enviar")
+            return None
+        
+        timestamp = datetime.now()
+        asunto = f"🎯 Screener IVR - {len(alertas_compra)} compras, {len(alertas_venta)} ventas"
+        html_content = self.generar_html_alerta(alertas_compra, alertas_venta, timestamp)
+        return asunto, html_content, timestamp
+    
+    def obtener_bandeja(self):
+        """Bandeja de salida con su hilo de envío en marcha"""
+        if self.bandeja is None:
+            self.bandeja = BandejaAlertas(
+                self.config, self.config.get('directorio_bandeja', 'bandeja_alertas')
+            )
+        self.bandeja.iniciar()
+        return self.bandeja
+    
+    def detener(self, timeout=30):
+        """Parar el hilo de la bandeja (lo pendiente se envía en el próximo arranque)"""
+        if self.bandeja is not None:
+            self.bandeja.detener(timeout)
+    
+    def encolar_alerta(self, df_resultados):
+        """
+        Dejar la alerta en la bandeja de salida sin esperar al servidor SMTP
+        
+        Args:
+            df_resultados: DataFrame con resultados del screener
+        """
+        preparada = self.preparar_alerta(df_resultados)
+        if preparada is None:
+            return False
+        
+        asunto, html_content, timestamp = preparada
+        self.obtener_bandeja().encolar(asunto, html_content)
+        
+        self.config['ultima_alerta'] = timestamp.isoformat()
+        self.guardar_config()
+        
+        print(f"📤 Alerta en cola para {self.config['email_destino']}")
+        return True
+    
+    def enviar_alerta(self, df_resultados):
+        """
+        Enviar email con alertas si se detectan señales (síncrono)
+        
+        Args:
+            df_resultados: DataFrame con resultados del screener
+        """
+        preparada = self.preparar_alerta(df_resultados)
+        if preparada is None:
             return False
         
         try:
             # Crear mensaje
-            timestamp = datetime.now()
+            asunto, html_content, timestamp = preparada
             msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"🎯 Screener IVR - {len(alertas_compra)} compras, {len(alertas_venta)} ventas"
+            msg['Subject'] = asunto
             msg['From'] = self.config['email_origen']
             msg['To'] = self.config['email_destino']
             
             # HTML body
-            html_content = self.generar_html_alerta(alertas_compra, alertas_venta, timestamp)
             html_part = MIMEText(html_content, 'html')
             msg.attach(html_part)
             
@@ -173,7 +235,7 @@ class SistemaAlertas:
             
             print(f"✅ Alerta enviada exitosamente a {self.config['email_destino']}")
             return True
-            
+        
         except Exception as e:
             print(f"❌ Error enviando alerta: {e}")
             return False
@@ -194,7 +256,7 @@ class SistemaAlertas:
             
             print("✅ Email de prueba enviado exitosamente")
             return True
-            
+        
         except Exception as e:
             print(f"❌ Error en email de prueba: {e}")
             return False
@@ -0,0 +1,73 @@
+"""Tests del historial Parquet de escaneos"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from historial_ivr import HistorialIVR
+
+
+def _escaneo(tickers, ivr):
+    return pd.DataFrame({
+        'ticker': tickers,
+        'precio': [100.0] * len(tickers),
+        'ivr': ivr,
+        'pasa_filtros': [True] * len(tickers),
+        'razon_filtro': [''] * len(tickers),
+        'sector': ['Technology'] * len(tickers),
+    })
+
+
+def test_leer_particion_compactada_y_escaneo_nuevo(tmp_path):
+    historial = HistorialIVR(str(tmp_path))
+    hoy = datetime.now().replace(microsecond=0)
+    ayer = hoy - timedelta(days=1)
+    
+    # Día anterior: un archivo como los escribía to_parquet (textos large_string
+    # con pandas 3) y un escaneo nuevo, fusionados por compactar
+    legado = _escaneo(['AAPL', 'MSFT'], [70.0, 65.0])
+    legado['timestamp'] = pd.Timestamp(ayer - timedelta(hours=1))
+    carpeta = tmp_path / f"fecha={ayer:%Y-%m-%d}"
+    carpeta.mkdir()
+    legado.to_parquet(carpeta / 'scan_legado.parquet', index=False)
+    historial.guardar(_escaneo(['AAPL', 'MSFT'], [71.0, 64.0]), ayer)
+    assert historial.compactar(f"{ayer:%Y-%m-%d}") == 2
+    
+    historial.guardar(_escaneo(['AAPL', 'GOOGL'], [72.0, 80.0]), hoy)
+    
+    for ruta in historial.archivos(f"{ayer:%Y-%m-%d}") + historial.archivos(f"{hoy:%Y-%m-%d}"):
+        esquema = pq.read_schema(ruta)
+        assert esquema.field('ticker').type == pa.string()
+        assert esquema.field('timestamp').type == pa.timestamp('ns')
+    
+    df = historial.leer()
+    assert len(df) == 6
+    assert df['timestamp'].nunique() == 3
+    assert df.loc[df['ticker'] == 'GOOGL', 'ivr'].tolist() == [80.0]
+
+
+def test_leer_archivos_con_tipos_distintos(tmp_path):
+    historial = HistorialIVR(str(tmp_path))
+    momento = datetime(2024, 3, 1, 10, 0)
+    carpeta = tmp_path / 'fecha=2024-03-01'
+    carpeta.mkdir()
+    
+    # Mismas columnas escritas por otras versiones: textos large_string,
+    # rsi entero o todo nulo
+    for i, (tipo_texto, rsi) in enumerate([(pa.large_string(), pa.array([30, 40])),
+                                            (pa.string(), pa.array([None, None]))]):
+        tabla = pa.table({
+            'ticker': pa.array(['AAPL', 'MSFT'], type=tipo_texto),
+            'ivr': [60.0 + i, 50.0 + i],
+            'rsi': rsi,
+            'timestamp': pa.array([pd.Timestamp(momento + timedelta(hours=i))] * 2,
+                                  type=pa.timestamp('us')),
+        })
+        pq.write_table(tabla, carpeta / f'scan_{i}.parquet')
+    historial.guardar(_escaneo(['AAPL'], [62.0]), momento + timedelta(hours=2))
+    
+    df = historial.leer(filtros=[('ticker', '=', 'AAPL')])
+    assert df['ivr'].tolist() == [60.0, 61.0, 62.0]
+    assert df['rsi'].iloc[0] == 30.0 and df['rsi'].iloc[1:].isna().all()
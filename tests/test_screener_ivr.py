@@ -0,0 +1,27 @@
+"""Tests de ScreenerIVR sobre datos sintéticos (sin red)"""
+
+import pandas as pd
+
+from benchmark_screener import ProveedorSintetico, universo_sintetico, _silencioso
+from montecarlo_valoracion import valorar_montecarlo
+from screener_ivr import ScreenerIVR
+
+
+def test_recalcular_ivr_con_params_conserva_columnas_montecarlo():
+    screener = ScreenerIVR(proveedor=ProveedorSintetico(semilla=3))
+    df = _silencioso(screener.escanear_lista, universo_sintetico(40))
+    
+    # Como el paso Monte Carlo del scheduler: columnas nuevas por ticker
+    mc = valorar_montecarlo(screener.tabla_fundamentales(df['ticker']), 200, semilla=1)
+    mc = mc.reindex(df['ticker'].to_numpy())
+    for columna in ['vi_p5', 'vi_p50', 'vi_p95', 'prob_margen_20']:
+        df[columna] = mc[columna].to_numpy()
+    
+    nuevo = screener.recalcular_ivr(df, params={'cagr_optimo': 0.30})
+    
+    assert list(nuevo.columns) == list(df.columns)
+    assert (nuevo.dtypes == df.dtypes).all()
+    esperado = df.set_index(df['ticker'].astype(str))['vi_p50']
+    obtenido = nuevo.set_index(nuevo['ticker'].astype(str))['vi_p50']
+    pd.testing.assert_series_equal(obtenido.sort_index(), esperado.sort_index())
+    assert not nuevo['ivr'].equals(df['ivr'])